@@ -213,6 +213,15 @@ class CompilerFactory(object):
                     work.append(child)
         return subclasses
 
+    @staticmethod
+    def compilerNames():
+        names = []
+        for subc in CompilerFactory.get_subclasses(GenericCompiler):
+            for name in subc.compnames:
+                if name not in names:
+                    names.append(name)
+        return sorted(names)
+
     @staticmethod
     def createCompiler(compid):
         for subc in CompilerFactory.get_subclasses(GenericCompiler):
@@ -0,0 +1,163 @@
+'''KGen compiler shims and compilation databases
+
+Alternatives to strace for collecting compiler command lines. Shim
+executables named after the compilers known to kgcompiler are placed first
+on PATH during the application build. Each shim appends the path of the
+real compiler, the working directory and its arguments to one record file
+shared by all shims and then executes the real compiler. A compilation database
+(compile_commands.json) generated by a build system can be read instead.
+'''
+
+import os
+import sys
+import json
+import shlex
+import stat
+from . import kgstrace
+from .kgcompiler import CompilerFactory
+
+SHIM_DIR = 'shims'
+RECORD_DIR = 'records'
+RECORD_FILE = 'records.rec'
+RECORD_TMPEXT = '.tmp'
+
+# fields are NUL-terminated: realpath, cwd, argc, argv[0], ..., argv[argc-1]
+# a record is written to a file of the shim process first and then appended
+# to the record file at once, so records are in the order of compilations.
+SHIM_TEMPLATE = """#!/bin/sh
+# KGen compiler shim
+kgen_shimdir='%(shimdir)s'
+kgen_recdir='%(recdir)s'
+kgen_name=`basename "$0"`
+kgen_real=''
+kgen_ifs=$IFS
+IFS=:
+set -f
+for kgen_dir in $PATH; do
+    if [ -n "$kgen_dir" ] && [ "$kgen_dir" != "$kgen_shimdir" ] && [ -f "$kgen_dir/$kgen_name" ] && [ -x "$kgen_dir/$kgen_name" ]; then
+        kgen_real="$kgen_dir/$kgen_name"
+        break
+    fi
+done
+set +f
+IFS=$kgen_ifs
+if [ -z "$kgen_real" ]; then
+    echo "KGen shim: $kgen_name is not found in PATH" >&2
+    exit 127
+fi
+kgen_tmp="$kgen_recdir/$$%(tmpext)s"
+printf '%%s\\000' "$kgen_real" "`pwd`" "$(($# + 1))" "$kgen_name" "$@" > "$kgen_tmp"
+cat "$kgen_tmp" >> "$kgen_recdir/%(recfile)s"
+rm -f "$kgen_tmp"
+exec "$kgen_real" "$@"
+"""
+
+def create_shims(shimdir, recdir):
+    ''' creates a shim for each known compiler name and returns the names '''
+
+    # build commands may change directory before invoking compilers
+    shimdir = os.path.realpath(shimdir)
+    recdir = os.path.realpath(recdir)
+
+    for path in (shimdir, recdir):
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    script = SHIM_TEMPLATE%{ 'shimdir': shimdir, 'recdir': recdir, 'tmpext': RECORD_TMPEXT, 'recfile': RECORD_FILE }
+    names = CompilerFactory.compilerNames()
+    for name in names:
+        path = os.path.join(shimdir, name)
+        with open(path, 'w') as f:
+            f.write(script)
+        st = os.stat(path)
+        os.chmod(path, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return names
+
+def shim_command(shimdir, cmdstr):
+    ''' returns a shell command that runs cmdstr with shims first on PATH '''
+
+    return 'PATH="%s:$PATH"; export PATH; %s'%(os.path.realpath(shimdir), cmdstr)
+
+def read_records(path):
+    ''' returns (realpath, cwd, argv) records in a record file '''
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    fields = data.split(b'\0')
+    if sys.version_info >= (3,0):
+        fields = [ field.decode('utf-8', 'surrogateescape') for field in fields ]
+
+    records = []
+    pos = 0
+    while pos + 3 < len(fields):
+        realpath, cwd, argc = fields[pos:pos+3]
+        try:
+            argc = int(argc)
+        except ValueError:
+            break
+        argv = fields[pos+3:pos+3+argc]
+        if len(argv) < argc:
+            break
+        records.append((realpath, cwd, argv))
+        pos += 3 + argc
+    return records
+
+def parse_records(recdir):
+    ''' returns compiler flags of source files recorded by shims
+
+    Records are in the order of compilations so that the last compilation
+    of a source file is used.
+    '''
+
+    records = []
+    path = os.path.join(recdir, RECORD_FILE)
+    if os.path.exists(path):
+        for realpath, cwd, argv in read_records(path):
+            records.append(kgstrace.compile_record(realpath, argv, cwd))
+    return kgstrace.merge_records(records)
+
+def _tostr(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    elif isinstance(value, list):
+        return [ _tostr(item) for item in value ]
+    elif isinstance(value, dict):
+        return dict((_tostr(k), _tostr(v)) for k, v in value.items())
+    return value
+
+def which(name):
+    if os.path.isabs(name):
+        return name
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        exepath = os.path.join(path, name)
+        if path and os.path.isfile(exepath) and os.access(exepath, os.X_OK):
+            return exepath
+    return name
+
+def parse_compdb(path):
+    ''' returns compiler flags of source files in a compile_commands.json
+
+    Each entry has "directory" and either "arguments" or "command". Entries
+    are used in the order of the file so that the last one of a source file
+    is used.
+    '''
+
+    with open(path, 'r') as f:
+        entries = json.load(f)
+    if sys.version_info < (3,0):
+        entries = _tostr(entries)
+
+    records = []
+    for entry in entries:
+        if 'arguments' in entry:
+            argv = list(entry['arguments'])
+        elif 'command' in entry:
+            argv = shlex.split(entry['command'])
+        else:
+            continue
+        if not argv:
+            continue
+        directory = entry.get('directory', os.path.dirname(os.path.abspath(path)))
+        records.append(kgstrace.compile_record(which(argv[0]), argv, directory))
+    return kgstrace.merge_records(records)
@@ -0,0 +1,267 @@
+'''KGen strace log parser
+
+Streaming parser of execve records in a log generated by
+"strace -f -e trace=execve -v". Compiler command lines are collected in the
+order that they are executed. A large log is split into chunks at line
+boundaries that are parsed in worker processes, and an execve record that
+is split into "<unfinished ...>" and "resumed>" lines is paired by process
+id across chunks.
+'''
+
+import os
+import re
+import sys
+import collections
+import multiprocessing
+from . import kgcompiler
+
+PY2 = sys.version_info < (3,0)
+
+STR_EX = 'execve('
+STR_RE = '<... execve resumed>'
+
+# logs larger than this are split into chunks parsed in parallel
+CHUNK_SIZE = 64 * 1024 * 1024
+
+pid_prefix = re.compile(r'\s*(?:\[pid\s+)?(\d+)\]?\s')
+string_token = re.compile(r'"([^"\\]*(?:\\.[^"\\]*)*)"')
+space_token = re.compile(r'[\s,]*')
+array_token = re.compile(r'\[[^"\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\]]*)*\]')
+address_token = re.compile(r'(?:0x[0-9a-fA-F]+|NULL)(?:\s*/\*.*?\*/)?')
+pwd_token = re.compile(r'"PWD=([^"\\]*(?:\\.[^"\\]*)*)"')
+result_token = re.compile(r'\s*\)\s*=\s*(-?\d+)')
+resumed_result = re.compile(r'.*?\)\s*=\s*(-?\d+)')
+
+escape_seq = re.compile(r'\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)')
+escape_chars = { 'n': '\n', 't': '\t', 'r': '\r', 'v': '\v', 'f': '\f', 'a': '\a', 'b': '\b' }
+
+def _escape_char(match):
+    esc = match.group(1)
+    if esc[0]=='x' and len(esc)>1:
+        return chr(int(esc[1:], 16))
+    elif esc[0] in '01234567':
+        return chr(int(esc, 8))
+    return escape_chars.get(esc, esc)
+
+def unescape(value):
+    ''' converts a C-escaped strace string to the original string '''
+
+    if '\\' in value:
+        value = escape_seq.sub(_escape_char, value)
+    if not PY2:
+        # lines are decoded as latin-1 to keep bytes of escaped characters
+        try:
+            value = value.encode('latin-1').decode('utf-8')
+        except UnicodeError:
+            pass
+    return value
+
+def parse_string(line, pos):
+    ''' returns (string, position after the string) or (None, pos) '''
+
+    match = string_token.match(line, pos)
+    if match is None:
+        return None, pos
+    return unescape(match.group(1)), match.end()
+
+def skip_array(line, pos):
+    ''' returns (start, end) of an array or (None, pos)
+
+    An array printed as an address, possibly with a comment such as
+    "/* 25 vars */", has no items.
+    '''
+
+    pos = space_token.match(line, pos).end()
+    match = array_token.match(line, pos)
+    if match is None:
+        match = address_token.match(line, pos)
+        if match is None:
+            return None, pos
+    return match.start(), match.end()
+
+def array_items(line, start, end):
+    ''' returns strings in an array; a truncated array ends with "..." '''
+
+    return [ unescape(item) for item in string_token.findall(line, start, end) ]
+
+def getpwd(line, start, end):
+    match = pwd_token.search(line, start, end)
+    if match:
+        return unescape(match.group(1))
+    return None
+
+_compilers = {}
+
+def get_compiler(compid):
+    if compid not in _compilers:
+        _compilers[compid] = kgcompiler.CompilerFactory.createCompiler(compid)
+    return _compilers[compid]
+
+def compile_record(exepath, argv, pwd):
+    ''' returns (exepath, srcs, incs, macros, openmp, options) of a compiler command or None '''
+
+    compiler = get_compiler(argv[0].split('/')[-1]) if argv else None
+    if compiler:
+        srcs, incs, macros, openmp, options = compiler.parse_option(argv, pwd)
+        if len(srcs)>0:
+            return (exepath, srcs, incs, macros, openmp, options)
+    return None
+
+def parse_record(line):
+    ''' returns (pid, status, record) of an execve line or None
+
+    status is True for successful execve, False for failed one and None for
+    unfinished one. record is (exepath, srcs, incs, macros, openmp, options)
+    of a compiler command or None for other commands.
+    '''
+
+    pos_execve = line.find(STR_EX)
+    if pos_execve < 0:
+        return None
+
+    match = pid_prefix.match(line)
+    pid = match.group(1) if match else None
+
+    exepath, pos = parse_string(line, space_token.match(line, pos_execve + len(STR_EX)).end())
+    if exepath is None:
+        return None
+    argv_start, argv_end = skip_array(line, pos)
+    if argv_start is None:
+        return None
+    env_start, env_end = skip_array(line, argv_end)
+    if env_start is None:
+        return None
+
+    match = result_token.match(line, env_end)
+    if match:
+        status = int(match.group(1)) >= 0
+    elif '<unfinished' in line[env_end:]:
+        status = None
+    else:
+        return None
+
+    record = None
+    if status is not False and exepath:
+        argv = array_items(line, argv_start, argv_end)
+        if argv and get_compiler(argv[0].split('/')[-1]):
+            record = compile_record(exepath, argv, getpwd(line, env_start, env_end))
+    return pid, status, record
+
+def parse_chunk(args):
+    ''' parses lines in [start, end) of a log file
+
+    Returns a list of events in the order of lines:
+      ('exec', pid, status, record) for compiler commands and for unfinished
+      execve of any command, and ('resumed', pid, status) for resumed lines
+      whose execve is not found in this chunk.
+    '''
+
+    path, start, end = args
+
+    events = []
+    # pid -> index of unfinished execve event
+    pending = {}
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            rawline = f.readline()
+            if not rawline:
+                break
+            pos += len(rawline)
+            line = rawline if PY2 else rawline.decode('latin-1')
+
+            if STR_EX in line:
+                parsed = parse_record(line)
+                if parsed is None:
+                    continue
+                pid, status, record = parsed
+                if status is None:
+                    pending[pid] = len(events)
+                    events.append(('exec', pid, status, record))
+                elif record is not None:
+                    events.append(('exec', pid, status, record))
+
+            elif STR_RE in line:
+                match = pid_prefix.match(line)
+                pid = match.group(1) if match else None
+                match = resumed_result.match(line, line.find(STR_RE) + len(STR_RE))
+                status = match is not None and int(match.group(1)) >= 0
+                idx = pending.pop(pid, None)
+                if idx is None:
+                    events.append(('resumed', pid, status))
+                else:
+                    event = events[idx]
+                    events[idx] = ('exec', event[1], status, event[3])
+
+    return events
+
+def split_chunks(path, chunksize):
+    ''' returns (start, end) offsets of chunks that start at line boundaries '''
+
+    size = os.path.getsize(path)
+    offsets = [ 0 ]
+    with open(path, 'rb') as f:
+        while offsets[-1] + chunksize < size:
+            f.seek(offsets[-1] + chunksize)
+            f.readline()
+            offset = f.tell()
+            if offset >= size:
+                break
+            offsets.append(offset)
+    offsets.append(size)
+    return [ (offsets[i], offsets[i+1]) for i in range(len(offsets)-1) ]
+
+def merge_records(records):
+    ''' returns OrderedDict of source file -> (compiler, incs, macros, openmp, options)
+
+    When a source file is compiled more than once, the last compilation is
+    used. Files are ordered by their first compilation.
+    '''
+
+    flags = collections.OrderedDict()
+    for record in records:
+        if record is None: continue
+        exepath, srcs, incs, macros, openmp, options = record
+        for src in srcs:
+            flags[src] = (exepath, incs, macros, openmp, options)
+    return flags
+
+def parse_strace(path, nprocs=None, chunksize=CHUNK_SIZE):
+    ''' returns compiler flags of source files in an strace log '''
+
+    chunks = [ (path, start, end) for start, end in split_chunks(path, chunksize) ]
+
+    if nprocs is None:
+        nprocs = multiprocessing.cpu_count()
+    nprocs = min(nprocs, len(chunks))
+
+    if nprocs > 1:
+        pool = multiprocessing.Pool(nprocs)
+        try:
+            results = pool.map(parse_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [ parse_chunk(chunk) for chunk in chunks ]
+
+    # pair unfinished and resumed execve across chunks
+    records = []
+    pending = {}
+    for events in results:
+        for event in events:
+            if event[0]=='exec':
+                pid, status, record = event[1:]
+                if status is None:
+                    pending[pid] = len(records)
+                if status is not False:
+                    records.append(record)
+            else:
+                pid, status = event[1:]
+                idx = pending.pop(pid, None)
+                if idx is not None and not status:
+                    records[idx] = None
+
+    return merge_records(records)
@@ -3,19 +3,18 @@
 
 import os
 import stat
+import shutil
 import kgtool
 import kgutils
-from . import kgcompiler
+from . import kgstrace
+from . import kgshim
 from kgconfig import Config
+from parser import kgincdb
 try:
     import configparser
 except:
     import ConfigParser as configparser
 
-STR_EX = 'execve('
-STR_EN = 'ENOENT'
-STR_UF = '<unfinished'
-STR_RE = 'resumed>'
 #TEMP_SH = '#!/bin/bash\n%s\n%s\n%s\n'
 #SH = '%s/_kgen_compflag_cmdwrapper.sh'
 
@@ -23,11 +22,30 @@ class CompFlag(kgtool.KGTool):
 
     def run(self):
 
-        # build app.
-        stracepath = '%s/%s'%(Config.path['outdir'], Config.stracefile)
         includepath = '%s/%s'%(Config.path['outdir'], Config.includefile)
 
-        if not os.path.exists(stracepath) or 'all' in Config.rebuild or 'strace' in Config.rebuild:
+        if Config.compflag['compdb']:
+            # compiler flags from a compilation database without building app.
+            if not os.path.exists(includepath) or 'all' in Config.rebuild or 'include' in Config.rebuild:
+                if not os.path.exists(Config.compflag['compdb']):
+                    kgutils.kgenexit('Compilation database is not found at: %s'%Config.compflag['compdb'])
+                self._geninclude(kgshim.parse_compdb(Config.compflag['compdb']), includepath)
+            else:
+                kgutils.logger.info('Reusing KGen include file: %s'%includepath)
+            return
+
+        if Config.compflag['capture']=='shim':
+            # absolute paths as build commands may change directory
+            capturedir = os.path.realpath('%s/%s'%(Config.path['outdir'], Config.compflag['dir']))
+            recorddir = '%s/%s'%(capturedir, kgshim.RECORD_DIR)
+            capturepath = '%s/%s'%(recorddir, kgshim.RECORD_FILE)
+        else:
+            stracepath = '%s/%s'%(Config.path['outdir'], Config.stracefile)
+            capturepath = stracepath
+
+        # build app.
+        if not os.path.exists(capturepath) or 'all' in Config.rebuild or 'strace' in Config.rebuild or \
+            Config.compflag['capture'] in Config.rebuild:
 
             # clean app.
             if Config.cmd_clean['cmds']:
@@ -39,46 +57,75 @@ class CompFlag(kgtool.KGTool):
             #    f.write(TEMP_SH%(Config.cmd_clean['cmds'], Config.prerun['build'], Config.cmd_build['cmds']))
             #st = os.stat(SH%Config.cwd)
             #os.chmod(SH%Config.cwd, st.st_mode | stat.S_IEXEC)
-            
-            if Config.prerun['build']:
-                cmdstr = '%s;%s'%(Config.prerun['build'], Config.cmd_build['cmds'])
+
+            if Config.compflag['capture']=='shim':
+                self._capture_shim(capturedir)
             else:
-                cmdstr = Config.cmd_build['cmds']
-
-            bld_cmd = 'strace -o %s -f -q -s 100000 -e trace=execve -v -- /bin/sh -c "%s"'%(stracepath, cmdstr)
-
-            kgutils.logger.info('Creating KGen strace logfile: %s'%stracepath)
-            try:
-                out, err, retcode = kgutils.run_shcmd(bld_cmd)
-                if retcode != 0 and os.path.exists(stracepath):
-                    os.remove(stracepath)
-                    kgutils.logger.error('%s\n%s'%(err, out))
-            except Exception as err:
-                if os.path.exists(stracepath):
-                    os.remove(stracepath)
-                kgutils.logger.error('%s\n%s'%(err, out))
-                raise
+                self._capture_strace(stracepath)
         else:
-            kgutils.logger.info('Reusing KGen strace logfile: %s'%stracepath)
+            kgutils.logger.info('Reusing KGen compiler command records: %s'%capturepath)
 
-        # parse strace.log and generate include.ini
+        # parse strace.log or shim records and generate include.ini
         if not os.path.exists(includepath) or 'all' in Config.rebuild or 'include' in Config.rebuild:
-            if stracepath:
-                self._geninclude(stracepath, includepath)
+            if not os.path.exists(capturepath):
+                kgutils.logger.error('Compiler command records are not found at: %s'%capturepath)
+                kgutils.kgenexit('Please retry KGen after generting compiler command records.')
+            if Config.compflag['capture']=='shim':
+                flags = kgshim.parse_records(recorddir)
             else:
-                kgutils.logger.error('strace logfile is not found at: %s'%stracepath)
-                kgutils.kgenexit('Please retry KGen after generting strace logfile.')
+                flags = kgstrace.parse_strace(stracepath)
+            self._geninclude(flags, includepath)
         else:
             kgutils.logger.info('Reusing KGen include file: %s'%includepath)
 
-    def _getpwd(self, env):
-        for item in env:
-            if item.startswith('PWD='):
-                return item[4:]
-        return None
+    def _buildcmd(self):
+        if Config.prerun['build']:
+            return '%s;%s'%(Config.prerun['build'], Config.cmd_build['cmds'])
+        else:
+            return Config.cmd_build['cmds']
+
+    def _capture_strace(self, stracepath):
+
+        bld_cmd = 'strace -o %s -f -q -s 100000 -e trace=execve -v -- /bin/sh -c "%s"'%(stracepath, self._buildcmd())
 
-    def _geninclude(self, stracepath, includepath):
-        import sys
+        kgutils.logger.info('Creating KGen strace logfile: %s'%stracepath)
+        try:
+            out, err, retcode = kgutils.run_shcmd(bld_cmd)
+            if retcode != 0 and os.path.exists(stracepath):
+                os.remove(stracepath)
+                kgutils.logger.error('%s\n%s'%(err, out))
+        except Exception as err:
+            if os.path.exists(stracepath):
+                os.remove(stracepath)
+            kgutils.logger.error('%s\n%s'%(err, out))
+            raise
+
+    def _capture_shim(self, capturedir):
+
+        shimdir = '%s/%s'%(capturedir, kgshim.SHIM_DIR)
+        recorddir = '%s/%s'%(capturedir, kgshim.RECORD_DIR)
+
+        if os.path.exists(recorddir):
+            shutil.rmtree(recorddir)
+        kgshim.create_shims(shimdir, recorddir)
+
+        # shims are placed after prerun commands that may change PATH
+        if Config.prerun['build']:
+            bld_cmd = '%s;%s'%(Config.prerun['build'], kgshim.shim_command(shimdir, Config.cmd_build['cmds']))
+        else:
+            bld_cmd = kgshim.shim_command(shimdir, Config.cmd_build['cmds'])
+
+        kgutils.logger.info('Creating KGen compiler command records: %s'%recorddir)
+        out, err, retcode = kgutils.run_shcmd(bld_cmd)
+        if retcode != 0:
+            shutil.rmtree(recorddir)
+            kgutils.logger.error('%s\n%s'%(err, out))
+        elif not os.path.exists('%s/%s'%(recorddir, kgshim.RECORD_FILE)):
+            shutil.rmtree(recorddir)
+            kgutils.logger.error('No compiler command is recorded by the shims in: %s'%shimdir)
+            kgutils.kgenexit('Please check that the build invokes compilers through PATH.')
+
+    def _geninclude(self, flags, includepath):
 
         kgutils.logger.info('Creating KGen include file: %s'%includepath)
 
@@ -102,65 +149,22 @@ class CompFlag(kgtool.KGTool):
                 cfg.set('import', key, value)
 
 
-        if not os.path.exists(stracepath):
-            raise Exception('No strace file is found.')
-
-        flags = {}
-        with open(stracepath, 'r') as f:
-            line = f.readline()
-            while(line):
-                pos_execve = line.find(STR_EX)
-                if pos_execve >= 0:
-                    pos_enoent = line.rfind(STR_EN)
-                    if pos_enoent < 0:
-                        pos_last = line.rfind(STR_UF)
-                        if pos_last < 0:
-                            pos_last = line.rfind(']')
-                        else:
-                            pos_last -= 1
-                        if pos_last >= 0:
-                            try:
-                                if sys.version_info < (3,0):
-                                    exec('exepath, cmdlist, env = %s'%line[pos_execve+len(STR_EX):(pos_last+1)])
-                                else:
-                                    vars = {}
-                                    exec('exepath, cmdlist, env = %s'%line[pos_execve+len(STR_EX):(pos_last+1)], globals(), vars)
-                                    exepath, cmdlist, env = vars['exepath'], vars['cmdlist'], vars['env']
-                                compid = cmdlist[0].split('/')[-1]
-                                if exepath and cmdlist and compid==cmdlist[0].split('/')[-1]:
-                                    compiler = kgcompiler.CompilerFactory.createCompiler(compid)
-                                    if compiler:
-                                        srcs, incs, macros, openmp, options = compiler.parse_option(cmdlist, self._getpwd(env))
-                                        if len(srcs)>0:
-                                            for src in srcs:
-                                                if src in flags:
-                                                    flags[src].append((exepath, incs, macros, openmp, options))
-                                                else:
-                                                    flags[src] = [ (exepath, incs, macros, openmp, options) ]
-                            except Exception as err:
-                                raise
-                                pass
-                line = f.readline()
-
-        for fname, incitems in flags.items():
-            if len(incitems)>0:
-                # save the last compiler set
-                compiler = incitems[-1][0]
-                incs = incitems[-1][1]
-                macros = incitems[-1][2]
-                options = incitems[-1][4]
-
-                if cfg.has_section(fname):
-                    print('Warning: %s section is dupulicated.' % fname)
-                else:
-                    cfg.add_section(fname)
-                    cfg.set(fname,'compiler', compiler)
-                    cfg.set(fname,'compiler_options', ' '.join(options))
-                    cfg.set(fname,'include',':'.join(incs))
-                    for name, value in macros:
-                        cfg.set(fname, name, value)
+        # flags of the last compilation of each file
+        for fname, (compiler, incs, macros, openmp, options) in flags.items():
+            if cfg.has_section(fname):
+                print('Warning: %s section is dupulicated.' % fname)
+            else:
+                cfg.add_section(fname)
+                cfg.set(fname,'compiler', compiler)
+                cfg.set(fname,'compiler_options', ' '.join(options))
+                cfg.set(fname,'include',':'.join(incs))
+                for name, value in macros:
+                    cfg.set(fname, name, value)
 
         if len(cfg.sections())>0:
             with open(includepath, 'w') as f:
                 cfg.write(f)
 
+            # indexed copy of include.ini read by Config.process_include_option
+            kgincdb.build('%s/%s'%(Config.path['outdir'], Config.includedbfile), includepath)
+
@@ -3,7 +3,12 @@
 
 import os
 import re
+import sys
 import glob
+import mmap
+import heapq
+import array
+import itertools
 import json
 import math
 import shutil
@@ -11,6 +16,10 @@ import datetime
 import collections
 import multiprocessing
 from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 from kgtool import KGModelingTool
 from parser.kgparse import KGGenType
@@ -18,9 +27,9 @@ from kggenfile import gensobj, KERNEL_ID_0, event_register, Gen_Statement, set_i
 import kgutils
 from kgconfig import Config
 try:
-    import configparser
-except:
-    import ConfigParser as configparser
+    import numpy
+except ImportError:
+    numpy = None
 
 BEGIN_DATA_MARKER = r'kgpathbegin'
 END_DATA_MARKER = r'kgpathend'
@@ -29,6 +38,12 @@ END_PATH_MARKER = r'kgdataend'
 
 _DEBUG = True
 
+# a coverage data file per MPI rank and OpenMP thread is a stream of records of
+# fileid and lineid as int32 and invocation and visits as int64 in native byte order
+RECORD_SIZE = 24
+if numpy is not None:
+    RECORD_DTYPE = numpy.dtype([ ('fileid', '=i4'), ('lineid', '=i4'), ('invoke', '=i8'), ('visits', '=i8') ])
+
 def chunks(l, n):
     for i in range(0, len(l), n):
         yield l[i:i + n]
@@ -36,7 +51,7 @@ def chunks(l, n):
 
 def update(d, u):
     for k, v in u.items():
-        if isinstance(v, collections.Mapping):
+        if isinstance(v, Mapping):
             r = update(d.get(k, {}), v)
             d[k] = r
         else:
@@ -49,6 +64,101 @@ def update(d, u):
                 d[k] = u[k]
     return d
 
+def select_triples(triples, minblocks, mintriples, maxtriples):
+    ''' selects (rank, thread, invoke) triples by greedy set cover of conditional blocks
+
+    triples is a list of (triple, weight, block ids). A triple covering the most blocks
+    that are not covered yet is selected first, and the larger weight wins a tie.
+    Selection stops when at least minblocks blocks are covered by at least mintriples
+    triples or when maxtriples triples are selected.
+    '''
+
+    gains = [] # number of blocks of each triple that are not covered yet
+    triplemap = {} # block id=[ triple index, ... ]
+    for tidx, (triple, weight, blocks) in enumerate(triples):
+        for block in blocks:
+            if block not in triplemap: triplemap[block] = []
+            triplemap[block].append(tidx)
+        gains.append(len(blocks))
+
+    heap = [ (-gain, -triple[1], tidx) for tidx, (gain, triple) in enumerate(zip(gains, triples)) ]
+    heapq.heapify(heap)
+
+    covered = 0
+    numcovered = 0
+    selected = []
+    while heap and (numcovered < minblocks or len(selected) < mintriples):
+        if maxtriples and len(selected) >= maxtriples: break
+
+        gain, weight, tidx = heapq.heappop(heap)
+        if -gain != gains[tidx]:
+            # gain has decreased since pushed
+            heapq.heappush(heap, (-gains[tidx], weight, tidx))
+            continue
+
+        selected.append(triples[tidx][0])
+        bitset = 0
+        for block in triples[tidx][2]:
+            bitset |= 1 << block
+        newbits = bitset & ~covered
+        covered |= newbits
+        numcovered += gains[tidx]
+
+        # least significant bit first
+        bits = bin(newbits)[:1:-1]
+        block = bits.find('1')
+        while block >= 0:
+            for other in triplemap[block]:
+                gains[other] -= 1
+            block = bits.find('1', block+1)
+
+    return selected, numcovered
+
+def aggregate_records(buf, nrecs):
+    ''' returns (fileid, lineid, invoke, visits) sorted by block and invocation with visits summed '''
+
+    if numpy is not None:
+        recs = numpy.frombuffer(buf, dtype=RECORD_DTYPE, count=nrecs)
+        recs = recs[numpy.lexsort((recs['invoke'], recs['lineid'], recs['fileid']))]
+        starts = numpy.ones(nrecs, dtype=bool)
+        starts[1:] = (recs['fileid'][1:] != recs['fileid'][:-1]) | (recs['lineid'][1:] != recs['lineid'][:-1]) | \
+            (recs['invoke'][1:] != recs['invoke'][:-1])
+        starts = numpy.flatnonzero(starts)
+        visits = numpy.add.reduceat(recs['visits'], starts)
+        recs = recs[starts]
+        return list(zip(recs['fileid'].tolist(), recs['lineid'].tolist(), recs['invoke'].tolist(), visits.tolist()))
+
+    # int64 values are combined from two int32 words
+    words = array.array('i')
+    if sys.version_info[0] < 3:
+        words.fromstring(buf[:RECORD_SIZE*nrecs])
+    else:
+        words.frombytes(buf[:RECORD_SIZE*nrecs])
+    if sys.byteorder == 'little':
+        lows, highs = (2, 4), (3, 5)
+    else:
+        lows, highs = (3, 5), (2, 4)
+    invokes = [ (h << 32) | (l & 0xffffffff) for l, h in zip(words[lows[0]::6], words[highs[0]::6]) ]
+    visits = [ (h << 32) | (l & 0xffffffff) for l, h in zip(words[lows[1]::6], words[highs[1]::6]) ]
+
+    counts = {}
+    for key, visit in zip(zip(words[0::6], words[1::6], invokes), visits):
+        counts[key] = counts.get(key, 0) + visit
+    return [ key + (visit, ) for key, visit in sorted(counts.items()) ]
+
+def read_datafile(dfile):
+    ''' memory-maps a coverage data file and aggregates its records '''
+
+    nrecs = os.path.getsize(dfile) // RECORD_SIZE
+    if nrecs == 0: return []
+
+    with open(dfile, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), nrecs*RECORD_SIZE, access=mmap.ACCESS_READ)
+    try:
+        return aggregate_records(buf, nrecs)
+    finally:
+        buf.close()
+
 def visit(path, invokes, usedfiles, usedlines, mpivisits, ompvisits, rank):
 
 #    # collect data
@@ -59,40 +169,46 @@ def visit(path, invokes, usedfiles, usedlines, mpivisits, ompvisits, rank):
 #    linevisits = {} # fileid:linenum=visits
 #    invokes = {} # mpirank:omptid:invoke=[(fileid, linenum, numvisits), ... ]
 
-    for tid in os.listdir(path):
-        if tid.isdigit() and os.path.isdir(os.path.join(path,tid)):
-            if tid not in invokes[rank]: invokes[rank][tid] = {}
-            omppath = os.path.join(path,tid)
-            for dfile in sorted(glob.glob('%s/*'%omppath)):
-                dfilename = os.path.basename(dfile)
-                match = re.match(r'^(\d+)\.(\d+)$', dfilename)
-                if match:
-                    fid = match.group(1)
-                    lid = match.group(2)
-
-                    if fid not in usedfiles: usedfiles.append(fid)
-
-                    if fid not in usedlines: usedlines[fid] = []
-                    if lid not in usedlines[fid]: usedlines[fid].append(lid)
- 
-                    if fid not in mpivisits: mpivisits[fid] = {}
-                    if lid not in mpivisits[fid]: mpivisits[fid][lid] = {}
-                    if rank not in mpivisits[fid][lid]: mpivisits[fid][lid][rank] = 0
-
-                    if fid not in ompvisits: ompvisits[fid] = {}
-                    if lid not in ompvisits[fid]: ompvisits[fid][lid] = {}
-                    if tid not in ompvisits[fid][lid]: ompvisits[fid][lid][tid] = 0
-
-                    with open(dfile, 'r') as f:
-                        for line in f:
-                            invoke = line[:16].strip()
-                            visit = int(line[16:].strip())
-                            
-                            if invoke not in invokes[rank][tid]: invokes[rank][tid][invoke] = []
-                            invokes[rank][tid][invoke].append( (fid, lid, visit) )
-
-                            mpivisits[fid][lid][rank] += visit 
-                            ompvisits[fid][lid][tid] += visit 
+    dfiles = []
+    for dfile in glob.glob('%s/%s.*'%(path, rank)):
+        match = re.match(r'^(\d+)\.(\d+)$', os.path.basename(dfile))
+        if match and match.group(1) == rank:
+            dfiles.append((int(match.group(2)), dfile))
+
+    for tidnum, dfile in sorted(dfiles):
+        tid = str(tidnum)
+        if tid not in invokes[rank]: invokes[rank][tid] = {}
+
+        # blocks are ordered by "fileid.lineid" as the names of previous data files
+        blocks = []
+        for (fidnum, lidnum), records in itertools.groupby(read_datafile(dfile), key=lambda r: r[:2]):
+            blocks.append(( '%d.%d'%(fidnum, lidnum), str(fidnum), str(lidnum), [ r[2:] for r in records ] ))
+        blocks.sort()
+
+        tidinvokes = invokes[rank][tid]
+        for dfilename, fid, lid, records in blocks:
+
+            if fid not in usedfiles: usedfiles.append(fid)
+
+            if fid not in usedlines: usedlines[fid] = []
+            if lid not in usedlines[fid]: usedlines[fid].append(lid)
+
+            if fid not in mpivisits: mpivisits[fid] = {}
+            if lid not in mpivisits[fid]: mpivisits[fid][lid] = {}
+            if rank not in mpivisits[fid][lid]: mpivisits[fid][lid][rank] = 0
+
+            if fid not in ompvisits: ompvisits[fid] = {}
+            if lid not in ompvisits[fid]: ompvisits[fid][lid] = {}
+            if tid not in ompvisits[fid][lid]: ompvisits[fid][lid][tid] = 0
+
+            for invoke, visit in records:
+                invoke = str(invoke)
+                if invoke not in tidinvokes: tidinvokes[invoke] = []
+                tidinvokes[invoke].append( (fid, lid, visit) )
+
+            visits = sum(visit for invoke, visit in records)
+            mpivisits[fid][lid][rank] += visits
+            ompvisits[fid][lid][tid] += visits
 
 def readdatafiles(inq, outq):
 
@@ -108,7 +224,7 @@ def readdatafiles(inq, outq):
     for path, mpirank in mpipaths:
         try:
             if mpirank not in invokes: invokes[mpirank] = {}
-            visit(os.path.join(path,mpirank), invokes, usedfiles, usedlines, mpivisits, ompvisits, mpirank)
+            visit(path, invokes, usedfiles, usedlines, mpivisits, ompvisits, mpirank)
         except Exception as e:
             kgutils.logger.info('ERROR at %s: %s'%(multiprocessing.current_process().name, str(e)))
         finally:
@@ -259,8 +375,9 @@ class Coverage(KGModelingTool):
 
                     mpipaths = []
                     for item in os.listdir(data_coverage_path):
-                        if item.isdigit() and os.path.isdir(os.path.join(data_coverage_path,item)):
-                            mpipaths.append((data_coverage_path,item))
+                        match = re.match(r'^(\d+)\.(\d+)$', item)
+                        if match and (data_coverage_path, match.group(1)) not in mpipaths:
+                            mpipaths.append((data_coverage_path, match.group(1)))
 
                     nprocs = min( len(mpipaths), multiprocessing.cpu_count()*1)
 
@@ -319,7 +436,7 @@ class Coverage(KGModelingTool):
                             file = []
                             #    fd.write('; <file number> = <path to file>\n')
                             for fileid, filepath in files.items():
-                                file.append( ( str(fileid), '%s/%s.kgen\n'%(coverage_realpath, os.path.basename(filepath)) ) )
+                                file.append( ( str(fileid), '%s/%s.kgen'%(coverage_realpath, os.path.basename(filepath)) ) )
                             file.append( ( 'used_files', ', '.join([ fid for fid in usedfiles ]) ) )
                             self.addsection('coverage', 'file', file)
 
@@ -338,14 +455,17 @@ class Coverage(KGModelingTool):
 
                             # invoke section
                             invoke = []
-                            #fd.write('; <MPI rank> < OpenMP Thread> <invocation order> =  <file number>:<line number><num of invocations> ...\n')
+                            # <MPI rank> < OpenMP Thread> <invocation order> =  <file number>:<line number>:<num of invocations> ...
 
                             for ranknum, threadnums in invokes.items():
                                 for threadnum, invokenums in threadnums.items():
                                     for invokenum, triples in invokenums.items():
-                                        invoke.append( ( '%s %s %s'%(ranknum, threadnum, invokenum), \
-                                            ', '.join( [ '%s:%s:%d'%(fid, lines[fid][lid], nivks) for fid, lid, nivks in triples ] ) ) )
-                            self.addsection('coverage', 'invoke', invoke)
+                                        for fid, lid, nivks in triples:
+                                            invoke.append( ( int(ranknum), int(threadnum), int(invokenum), int(fid), \
+                                                int(lines[fid][lid]), nivks ) )
+                            self.addtable('coverage', 'invoke', [ ('rank', 'INTEGER'), ('thread', 'INTEGER'), \
+                                ('invoke', 'INTEGER'), ('fileid', 'INTEGER'), ('linenum', 'INTEGER'), ('visits', 'INTEGER') ], \
+                                invoke, keys=3, sep=':')
 
                             kgutils.logger.info('    ***** Within "%s" kernel *****:'%Config.kernel['name'])
                             kgutils.logger.info('    * %d original source files have conditional blocks.'%len(files))
@@ -407,101 +527,55 @@ class Coverage(KGModelingTool):
             # read ini file
             kgutils.logger.info('Reading %s/%s'%(Config.path['outdir'], Config.modelfile))
 
-            cfg = configparser.ConfigParser()
-            cfg.optionxform = str
-            cfg.read('%s/%s'%(Config.path['outdir'], Config.modelfile))
-
-            number_of_files_having_condblocks = int(cfg.get('coverage.summary', 'number_of_files_having_condblocks'))
-            number_of_files_invoked = int(cfg.get('coverage.summary', 'number_of_files_invoked'))
-            number_of_condblocks_exist = int(cfg.get('coverage.summary', 'number_of_condblocks_exist'))
-            number_of_condblocks_invoked = int(cfg.get('coverage.summary', 'number_of_condblocks_invoked'))
+            number_of_files_having_condblocks = int(self.getoption('coverage', 'summary', 'number_of_files_having_condblocks'))
+            number_of_files_invoked = int(self.getoption('coverage', 'summary', 'number_of_files_invoked'))
+            number_of_condblocks_exist = int(self.getoption('coverage', 'summary', 'number_of_condblocks_exist'))
+            number_of_condblocks_invoked = int(self.getoption('coverage', 'summary', 'number_of_condblocks_invoked'))
 
             try:
                 filemap = {}
-                for opt in cfg.options('coverage.file'):
+                for opt, val in self.gettable('coverage', 'file'):
                     if opt.isdigit():
-                        filemap[opt] = cfg.get('coverage.file', opt) 
+                        filemap[opt] = val.strip()
 
                 blockmap = {}
-                for opt in cfg.options('coverage.block'):
+                for opt, val in self.gettable('coverage', 'block'):
                     if opt.isdigit():
-                        blockmap[opt] =  tuple( linenum for linenum in cfg.get('coverage.block', opt).split() )
+                        blockmap[opt] =  tuple( linenum.strip() for linenum in val.split(',') )
 
                 # <MPI rank> < OpenMP Thread> <invocation order> =  <file number>:<line number>:<num invokes> ... 
-                invokemap = {}
+                blockids = {} # (fileid, linenum)=block id
+                triples = [] # ((ranknum, threadnum, invokenum), visits, [ block id, ... ])
                 idx = 0
-                for opt in cfg.options('coverage.invoke'):
+                for triple, rows in itertools.groupby(self.gettable('coverage', 'invoke'), lambda row: row[:3]):
                     idx += 1
-                    ranknum, threadnum, invokenum = tuple( num for num in opt.split() )
-                    optval = cfg.get('coverage.invoke', opt).split(',')
-                    triples = tuple( triple.strip().split(':') for triple in optval )
-
-                    invokenum = int(invokenum)
-                    if invokenum not in invokemap:
-                        invokemap[invokenum] = {}
-                    if ranknum not in invokemap[invokenum]:
-                        invokemap[invokenum][ranknum] = {}
-                    if threadnum not in invokemap[invokenum][ranknum]:
-                        threadnums = {}
-                        invokemap[invokenum][ranknum][threadnum] = threadnums
-
-                    #threadnums = invokemap[invokenum][ranknum][threadnum]
-                    
-                    for fidstr, lnumstr, numinvokes in triples:
-                        fileid = fidstr
-                        linenum = lnumstr
-                        if fileid not in threadnums:
-                            threadnums[fileid] = {}
-                        if linenum not in threadnums[fileid]:
-                            threadnums[fileid][linenum] = 0
-                        threadnums[fileid][linenum] += int(numinvokes)
+
+                    visits = 0
+                    blocks = set()
+                    for ranknum, threadnum, invokenum, fileid, linenum, numinvokes in rows:
+                        blocks.add(blockids.setdefault((fileid, linenum), len(blockids)))
+                        visits += numinvokes
+                    triples.append( ( triple, visits, blocks ) )
 
                     if idx % 100000 == 0:
                         print('Processed %d items: %s'%(idx, datetime.datetime.now().strftime("%I:%M%p on %B %d, %Y")))
             except Exception as e:
                 raise Exception('Please check the format of coverage file: %s'%str(e))
 
+            # earlier invocations are preferred among equal candidates
+            triples.sort(key=lambda t: tuple( int(n) for n in t[0][::-1] ))
+
             THREASHOLD = Config.model['types']['code']['percentage'] / 100.0
             THREASHOLD_NUM = int(math.ceil(number_of_condblocks_invoked*THREASHOLD))
-            collected = []
-            triples = {}
-            numC = len(collected)
-            numD = Config.model['types']['code']['ndata']
-            for invokenum in sorted(invokemap.keys()):
-                if numC > THREASHOLD_NUM and numC >= numD: break
-                ranknums = invokemap[invokenum]
-                for ranknum in ranknums.keys():
-                    if numC > THREASHOLD_NUM and numC >= numD: break
-                    threadnums = invokemap[invokenum][ranknum]
-                    for threadnum in threadnums.keys():
-                        invokecount = 0
-                        if numC > THREASHOLD_NUM and numC >= numD: break
-                        fileids = invokemap[invokenum][ranknum][threadnum]
-                        for fileid in fileids.keys():
-                            if numC > THREASHOLD_NUM and numC >= numD: break
-                            if Config.data['maxnuminvokes'] and \
-                                invokecount >= Config.data['maxnuminvokes']:
-                                break
-                            lnums = invokemap[invokenum][ranknum][threadnum][fileid]
-                            for lnum, numinvokes in lnums.items():
-                                if numC > THREASHOLD_NUM and numC >= numD: break
-                                if Config.data['maxnuminvokes'] and \
-                                    invokecount >= Config.data['maxnuminvokes']:
-                                    break
-                                if (fileid, lnum, invokenum) not in collected:
-                                    collected.append((fileid, lnum, invokenum))
-                                    numC = len(collected)
-                                    if (ranknum, threadnum, invokenum) not in triples:
-                                        invokecount += 1
-                                        triples[(ranknum, threadnum, invokenum)] = None
+            selected, numcovered = select_triples(triples, THREASHOLD_NUM, Config.model['types']['code']['ndata'], \
+                Config.data['maxnuminvokes'])
+
+            kgutils.logger.info('%d of %d invoked conditional blocks are covered by %d triples.'%(numcovered, len(blockids), len(selected)))
 
             print('At least, %s of conditional blocks will be excuted by using following (MPI ranks, OpenMP Threads, Invokes) triples:'%'{:.1%}'.format(THREASHOLD))
-            print(','.join([ ':'.join([ str(n) for n in t ]) for t in triples.keys()]))
-            #print ''
-            #print 'Following (File id, line number) pairs are covered by above triples:'
-            #print str(collected)
+            print(','.join([ ':'.join([ str(n) for n in t ]) for t in selected ]))
 
-            for ranknum, threadnum, invokenum in triples.keys():
+            for ranknum, threadnum, invokenum in selected:
                 Config.invocation['triples'].append( ( (str(ranknum), str(ranknum)), (str(threadnum), str(threadnum)), \
                     (str(invokenum), str(invokenum)) ) )
 
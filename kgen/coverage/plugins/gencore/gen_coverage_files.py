@@ -288,274 +288,394 @@ class Gen_Coverage_File(Kgen_Plugin):
         part_append_gensnode(cblock, DECL_PART, statements.Common, attrs=attrs)
 
 
+
+
     ##################################
-    # adding coverage subroutine
+    # adding coverage module
     ##################################
 
-    def add_coverage(self, node):
-        #self.logger.debug('Begin add_coverage')
+    def add_covermodule(self, node):
 
-        if len(self.paths) == 0:
-            self.logger.warn('There is no valid conditional block.')
-            return
+        datapath = '%s/__data__'%getinfo('model_path')
+        codepath = '%s/%s'%(datapath, getinfo('coverage_typeid'))
 
-        maxlines = max([ len(lineids) for fileid, lineids in self.paths.values() ])
+        # block index of a conditional block is its lineid plus the offset of its file
+        offsets = [ 0 ]
+        for fileid in range(len(self.paths)):
+            offsets.append( offsets[-1] + len(self.get_linenumbers(fileid)) )
 
-        part_append_comment(node.kgen_parent, UNIT_PART, '')
-
-        # add subroutine
-        if getinfo('is_mpi_app'):
-            attrs = {'name': 'gen_coverage', 'args': ['mpicomm', 'fileid', 'lineid']}
+        if getinfo('is_openmp_app'):
+            maxthreads = getinfo('openmp_maxthreads')
         else:
-            attrs = {'name': 'gen_coverage', 'args': ['fileid', 'lineid']}
-        coversubr = part_append_gensnode(node.kgen_parent, UNIT_PART, block_statements.Subroutine, attrs=attrs)
+            maxthreads = 1
 
-        part_append_comment(coversubr, DECL_PART, '')
+        part_append_comment(node.kgen_parent, UNIT_PART, '')
 
-        attrs = {'type_spec': 'CHARACTER', 'selector':('4096', None), 'entity_decls': ['datapath']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Character, attrs=attrs)
+        attrs = {'name': 'kgen_cover_data'}
+        covermod = part_append_gensnode(node.kgen_parent, UNIT_PART, block_statements.Module, attrs=attrs)
 
-        attrs = {'type_spec': 'CHARACTER', 'selector':('6', None), 'entity_decls': ['filestr']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Character, attrs=attrs)
+        attrs = {'name':'ISO_C_BINDING', 'nature': 'INTRINSIC', 'isonly': True, 'items':['C_INT', 'C_INT32_T', 'C_INT64_T', 'C_FUNPTR', 'C_FUNLOC']}
+        part_append_gensnode(covermod, USE_PART, statements.Use, attrs=attrs)
 
-        attrs = {'type_spec': 'CHARACTER', 'selector':('6', None), 'entity_decls': ['linestr']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Character, attrs=attrs)
+        attrs = {'type_spec': 'INTEGER', 'attrspec': [ 'PARAMETER' ], 'entity_decls': ['kgen_cover_numfiles = %d'%len(self.paths), \
+            'kgen_cover_numblocks = %d'%offsets[-1], 'kgen_cover_maxthreads = %d'%maxthreads, 'kgen_cover_maxrecords = 4096']}
+        part_append_gensnode(covermod, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-        attrs = {'type_spec': 'CHARACTER', 'selector':('10', None), 'entity_decls': ['rankstr']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Character, attrs=attrs)
+        attrs = {'type_spec': 'INTEGER', 'attrspec': [ 'PARAMETER', 'DIMENSION(0:kgen_cover_numfiles)' ], \
+            'entity_decls': ['kgen_cover_offsets = (/ %s /)'%', '.join([ str(offset) for offset in offsets ])]}
+        part_append_gensnode(covermod, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-        attrs = {'type_spec': 'CHARACTER', 'selector':('6', None), 'entity_decls': ['threadstr']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Character, attrs=attrs)
+        # invocation and number of visits of each block that are not saved yet
+        attrs = {'type_spec': 'INTEGER', 'attrspec': [ 'DIMENSION(0:kgen_cover_numblocks-1,0:kgen_cover_maxthreads-1)' ], \
+            'entity_decls': ['kgen_cover_invokes = 0']}
+        part_append_gensnode(covermod, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-        attrs = {'type_spec': 'CHARACTER', 'selector':('1', None), 'entity_decls': ['dummychar']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Character, attrs=attrs)
+        attrs = {'type_spec': 'INTEGER', 'selector': (None, 'C_INT64_T'), \
+            'attrspec': [ 'DIMENSION(0:kgen_cover_numblocks-1,0:kgen_cover_maxthreads-1)' ], 'entity_decls': ['kgen_cover_visits = 0']}
+        part_append_gensnode(covermod, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-        attrs = {'type_spec': 'INTEGER', 'entity_decls': [ 'ierror']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+        # saved records of fileid and lineid as int32, and invocation and visits as int64
+        attrs = {'type_spec': 'INTEGER', 'selector': (None, 'C_INT32_T'), \
+            'attrspec': [ 'DIMENSION(2,kgen_cover_maxrecords,0:kgen_cover_maxthreads-1)' ], 'entity_decls': ['kgen_cover_blocks']}
+        part_append_gensnode(covermod, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-        if getinfo('is_mpi_app'):
+        attrs = {'type_spec': 'INTEGER', 'selector': (None, 'C_INT64_T'), \
+            'attrspec': [ 'DIMENSION(2,kgen_cover_maxrecords,0:kgen_cover_maxthreads-1)' ], 'entity_decls': ['kgen_cover_counts']}
+        part_append_gensnode(covermod, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-            for mod_name, use_names in getinfo('mpi_use'):
-                attrs = {'name':mod_name, 'isonly': True, 'items':use_names}
-                part_append_gensnode(coversubr, USE_PART, statements.Use, attrs=attrs)
+        attrs = {'type_spec': 'INTEGER', 'attrspec': [ 'DIMENSION(0:kgen_cover_maxthreads-1)' ], 'entity_decls': ['kgen_cover_numrecords = 0']}
+        part_append_gensnode(covermod, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-            attrs = {'type_spec': 'LOGICAL', 'attrspec': [ 'SAVE' ], 'entity_decls': ['kgen_initialized = .FALSE.']}
-            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Logical, attrs=attrs)
+        attrs = {'type_spec': 'INTEGER', 'entity_decls': ['kgen_cover_rank = 0']}
+        part_append_gensnode(covermod, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-            attrs = {'type_spec': 'INTEGER', 'entity_decls': ['myrank', 'numranks']}
-            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+        attrs = {'type_spec': 'LOGICAL', 'entity_decls': ['kgen_cover_initialized = .FALSE.']}
+        part_append_gensnode(covermod, DECL_PART, typedecl_statements.Logical, attrs=attrs)
 
-            attrs = {'type_spec': 'INTEGER', 'attrspec': [ 'INTENT(IN)' ], 'entity_decls': ['mpicomm']}
-            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+        part_append_comment(covermod, DECL_PART, '')
+        part_append_comment(covermod, DECL_PART, 'INTERFACE', style='rawtext')
+        part_append_comment(covermod, DECL_PART, '    FUNCTION kgen_cover_atexit(func) BIND(C, NAME="atexit")', style='rawtext')
+        part_append_comment(covermod, DECL_PART, '        IMPORT :: C_INT, C_FUNPTR', style='rawtext')
+        part_append_comment(covermod, DECL_PART, '        INTEGER(C_INT) :: kgen_cover_atexit', style='rawtext')
+        part_append_comment(covermod, DECL_PART, '        TYPE(C_FUNPTR), VALUE :: func', style='rawtext')
+        part_append_comment(covermod, DECL_PART, '    END FUNCTION', style='rawtext')
+        part_append_comment(covermod, DECL_PART, 'END INTERFACE', style='rawtext')
+        part_append_comment(covermod, DECL_PART, '')
 
-        attrs = {'type_spec': 'CHARACTER', 'selector':('10', None), 'entity_decls': ['numranksstr']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Character, attrs=attrs)
+        part_append_gensnode(covermod, CONTAINS_PART, statements.Contains)
 
-        if getinfo('is_openmp_app'):
-            attrs = {'type_spec': 'INTEGER', 'entity_decls': ['OMP_GET_THREAD_NUM', 'OMP_GET_NUM_THREADS']}
-            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+        ############# initialization ########################
 
-            attrs = {'type_spec': 'INTEGER', 'attrspec': [ 'DIMENSION(0:%d)'%(getinfo('openmp_maxthreads')-1) ], 'entity_decls': ['kgen_invokes']}
-            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+        part_append_comment(covermod, SUBP_PART, '')
 
+        if getinfo('is_mpi_app'):
+            attrs = {'name': 'kgen_cover_init', 'args': ['mpicomm']}
         else:
-            attrs = {'type_spec': 'INTEGER', 'entity_decls': ['kgen_invokes']}
-            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
-
-        attrs = {'type_spec': 'CHARACTER', 'selector':('6', None), 'entity_decls': ['numthreadsstr']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Character, attrs=attrs)
-
-        attrs = {'type_spec': 'INTEGER', 'entity_decls': [ 'invokes', 'visits', 'intnum' ]}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+            attrs = {'name': 'kgen_cover_init', 'args': []}
+        initsubr = part_append_gensnode(covermod, SUBP_PART, block_statements.Subroutine, attrs=attrs)
 
-        attrs = {'type_spec': 'INTEGER', 'entity_decls': ['mpiunit', 'ompunit', 'dataunit']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
-
-        attrs = {'type_spec': 'LOGICAL', 'entity_decls': ['istrue']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Logical, attrs=attrs)
+        if getinfo('is_mpi_app'):
+            for mod_name, use_names in getinfo('mpi_use'):
+                attrs = {'name':mod_name, 'isonly': True, 'items':use_names}
+                part_append_gensnode(initsubr, USE_PART, statements.Use, attrs=attrs)
 
-        attrs = {'type_spec': 'INTEGER', 'attrspec': ['INTENT(IN)'], 'entity_decls': ['fileid', 'lineid']}
-        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+            attrs = {'type_spec': 'INTEGER', 'attrspec': [ 'INTENT(IN)' ], 'entity_decls': ['mpicomm']}
+            part_append_gensnode(initsubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-        attrs = {'items': [ ( 'state', ('kgen_invokes', ) ) ]}
-        part_append_gensnode(coversubr, DECL_PART, statements.Common, attrs=attrs)
+        if getinfo('is_openmp_app'):
+            attrs = {'type_spec': 'INTEGER', 'entity_decls': ['OMP_GET_NUM_THREADS']}
+            part_append_gensnode(initsubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-        part_append_comment(coversubr, DECL_PART, '')
+        attrs = {'type_spec': 'INTEGER', 'entity_decls': ['numranks', 'numthreads', 'mpiunit', 'ompunit', 'ierror']}
+        part_append_gensnode(initsubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-        ############# exec_part ########################
+        attrs = {'type_spec': 'LOGICAL', 'entity_decls': ['istrue']}
+        part_append_gensnode(initsubr, DECL_PART, typedecl_statements.Logical, attrs=attrs)
 
-        datapath = '%s/__data__'%getinfo('model_path')
-        codepath = '%s/%s'%(datapath, getinfo('coverage_typeid'))
+        part_append_comment(initsubr, DECL_PART, '')
 
         if getinfo('is_openmp_app'):
-            part_append_comment(coversubr, EXEC_PART, 'CRITICAL (kgen_cover)', style='openmp')
-
-        attrs = {'specs': [ 'filestr', '"(I6)"' ], 'items': [ 'fileid' ]}
-        part_append_gensnode(coversubr, EXEC_PART, statements.Write, attrs=attrs)
-
-        attrs = {'specs': [ 'linestr', '"(I6)"' ], 'items': [ 'lineid' ]}
-        part_append_gensnode(coversubr, EXEC_PART, statements.Write, attrs=attrs)
+            part_append_comment(initsubr, EXEC_PART, 'CRITICAL (kgen_cover)', style='openmp')
 
-        topobj = coversubr
+        attrs = {'expr': '.NOT. kgen_cover_initialized'}
+        topobj = part_append_gensnode(initsubr, EXEC_PART, block_statements.IfThen, attrs=attrs)
 
         if getinfo('is_mpi_app'):
-
-            attrs = {'designator': 'MPI_INITIALIZED', 'items': [ 'kgen_initialized', 'ierror' ]}
+            attrs = {'designator': 'MPI_INITIALIZED', 'items': [ 'istrue', 'ierror' ]}
             part_append_gensnode(topobj, EXEC_PART, statements.Call, attrs=attrs)
 
-            attrs = {'expr': 'kgen_initialized .AND. ( ierror .EQ. MPI_SUCCESS )'}
+            attrs = {'expr': 'istrue .AND. ( ierror .EQ. MPI_SUCCESS )'}
             topobj = part_append_gensnode(topobj, EXEC_PART, block_statements.IfThen, attrs=attrs)
 
-            attrs = {'designator': 'MPI_COMM_RANK', 'items': [ 'mpicomm', 'myrank', 'ierror' ]}
+            attrs = {'designator': 'MPI_COMM_RANK', 'items': [ 'mpicomm', 'kgen_cover_rank', 'ierror' ]}
             part_append_gensnode(topobj, EXEC_PART, statements.Call, attrs=attrs)
 
-            attrs = {'specs': [ 'rankstr', '"(I10)"' ], 'items': [ 'myrank' ]}
-            part_append_gensnode(topobj, EXEC_PART, statements.Write, attrs=attrs)
+            attrs = {'designator': 'MPI_COMM_SIZE', 'items': [ 'mpicomm', 'numranks', 'ierror' ]}
+            part_append_gensnode(topobj, EXEC_PART, statements.Call, attrs=attrs)
         else:
-            attrs = {'specs': [ 'rankstr', '"(I1)"' ], 'items': [ '0' ]}
-            part_append_gensnode(topobj, EXEC_PART, statements.Write, attrs=attrs)
+            attrs = {'variable': 'numranks', 'sign': '=', 'expr': '1'}
+            part_append_gensnode(topobj, EXEC_PART, statements.Assignment, attrs=attrs)
 
         if getinfo('is_openmp_app'):
-            attrs = {'specs': [ 'threadstr', '"(I6)"' ], 'items': [ 'OMP_GET_THREAD_NUM()' ]}
-            part_append_gensnode(topobj, EXEC_PART, statements.Write, attrs=attrs)
+            attrs = {'variable': 'numthreads', 'sign': '=', 'expr': 'OMP_GET_NUM_THREADS()'}
         else:
-            attrs = {'specs': [ 'threadstr', '"(I1)"' ], 'items': [ '0' ]}
-            part_append_gensnode(topobj, EXEC_PART, statements.Write, attrs=attrs)
+            attrs = {'variable': 'numthreads', 'sign': '=', 'expr': '1'}
+        part_append_gensnode(topobj, EXEC_PART, statements.Assignment, attrs=attrs)
 
         # nummpiranks
-        attrs = {'specs': ['FILE="%s/mpi"'%codepath, 'EXIST=istrue']}
-        part_append_gensnode(topobj, EXEC_PART, statements.Inquire, attrs=attrs)
-
-        attrs = {'expr': '.NOT. istrue'}
-        ifnotmpi = part_append_gensnode(topobj, EXEC_PART, block_statements.IfThen, attrs=attrs)
-
-        if getinfo('is_mpi_app'):
-
-            attrs = {'designator': 'MPI_COMM_SIZE', 'items': [ 'mpicomm', 'numranks', 'ierror' ]}
-            part_append_gensnode(ifnotmpi, EXEC_PART, statements.Call, attrs=attrs)
-
-            attrs = {'specs': [ 'numranksstr', '"(I10)"' ], 'items': [ 'numranks' ]}
-            part_append_gensnode(ifnotmpi, EXEC_PART, statements.Write, attrs=attrs)
-
-        else:
-            attrs = {'specs': [ 'numranksstr', '"(I10)"' ], 'items': [ '1' ]}
-            part_append_gensnode(ifnotmpi, EXEC_PART, statements.Write, attrs=attrs)
-
         attrs = {'specs': ['NEWUNIT=mpiunit', 'FILE="%s/mpi"'%codepath, \
             'STATUS="NEW"', 'ACTION="WRITE"', 'FORM="FORMATTED"', 'IOSTAT=ierror']}
-        part_append_gensnode(ifnotmpi, EXEC_PART, statements.Open, attrs=attrs)
+        part_append_gensnode(topobj, EXEC_PART, statements.Open, attrs=attrs)
 
         attrs = {'expr': 'ierror .EQ. 0'}
-        ifmpiopen = part_append_gensnode(ifnotmpi, EXEC_PART, block_statements.IfThen, attrs=attrs)
+        ifmpiopen = part_append_gensnode(topobj, EXEC_PART, block_statements.IfThen, attrs=attrs)
 
-        attrs = {'specs': [ 'UNIT=mpiunit', 'FMT="(A)"' ], 'items': [ 'TRIM(ADJUSTL(numranksstr))' ]}
+        attrs = {'specs': [ 'UNIT=mpiunit', 'FMT="(I0)"' ], 'items': [ 'numranks' ]}
         part_append_gensnode(ifmpiopen, EXEC_PART, statements.Write, attrs=attrs)
 
         attrs = {'specs': ['UNIT=mpiunit']}
         part_append_gensnode(ifmpiopen, EXEC_PART, statements.Close, attrs=attrs)
 
         # numopenmpthreads
-        attrs = {'specs': ['FILE="%s/openmp"'%codepath, 'EXIST=istrue']}
-        part_append_gensnode(topobj, EXEC_PART, statements.Inquire, attrs=attrs)
-
-        attrs = {'expr': '.NOT. istrue'}
-        ifnotomp = part_append_gensnode(topobj, EXEC_PART, block_statements.IfThen, attrs=attrs)
-
-        if getinfo('is_openmp_app'):
-            attrs = {'specs': [ 'numthreadsstr', '"(I6)"' ], 'items': [ 'OMP_GET_NUM_THREADS()' ]}
-            part_append_gensnode(ifnotomp, EXEC_PART, statements.Write, attrs=attrs)
-        else:
-            attrs = {'specs': [ 'numthreadsstr', '"(I1)"' ], 'items': [ '1' ]}
-            part_append_gensnode(ifnotomp, EXEC_PART, statements.Write, attrs=attrs)
-
         attrs = {'specs': ['NEWUNIT=ompunit', 'FILE="%s/openmp"'%codepath, \
             'STATUS="NEW"', 'ACTION="WRITE"', 'FORM="FORMATTED"', 'IOSTAT=ierror']}
-        part_append_gensnode(ifnotomp, EXEC_PART, statements.Open, attrs=attrs)
+        part_append_gensnode(topobj, EXEC_PART, statements.Open, attrs=attrs)
 
         attrs = {'expr': 'ierror .EQ. 0'}
-        ifompopen = part_append_gensnode(ifnotomp, EXEC_PART, block_statements.IfThen, attrs=attrs)
+        ifompopen = part_append_gensnode(topobj, EXEC_PART, block_statements.IfThen, attrs=attrs)
 
-        attrs = {'specs': [ 'UNIT=ompunit', 'FMT="(A)"' ], 'items': [ 'TRIM(ADJUSTL(numthreadsstr))' ]}
+        attrs = {'specs': [ 'UNIT=ompunit', 'FMT="(I0)"' ], 'items': [ 'numthreads' ]}
         part_append_gensnode(ifompopen, EXEC_PART, statements.Write, attrs=attrs)
 
         attrs = {'specs': ['UNIT=ompunit']}
         part_append_gensnode(ifompopen, EXEC_PART, statements.Close, attrs=attrs)
 
-        # create data directory
-        attrs = {'specs': [ 'datapath', '*' ], 'items': [ '"%s/" // TRIM(ADJUSTL(rankstr)) // "/" // TRIM(ADJUSTL(threadstr))'%codepath ]}
-        part_append_gensnode(topobj, EXEC_PART, statements.Write, attrs=attrs)
+        # counters are written once when the application exits
+        attrs = {'variable': 'ierror', 'sign': '=', 'expr': 'kgen_cover_atexit(C_FUNLOC(kgen_cover_finalize))'}
+        part_append_gensnode(topobj, EXEC_PART, statements.Assignment, attrs=attrs)
+
+        attrs = {'variable': 'kgen_cover_initialized', 'sign': '=', 'expr': '.TRUE.'}
+        part_append_gensnode(topobj, EXEC_PART, statements.Assignment, attrs=attrs)
+
+        if getinfo('is_openmp_app'):
+            part_append_comment(initsubr, EXEC_PART, 'END CRITICAL (kgen_cover)', style='openmp')
+
+        part_append_comment(initsubr, EXEC_PART, '')
+
+        ############# saving counters of a block ########################
+
+        part_append_comment(covermod, SUBP_PART, '')
+
+        attrs = {'name': 'kgen_cover_save', 'args': ['fileid', 'lineid', 'tid']}
+        savesubr = part_append_gensnode(covermod, SUBP_PART, block_statements.Subroutine, attrs=attrs)
+
+        attrs = {'type_spec': 'INTEGER', 'attrspec': ['INTENT(IN)'], 'entity_decls': ['fileid', 'lineid', 'tid']}
+        part_append_gensnode(savesubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+
+        attrs = {'type_spec': 'INTEGER', 'entity_decls': ['blk', 'rec']}
+        part_append_gensnode(savesubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+
+        part_append_comment(savesubr, DECL_PART, '')
+
+        attrs = {'expr': 'kgen_cover_numrecords(tid) .GE. kgen_cover_maxrecords'}
+        iffull = part_append_gensnode(savesubr, EXEC_PART, block_statements.IfThen, attrs=attrs)
 
-        attrs = {'specs': ['FILE=TRIM(ADJUSTL(datapath)) // "/" // TRIM(ADJUSTL(filestr)) // "." // TRIM(ADJUSTL(linestr))', 'EXIST=istrue']}
-        part_append_gensnode(topobj, EXEC_PART, statements.Inquire, attrs=attrs)
+        attrs = {'designator': 'kgen_cover_write', 'items': [ 'tid' ]}
+        part_append_gensnode(iffull, EXEC_PART, statements.Call, attrs=attrs)
 
-        attrs = {'expr': 'istrue'}
-        ifexist = part_append_gensnode(topobj, EXEC_PART, block_statements.IfThen, attrs=attrs)
+        attrs = {'variable': 'blk', 'sign': '=', 'expr': 'kgen_cover_offsets(fileid) + lineid'}
+        part_append_gensnode(savesubr, EXEC_PART, statements.Assignment, attrs=attrs)
 
-        attrs = {'specs': ['NEWUNIT=dataunit', 'FILE=TRIM(ADJUSTL(datapath)) // "/" // TRIM(ADJUSTL(filestr)) // "." // TRIM(ADJUSTL(linestr))', \
-            'STATUS="OLD"', 'ACTION="READWRITE"', 'FORM="FORMATTED"', 'ACCESS="DIRECT"', 'RECL=33', 'IOSTAT=ierror']}
-        part_append_gensnode(ifexist, EXEC_PART, statements.Open, attrs=attrs)
+        attrs = {'variable': 'rec', 'sign': '=', 'expr': 'kgen_cover_numrecords(tid) + 1'}
+        part_append_gensnode(savesubr, EXEC_PART, statements.Assignment, attrs=attrs)
+
+        attrs = {'variable': 'kgen_cover_blocks(:,rec,tid)', 'sign': '=', 'expr': '(/ INT(fileid, C_INT32_T), INT(lineid, C_INT32_T) /)'}
+        part_append_gensnode(savesubr, EXEC_PART, statements.Assignment, attrs=attrs)
+
+        attrs = {'variable': 'kgen_cover_counts(:,rec,tid)', 'sign': '=', \
+            'expr': '(/ INT(kgen_cover_invokes(blk,tid), C_INT64_T), kgen_cover_visits(blk,tid) /)'}
+        part_append_gensnode(savesubr, EXEC_PART, statements.Assignment, attrs=attrs)
+
+        attrs = {'variable': 'kgen_cover_numrecords(tid)', 'sign': '=', 'expr': 'rec'}
+        part_append_gensnode(savesubr, EXEC_PART, statements.Assignment, attrs=attrs)
+
+        attrs = {'variable': 'kgen_cover_visits(blk,tid)', 'sign': '=', 'expr': '0'}
+        part_append_gensnode(savesubr, EXEC_PART, statements.Assignment, attrs=attrs)
+
+        part_append_comment(savesubr, EXEC_PART, '')
+
+        ############# writing saved counters of a thread ########################
+
+        part_append_comment(covermod, SUBP_PART, '')
+
+        attrs = {'name': 'kgen_cover_write', 'args': ['tid']}
+        writesubr = part_append_gensnode(covermod, SUBP_PART, block_statements.Subroutine, attrs=attrs)
+
+        attrs = {'type_spec': 'INTEGER', 'attrspec': ['INTENT(IN)'], 'entity_decls': ['tid']}
+        part_append_gensnode(writesubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+
+        attrs = {'type_spec': 'CHARACTER', 'selector':('10', None), 'entity_decls': ['rankstr', 'threadstr']}
+        part_append_gensnode(writesubr, DECL_PART, typedecl_statements.Character, attrs=attrs)
+
+        attrs = {'type_spec': 'INTEGER', 'entity_decls': ['dataunit', 'ierror', 'rec']}
+        part_append_gensnode(writesubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+
+        part_append_comment(writesubr, DECL_PART, '')
+
+        attrs = {'specs': [ 'rankstr', '"(I0)"' ], 'items': [ 'kgen_cover_rank' ]}
+        part_append_gensnode(writesubr, EXEC_PART, statements.Write, attrs=attrs)
+
+        attrs = {'specs': [ 'threadstr', '"(I0)"' ], 'items': [ 'tid' ]}
+        part_append_gensnode(writesubr, EXEC_PART, statements.Write, attrs=attrs)
+
+        attrs = {'specs': ['NEWUNIT=dataunit', 'FILE="%s/" // TRIM(rankstr) // "." // TRIM(threadstr)'%codepath, \
+            'STATUS="UNKNOWN"', 'POSITION="APPEND"', 'ACTION="WRITE"', 'ACCESS="STREAM"', 'FORM="UNFORMATTED"', 'IOSTAT=ierror']}
+        part_append_gensnode(writesubr, EXEC_PART, statements.Open, attrs=attrs)
 
         attrs = {'expr': 'ierror .EQ. 0'}
-        ifopen = part_append_gensnode(ifexist, EXEC_PART, block_statements.IfThen, attrs=attrs)
+        ifopen = part_append_gensnode(writesubr, EXEC_PART, block_statements.IfThen, attrs=attrs)
+
+        attrs = {'specs': [ 'UNIT=dataunit' ], 'items': [ '( kgen_cover_blocks(:,rec,tid), kgen_cover_counts(:,rec,tid), rec=1, kgen_cover_numrecords(tid) )' ]}
+        part_append_gensnode(ifopen, EXEC_PART, statements.Write, attrs=attrs)
 
-        attrs = {'specs': ['UNIT=dataunit', 'SIZE=intnum']}
-        part_append_gensnode(ifopen, EXEC_PART, statements.Inquire, attrs=attrs)
+        attrs = {'specs': ['UNIT=dataunit']}
+        part_append_gensnode(ifopen, EXEC_PART, statements.Close, attrs=attrs)
 
-        attrs = {'specs': [ 'UNIT=dataunit', 'REC=intnum/33', 'FMT="(2I16,1A)"' ], 'items': [ 'invokes', 'visits', 'dummychar' ]}
-        part_append_gensnode(ifopen, EXEC_PART, statements.Read, attrs=attrs)
+        attrs = {'variable': 'kgen_cover_numrecords(tid)', 'sign': '=', 'expr': '0'}
+        part_append_gensnode(writesubr, EXEC_PART, statements.Assignment, attrs=attrs)
 
-        if getinfo('is_openmp_app'):
-            attrs = {'expr': 'invokes .EQ. kgen_invokes(OMP_GET_THREAD_NUM())'}
+        part_append_comment(writesubr, EXEC_PART, '')
+
+        ############# finalization ########################
+
+        part_append_comment(covermod, SUBP_PART, '')
+
+        attrs = {'name': 'kgen_cover_finalize', 'args': [], 'bind': ['C']}
+        finalsubr = part_append_gensnode(covermod, SUBP_PART, block_statements.Subroutine, attrs=attrs)
+
+        attrs = {'type_spec': 'INTEGER', 'entity_decls': ['tid', 'fileid', 'lineid']}
+        part_append_gensnode(finalsubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+
+        part_append_comment(finalsubr, DECL_PART, '')
+
+        attrs = {'loopcontrol': 'tid=0, kgen_cover_maxthreads-1'}
+        dotid = part_append_gensnode(finalsubr, EXEC_PART, block_statements.Do, attrs=attrs)
+
+        attrs = {'loopcontrol': 'fileid=0, kgen_cover_numfiles-1'}
+        dofile = part_append_gensnode(dotid, EXEC_PART, block_statements.Do, attrs=attrs)
+
+        attrs = {'loopcontrol': 'lineid=0, kgen_cover_offsets(fileid+1)-kgen_cover_offsets(fileid)-1'}
+        doline = part_append_gensnode(dofile, EXEC_PART, block_statements.Do, attrs=attrs)
+
+        attrs = {'expr': 'kgen_cover_visits(kgen_cover_offsets(fileid)+lineid,tid) .GT. 0'}
+        ifvisit = part_append_gensnode(doline, EXEC_PART, block_statements.IfThen, attrs=attrs)
+
+        attrs = {'designator': 'kgen_cover_save', 'items': [ 'fileid', 'lineid', 'tid' ]}
+        part_append_gensnode(ifvisit, EXEC_PART, statements.Call, attrs=attrs)
+
+        attrs = {'expr': 'kgen_cover_numrecords(tid) .GT. 0'}
+        ifrecord = part_append_gensnode(dotid, EXEC_PART, block_statements.IfThen, attrs=attrs)
+
+        attrs = {'designator': 'kgen_cover_write', 'items': [ 'tid' ]}
+        part_append_gensnode(ifrecord, EXEC_PART, statements.Call, attrs=attrs)
+
+        part_append_comment(finalsubr, EXEC_PART, '')
+
+    ##################################
+    # adding coverage subroutine
+    ##################################
+
+    def add_coverage(self, node):
+        #self.logger.debug('Begin add_coverage')
+
+        if len(self.paths) == 0:
+            self.logger.warn('There is no valid conditional block.')
+            return
+
+        self.add_covermodule(node)
+
+        part_append_comment(node.kgen_parent, UNIT_PART, '')
+
+        # add subroutine
+        if getinfo('is_mpi_app'):
+            attrs = {'name': 'gen_coverage', 'args': ['mpicomm', 'fileid', 'lineid']}
         else:
-            attrs = {'expr': 'invokes .EQ. kgen_invokes'}
-        ifmatch = part_append_gensnode(ifopen, EXEC_PART, block_statements.IfThen, attrs=attrs)
+            attrs = {'name': 'gen_coverage', 'args': ['fileid', 'lineid']}
+        coversubr = part_append_gensnode(node.kgen_parent, UNIT_PART, block_statements.Subroutine, attrs=attrs)
 
-        attrs = {'variable': 'visits', 'sign': '=', 'expr': 'visits + 1'}
-        part_append_gensnode(ifmatch, EXEC_PART, statements.Assignment, attrs=attrs)
+        attrs = {'name':'kgen_cover_data', 'isonly': True, 'items':['kgen_cover_initialized', 'kgen_cover_offsets', \
+            'kgen_cover_invokes', 'kgen_cover_visits', 'kgen_cover_init', 'kgen_cover_save']}
+        part_append_gensnode(coversubr, USE_PART, statements.Use, attrs=attrs)
 
-        attrs = {'specs': [ 'UNIT=dataunit', 'REC=intnum/33', 'FMT="(2I16,1A)"' ], 'items': [ 'invokes', 'visits', 'NEW_LINE("A")']}
-        part_append_gensnode(ifmatch, EXEC_PART, statements.Write, attrs=attrs)
+        part_append_comment(coversubr, DECL_PART, '')
 
-        part_append_gensnode(ifmatch, EXEC_PART, statements.Else)
+        if getinfo('is_mpi_app'):
+            attrs = {'type_spec': 'INTEGER', 'attrspec': [ 'INTENT(IN)' ], 'entity_decls': ['mpicomm']}
+            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+
+        attrs = {'type_spec': 'INTEGER', 'attrspec': ['INTENT(IN)'], 'entity_decls': ['fileid', 'lineid']}
+        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+
+        attrs = {'type_spec': 'INTEGER', 'entity_decls': ['blk', 'tid']}
+        part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
         if getinfo('is_openmp_app'):
-            attrs = {'specs': [ 'UNIT=dataunit', 'REC=(intnum/33+1)', 'FMT="(2I16,1A)"' ], 'items': [ 'kgen_invokes(OMP_GET_THREAD_NUM())', '1', 'NEW_LINE("A")' ]}
+            attrs = {'type_spec': 'INTEGER', 'entity_decls': ['OMP_GET_THREAD_NUM']}
+            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
+
+            attrs = {'type_spec': 'INTEGER', 'attrspec': [ 'DIMENSION(0:%d)'%(getinfo('openmp_maxthreads')-1) ], 'entity_decls': ['kgen_invokes']}
+            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
         else:
-            attrs = {'specs': [ 'UNIT=dataunit', 'REC=(intnum/33+1)', 'FMT="(2I16,1A)"' ], 'items': [ 'kgen_invokes', '1', 'NEW_LINE("A")' ]}
-        part_append_gensnode(ifmatch, EXEC_PART, statements.Write, attrs=attrs)
+            attrs = {'type_spec': 'INTEGER', 'entity_decls': ['kgen_invokes']}
+            part_append_gensnode(coversubr, DECL_PART, typedecl_statements.Integer, attrs=attrs)
 
-        attrs = {'specs': ['UNIT=dataunit']}
-        part_append_gensnode(ifopen, EXEC_PART, statements.Close, attrs=attrs)
+        attrs = {'items': [ ( 'state', ('kgen_invokes', ) ) ]}
+        part_append_gensnode(coversubr, DECL_PART, statements.Common, attrs=attrs)
 
-        part_append_gensnode(ifexist, EXEC_PART, statements.Else)
+        part_append_comment(coversubr, DECL_PART, '')
 
-        attrs = {'specs': ['NEWUNIT=dataunit', 'FILE=TRIM(ADJUSTL(datapath)) // "/" // TRIM(ADJUSTL(filestr)) // "." // TRIM(ADJUSTL(linestr))', \
-            'STATUS="NEW"', 'ACTION="READWRITE"', 'FORM="FORMATTED"', 'ACCESS="DIRECT"', 'RECL=33', 'IOSTAT=ierror']}
-        part_append_gensnode(ifexist, EXEC_PART, statements.Open, attrs=attrs)
+        ############# exec_part ########################
 
-        attrs = {'expr': 'ierror .NE. 0'}
-        ifnotexist = part_append_gensnode(ifexist, EXEC_PART, block_statements.IfThen, attrs=attrs)
- 
-        attrs = {'designator': 'SYSTEM', 'items': [ '"mkdir -p " // TRIM(ADJUSTL(datapath))']}
-        part_append_gensnode(ifnotexist, EXEC_PART, statements.Call, attrs=attrs)
+        attrs = {'expr': '.NOT. kgen_cover_initialized'}
+        ifinit = part_append_gensnode(coversubr, EXEC_PART, block_statements.IfThen, attrs=attrs)
 
-        attrs = {'specs': ['NEWUNIT=dataunit', 'FILE=TRIM(ADJUSTL(datapath)) // "/" // TRIM(ADJUSTL(filestr)) // "." // TRIM(ADJUSTL(linestr))', \
-            'STATUS="NEW"', 'ACTION="READWRITE"', 'FORM="FORMATTED"', 'ACCESS="DIRECT"', 'RECL=33', 'IOSTAT=ierror']}
-        part_append_gensnode(ifnotexist, EXEC_PART, statements.Open, attrs=attrs)
+        if getinfo('is_mpi_app'):
+            attrs = {'designator': 'kgen_cover_init', 'items': [ 'mpicomm' ]}
+        else:
+            attrs = {'designator': 'kgen_cover_init', 'items': []}
+        part_append_gensnode(ifinit, EXEC_PART, statements.Call, attrs=attrs)
 
-        attrs = {'expr': 'ierror .EQ. 0'}
-        ifnewexist = part_append_gensnode(ifexist, EXEC_PART, block_statements.IfThen, attrs=attrs)
+        # visits before MPI is initialized are not counted
+        attrs = {'expr': '.NOT. kgen_cover_initialized'}
+        ifnotinit = part_append_gensnode(ifinit, EXEC_PART, block_statements.IfThen, attrs=attrs)
+
+        part_append_gensnode(ifnotinit, EXEC_PART, statements.Return)
 
         if getinfo('is_openmp_app'):
-            attrs = {'specs': [ 'UNIT=dataunit', 'REC=1', 'FMT="(2I16,1A)"' ], 'items': [ 'kgen_invokes(OMP_GET_THREAD_NUM())', '1', 'NEW_LINE("A")' ]}
+            attrs = {'variable': 'tid', 'sign': '=', 'expr': 'OMP_GET_THREAD_NUM()'}
+            invokes = 'kgen_invokes(tid)'
         else:
-            attrs = {'specs': [ 'UNIT=dataunit', 'REC=1', 'FMT="(2I16,1A)"' ], 'items': [ 'kgen_invokes', '1', 'NEW_LINE("A")' ]}
-        part_append_gensnode(ifnewexist, EXEC_PART, statements.Write, attrs=attrs)
+            attrs = {'variable': 'tid', 'sign': '=', 'expr': '0'}
+            invokes = 'kgen_invokes'
+        part_append_gensnode(coversubr, EXEC_PART, statements.Assignment, attrs=attrs)
 
-        attrs = {'specs': ['UNIT=dataunit']}
-        part_append_gensnode(ifnewexist, EXEC_PART, statements.Close, attrs=attrs)
+        attrs = {'variable': 'blk', 'sign': '=', 'expr': 'kgen_cover_offsets(fileid) + lineid'}
+        part_append_gensnode(coversubr, EXEC_PART, statements.Assignment, attrs=attrs)
 
-        if getinfo('is_openmp_app'):
-            part_append_comment(coversubr, EXEC_PART, 'END CRITICAL (kgen_cover)', style='openmp')
+        # counters of a previous invocation are saved before counting a new invocation
+        attrs = {'expr': 'kgen_cover_invokes(blk,tid) .NE. %s'%invokes}
+        ifnew = part_append_gensnode(coversubr, EXEC_PART, block_statements.IfThen, attrs=attrs)
+
+        attrs = {'expr': 'kgen_cover_visits(blk,tid) .GT. 0'}
+        ifsave = part_append_gensnode(ifnew, EXEC_PART, block_statements.IfThen, attrs=attrs)
+
+        attrs = {'designator': 'kgen_cover_save', 'items': [ 'fileid', 'lineid', 'tid' ]}
+        part_append_gensnode(ifsave, EXEC_PART, statements.Call, attrs=attrs)
+
+        attrs = {'variable': 'kgen_cover_invokes(blk,tid)', 'sign': '=', 'expr': invokes}
+        part_append_gensnode(ifnew, EXEC_PART, statements.Assignment, attrs=attrs)
+
+        attrs = {'variable': 'kgen_cover_visits(blk,tid)', 'sign': '=', 'expr': 'kgen_cover_visits(blk,tid) + 1'}
+        part_append_gensnode(coversubr, EXEC_PART, statements.Assignment, attrs=attrs)
 
         part_append_comment(coversubr, EXEC_PART, '')
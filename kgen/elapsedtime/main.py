@@ -10,9 +10,15 @@ import shutil
 import datetime
 import time
 import random
+import array
+import bisect
 import collections
 import multiprocessing
 from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 from kgtool import KGModelingTool
 from parser.kgparse import KGGenType
@@ -20,9 +26,9 @@ from kggenfile import gensobj, KERNEL_ID_0, event_register, Gen_Statement, set_i
 import kgutils
 from kgconfig import Config
 try:
-    import configparser
-except:
-    import ConfigParser as configparser
+    import numpy
+except ImportError:
+    numpy = None
 
 BEGIN_DATA_MARKER = r'kgpathbegin'
 END_DATA_MARKER = r'kgpathend'
@@ -38,7 +44,7 @@ def chunks(l, n):
 
 def update(d, u):
     for k, v in u.items():
-        if isinstance(v, collections.Mapping):
+        if isinstance(v, Mapping):
             r = update(d.get(k, {}), v)
             d[k] = r
         else:
@@ -77,6 +83,97 @@ def visit(path, etimes, eminmax):
                             if etime > eminmax[1]:
                                 eminmax[1] = etime
 
+if numpy is not None:
+    ETIME_DTYPE = numpy.dtype([('rank', 'i4'), ('thread', 'i4'), ('invoke', 'i8'), ('start', 'f8'), ('stop', 'f8')])
+
+def etime_arrays(rows):
+    ''' returns rank, thread, invoke and elapsed time arrays from (rank, thread, invoke, start, stop) rows '''
+
+    if numpy is not None:
+        data = numpy.fromiter(rows, dtype=ETIME_DTYPE)
+        return data['rank'], data['thread'], data['invoke'], data['stop'] - data['start']
+
+    ranks, threads, invokes, etimes = array.array('l'), array.array('l'), array.array('l'), array.array('d')
+    for ranknum, threadnum, invokenum, start, stop in rows:
+        ranks.append(ranknum)
+        threads.append(threadnum)
+        invokes.append(invokenum)
+        etimes.append(stop - start)
+    return ranks, threads, invokes, etimes
+
+def bin_edges(etimes, nbins, binning):
+    ''' returns boundaries of at most nbins bins of elapsed times '''
+
+    if numpy is not None:
+        etimemin = float(etimes.min())
+        etimemax = float(etimes.max())
+    else:
+        etimemin = min(etimes)
+        etimemax = max(etimes)
+
+    if etimemin == etimemax or nbins < 2:
+        return [ etimemin, etimemax ]
+
+    if binning == 'log' and etimemin <= 0.0:
+        kgutils.logger.warn('Linear binning is used as the minimum elapsed time is not positive.')
+        binning = 'linear'
+
+    if binning == 'log':
+        ratio = etimemax / etimemin
+        edges = [ etimemin * ratio ** (float(k) / nbins) for k in range(nbins+1) ]
+    elif binning == 'quantile':
+        # the same number of elapsed times in each bin except ties
+        idxs = [ (len(etimes) - 1) * k // nbins for k in range(nbins+1) ]
+        if numpy is not None:
+            values = numpy.partition(etimes, idxs)[idxs]
+        else:
+            svalues = sorted(etimes)
+            values = [ svalues[idx] for idx in idxs ]
+        edges = sorted(set(float(v) for v in values))
+    else:
+        edges = [ etimemin + (etimemax - etimemin) * k / nbins for k in range(nbins+1) ]
+
+    edges[0] = etimemin
+    edges[-1] = etimemax
+    return edges
+
+def bin_etimes(etimes, edges):
+    ''' returns bin number of each elapsed time and number of elapsed times in each bin '''
+
+    nbins = len(edges) - 1
+
+    if numpy is not None:
+        binnums = numpy.searchsorted(numpy.array(edges[1:-1], dtype=etimes.dtype), etimes, side='right')
+        return binnums, [ int(c) for c in numpy.bincount(binnums, minlength=nbins) ]
+
+    binnums = array.array('l', ( bisect.bisect_right(edges, etime, 1, nbins) - 1 for etime in etimes ))
+    counts = [ 0 ] * nbins
+    for binnum in binnums:
+        counts[binnum] += 1
+    return binnums, counts
+
+def sample_bins(binnums, counts, ndata, seed):
+    ''' randomly selects indices of elapsed times from each bin in proportion to bin population '''
+
+    rnd = random.Random(seed)
+    totalcount = sum(counts)
+    selected = []
+    for binnum, count in enumerate(counts):
+        ncollect = min(int(round(float(count) / totalcount * ndata)), count)
+        positions = set()
+        while len(positions) < ncollect:
+            positions.add(rnd.randrange(count))
+
+        if ncollect == 0:
+            selected.append([])
+        elif numpy is not None:
+            members = numpy.flatnonzero(binnums == binnum)
+            selected.append([ int(members[pos]) for pos in sorted(positions) ])
+        else:
+            members = [ idx for idx, b in enumerate(binnums) if b == binnum ]
+            selected.append([ members[pos] for pos in sorted(positions) ])
+    return selected
+
 def readdatafiles(inq, outq):
 
     # collect data
@@ -319,13 +416,14 @@ class ElapsedTime(KGModelingTool):
 
                         # elapsedtime section
                         etime = []
-                        #fd.write('; <MPI rank> < OpenMP Thread> <invocation order> =  <file number>:<line number><num of invocations> ...\n')
+                        # <MPI rank> < OpenMP Thread> <invocation order> =  <start time>, <stop time>
 
                         for ranknum, threadnums in etimes.items():
                             for threadnum, invokenums in threadnums.items():
-                                for invokenum, evalues  in invokenums.items():
-                                    etime.append( ( '%s %s %s'%(ranknum, threadnum, invokenum), ', '.join(evalues) ) )
-                        self.addsection(Config.path['etime'], Config.path['etime'], etime)
+                                for invokenum, (start, stop)  in invokenums.items():
+                                    etime.append( ( int(ranknum), int(threadnum), int(invokenum), float(start), float(stop) ) )
+                        self.addtable(Config.path['etime'], Config.path['etime'], [ ('rank', 'INTEGER'), ('thread', 'INTEGER'), \
+                            ('invoke', 'INTEGER'), ('start', 'REAL'), ('stop', 'REAL') ], etime, keys=3)
 
                         summary = []
                         summary.append( ('minimum_elapsedtime', str(etimemin)) )
@@ -355,66 +453,35 @@ class ElapsedTime(KGModelingTool):
             # read ini file
             kgutils.logger.info('Reading %s/%s'%(Config.path['outdir'], Config.modelfile))
 
-            cfg = configparser.ConfigParser()
-            cfg.optionxform = str
-            cfg.read('%s/%s'%(Config.path['outdir'], Config.modelfile))
-
             try:
+                netimes = int(self.getoption(Config.path['etime'], 'summary', 'number_elapsedtimes').strip())
+                etimeres = float(self.getoption(Config.path['etime'], 'summary', 'resolution_elapsedtime').strip())
 
-                etimemin = float(cfg.get('elapsedtime.summary', 'minimum_elapsedtime').strip())
-                etimemax = float(cfg.get('elapsedtime.summary', 'maximum_elapsedtime').strip())
-                netimes = int(cfg.get('elapsedtime.summary', 'number_elapsedtimes').strip())
-                etimediff = etimemax - etimemin
-                etimeres = float(cfg.get('elapsedtime.summary', 'resolution_elapsedtime').strip())
+                # <MPI rank> < OpenMP Thread> <invocation order> =  <start time>, <stop time>
+                ranks, threads, invokes, etimevals = etime_arrays(self.gettable(Config.path['etime'], Config.path['etime']))
+            except Exception as e:
+                raise Exception('Please check the format of elapsedtime file: %s'%str(e))
 
-                # <MPI rank> < OpenMP Thread> <invocation order> =  <file number>:<line number>:<num etimes> ... 
-                if etimediff == 0:
-                    nbins = 1
-                else:
-                    nbins = max(min(Config.model['types']['etime']['nbins'], netimes), 2)
-
-                kgutils.logger.info('nbins = %d'%nbins)
-                kgutils.logger.info('etimemin = %f'%etimemin)
-                kgutils.logger.info('etimemax = %f'%etimemax)
-                kgutils.logger.info('etimediff = %f'%etimediff)
-                kgutils.logger.info('netimes = %d'%netimes)
-                
-                if nbins > 1:
-                    etimebins = [ {} for _ in range(nbins) ]
-                    etimecounts = [ 0 for _ in range(nbins) ]
-                else:
-                    etimebins = [ {} ]
-                    etimecounts = [ 0 ]
+            if len(etimevals) == 0:
+                kgutils.logger.warn('No elapsedtime data is found.')
+                return
 
-                idx = 0
-                for opt in cfg.options('elapsedtime.elapsedtime'):
-                    ranknum, threadnum, invokenum = tuple( num for num in opt.split() )
-                    start, stop = cfg.get('elapsedtime.elapsedtime', opt).split(',')
-                    estart = float(start)
-                    eend = float(stop)
-                    etimeval = eend - estart
-                    if nbins > 1:
-                        binnum = int(math.floor((etimeval - etimemin) / etimediff * (nbins - 1)))
-                    else:
-                        binnum = 0
-                    etimecounts[binnum] += 1
-
-                    invokenum = int(invokenum)
-                    if invokenum not in etimebins[binnum]:
-                        etimebins[binnum][invokenum] = {}
-                    if ranknum not in etimebins[binnum][invokenum]:
-                        etimebins[binnum][invokenum][ranknum] = {}
-                    if threadnum not in etimebins[binnum][invokenum][ranknum]:
-                        etimebins[binnum][invokenum][ranknum][threadnum] = float(etimeval)
-                    else:
-                        raise Exception('Dupulicated data: (%s, %s, %s, %s)'%(invokenum, ranknum, threadnum, etimeval))
+            binning = Config.model['types']['etime']['binning']
+            edges = bin_edges(etimevals, min(Config.model['types']['etime']['nbins'], len(etimevals)), binning)
+            etimemin = edges[0]
+            etimemax = edges[-1]
+            etimediff = etimemax - etimemin
+            nbins = len(edges) - 1
 
-                    idx += 1
+            kgutils.logger.info('nbins = %d'%nbins)
+            kgutils.logger.info('binning = %s'%binning)
+            kgutils.logger.info('etimemin = %f'%etimemin)
+            kgutils.logger.info('etimemax = %f'%etimemax)
+            kgutils.logger.info('etimediff = %f'%etimediff)
+            kgutils.logger.info('netimes = %d'%netimes)
+            kgutils.logger.info('etimeres = %f'%etimeres)
 
-                    if idx % 100000 == 0:
-                        print('Processed %d items: %s'%(idx, datetime.datetime.now().strftime("%I:%M%p on %B %d, %Y")))
-            except Exception as e:
-                raise Exception('Please check the format of elapsedtime file: %s'%str(e))
+            binnums, etimecounts = bin_etimes(etimevals, edges)
 
             # types of representation
             # average, median, min/max, n-stratified, distribution
@@ -422,14 +489,13 @@ class ElapsedTime(KGModelingTool):
 
             totalcount = sum(etimecounts)
             countdist = [ float(count) / float(totalcount) for count in etimecounts ]
-            ndata = Config.model['types']['etime']['ndata']
-            datacollect = [ int(round(dist * ndata)) for dist in countdist ]
+            selected = sample_bins(binnums, etimecounts, Config.model['types']['etime']['ndata'], \
+                Config.model['types']['etime']['seed'])
 
             triples = []
-            for binnum, etimebin in enumerate(etimebins):
-                bin_triples = []
-                range_begin = binnum*(etimemax-etimemin)/nbins + etimemin if binnum > 0  else etimemin
-                range_end = (binnum+1)*(etimemax-etimemin)/nbins + etimemin if binnum < (nbins-1)  else None
+            for binnum, bin_indices in enumerate(selected):
+                range_begin = edges[binnum]
+                range_end = edges[binnum+1] if binnum < (nbins-1)  else None
 
                 bunit = 'sec'
                 if range_begin < 1.E-6:
@@ -448,19 +514,10 @@ class ElapsedTime(KGModelingTool):
                     print('From bin # %d [ %f (%s) ~ %f (%s) ] %f %% of %d'%(binnum, \
                         range_begin, bunit, range_end, eunit, countdist[binnum] * 100, totalcount))
 
-                for invokenum in sorted(etimebin.keys()):
-                    if len(bin_triples) >= datacollect[binnum]: break
-                    # select datacollect[binum] under this data tree, rank/thread/invoke
-                    bininvokes = etimebin[invokenum].keys()
-                    random.shuffle(bininvokes)
-                    for ranknum in bininvokes:
-                        if len(bin_triples) >= datacollect[binnum]: break
-                        binranks = etimebin[invokenum][ranknum].keys()
-                        random.shuffle(binranks)
-                        for threadnum in binranks:
-                            bin_triples.append( (ranknum, threadnum, invokenum) )
-                            print('        invocation triple: %s:%s:%s'%(ranknum, threadnum, invokenum))
-                triples.extend(bin_triples)
+                bin_triples = sorted( (int(invokes[idx]), int(ranks[idx]), int(threads[idx])) for idx in bin_indices )
+                for invokenum, ranknum, threadnum in bin_triples:
+                    triples.append( (ranknum, threadnum, invokenum) )
+                    print('        invocation triple: %s:%s:%s'%(ranknum, threadnum, invokenum))
 
             print('Number of bins: %d'%nbins)
             print('Minimun elapsed time: %f'%etimemin)
@@ -11,6 +11,7 @@ from kgconfig import Config
 from kggenfile import genkobj, gensobj, KERNEL_ID_0, event_register, create_rootnode, create_programnode, \
     append_program_in_root, set_indent
 from parser.kgparse import KGGenType
+from parser.kgdepgraph import DepGraph
 from parser.kgextra import kgen_utils_file_head, kgen_utils_file_checksubr, kgen_get_newunit, kgen_error_stop, \
     kgen_utils_file_tostr, kgen_utils_array_sumcheck, kgen_rankthread
 
@@ -37,11 +38,21 @@ class Extractor(KGTool):
         if not os.path.exists('%s/%s'%(Config.path['outdir'], Config.path['state'])):
             os.makedirs('%s/%s'%(Config.path['outdir'], Config.path['state']))
 
+        # compare source files with previous extraction
+        self.depgraph = depgraph = DepGraph('%s/%s'%(Config.path['outdir'], Config.depgraphfile))
+        depgraph.update(Config.srcfiles, ' '.join(Config.cfgargs))
+        rebuild = 'all' in Config.rebuild or 'extract' in Config.rebuild
+
         # generate kernel and instrumentation
-        if 'all' in Config.rebuild or 'extract' in Config.rebuild or \
+        if rebuild or not depgraph.isuptodate() or \
             not os.path.exists('%s/%s/Makefile'%(Config.path['outdir'], Config.path['state'])) or \
             len(glob.glob('%s/%s.*'%(Config.path['outdir'], Config.kernel['name']))) == 0:
 
+            changed = depgraph.changed_files()
+            if depgraph.prev_files and changed:
+                kgutils.logger.info('Source files changed since last extraction: %s'%', '.join(changed))
+                kgutils.logger.info('Source files affected by the change: %s'%', '.join(depgraph.dependents(changed)))
+
             # generate kgen_driver.f90 in kernel directory
             driver = create_rootnode(KERNEL_ID_0)
             self._trees.append(driver)
@@ -107,8 +118,7 @@ class Extractor(KGTool):
                 if klines is not None:
                     klines = kgutils.remove_multiblanklines(klines)
                     kernel_files.append(filename)
-                    with open('%s/%s/%s'%(Config.path['outdir'], Config.path['kernel'], filename), 'w') as fd:
-                        fd.write(klines)
+                    depgraph.write('%s/%s/%s'%(Config.path['outdir'], Config.path['kernel'], filename), klines)
 
                 if sfile.kgen_stmt.used4genstate:
                     set_indent('')
@@ -116,15 +126,15 @@ class Extractor(KGTool):
                     if slines is not None:
                         slines = kgutils.remove_multiblanklines(slines)
                         state_files.append(filename)
-                        with open('%s/%s/%s'%(Config.path['outdir'], Config.path['state'], filename), 'w') as fd:
-                            fd.write(slines)
+                        depgraph.write('%s/%s/%s'%(Config.path['outdir'], Config.path['state'], filename), slines)
 
-            with open('%s/%s/%s'%(Config.path['outdir'], Config.path['kernel'], '%s.f90'%Config.kernel_driver['name']), 'w') as fd:
-                set_indent('')
-                lines = driver.tostring()
-                if lines is not None:
-                    lines = kgutils.remove_multiblanklines(lines)
-                    fd.write(lines)
+            set_indent('')
+            lines = driver.tostring()
+            if lines is not None:
+                lines = kgutils.remove_multiblanklines(lines)
+            else:
+                lines = ''
+            depgraph.write('%s/%s/%s'%(Config.path['outdir'], Config.path['kernel'], '%s.f90'%Config.kernel_driver['name']), lines)
             kernel_files.append(Config.kernel['name'])
 
             kgutils.logger.info('Kernel generation and instrumentation is completed.')
@@ -133,8 +143,8 @@ class Extractor(KGTool):
             kernel_files.append(KGUTIL)
             self.generate_kgen_utils()
 
-            shutil.copyfile('%s/%s'%(os.path.dirname(os.path.realpath(__file__)), TPROF), \
-                '%s/%s/%s'%(Config.path['outdir'], Config.path['kernel'], TPROF))
+            with open('%s/%s'%(os.path.dirname(os.path.realpath(__file__)), TPROF), 'r') as f:
+                depgraph.write('%s/%s/%s'%(Config.path['outdir'], Config.path['kernel'], TPROF), f.read())
             kernel_files.append(TPROF)
 
             self.generate_kernel_makefile()
@@ -145,6 +155,18 @@ class Extractor(KGTool):
 
             kgutils.logger.info('Makefiles are generated')
 
+            depgraph.record('%s/%s/Makefile'%(Config.path['outdir'], Config.path['kernel']))
+            depgraph.record('%s/%s/Makefile'%(Config.path['outdir'], Config.path['state']))
+
+            # state data of previous extraction is valid if neither sources nor instrumentation are changed
+            if not rebuild and depgraph.state_built and not changed and \
+                not depgraph.outputs_changed('%s/%s'%(Config.path['outdir'], Config.path['state'])) and \
+                len(glob.glob('%s/%s/%s.*.*.*'%(Config.path['outdir'], Config.path['kernel'], Config.kernel['name']))) > 0:
+                kgutils.logger.info('Sources and state generation instrumentation are not changed. Application built/run is skipped.')
+                depgraph.save()
+                return
+
+            depgraph.state_built = False
 
             # TODO: wait until state data generation is completed
             # use -K option for bsub to wait for job completion
@@ -158,11 +180,15 @@ class Extractor(KGTool):
             # build and run app with state instrumentation
             kgutils.logger.info('Application is being built/run with state generation instrumentation.')
             out, err, retcode = kgutils.run_shcmd('make', cwd='%s/%s'%(Config.path['outdir'], Config.path['state']))
+            if retcode==0:
+                depgraph.state_built = True
 
             out, err, retcode = kgutils.run_shcmd('make recover', cwd='%s/%s'%(Config.path['outdir'], Config.path['state']))
             if Config.state_switch['clean']:
                 kgutils.run_shcmd(Config.state_switch['clean'])
 
+            depgraph.save()
+
             kgutils.logger.info('Application built/run is finished.')
 
     def write(self, f, line, n=True, t=False):
@@ -546,16 +572,7 @@ class Extractor(KGTool):
 
     def generate_kgen_utils(self):
 
-        with open('%s/%s/%s'%(Config.path['outdir'], Config.path['kernel'], KGUTIL), 'w') as f:
-            f.write('MODULE kgen_utils_mod')
-            f.write(kgen_utils_file_head)
-            f.write('\n')
-            f.write('CONTAINS')
-            f.write('\n')
-            f.write(kgen_utils_array_sumcheck)
-            f.write(kgen_utils_file_tostr)
-            f.write(kgen_utils_file_checksubr)
-            f.write(kgen_get_newunit)
-            f.write(kgen_error_stop)
-            f.write(kgen_rankthread)
-            f.write('END MODULE kgen_utils_mod\n')
+        lines = [ 'MODULE kgen_utils_mod', kgen_utils_file_head, '\n', 'CONTAINS', '\n', kgen_utils_array_sumcheck, \
+            kgen_utils_file_tostr, kgen_utils_file_checksubr, kgen_get_newunit, kgen_error_stop, kgen_rankthread, \
+            'END MODULE kgen_utils_mod\n' ]
+        self.depgraph.write('%s/%s/%s'%(Config.path['outdir'], Config.path['kernel'], KGUTIL), ''.join(lines))
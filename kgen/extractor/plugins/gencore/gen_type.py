@@ -120,7 +120,7 @@ class Gen_Type(Kgen_Plugin):
                 'DBLE(SUM(var%%%s, mask=(var%%%s .eq. var%%%s)))'%(entity_name, entity_name, entity_name), '.TRUE.']}
             part_append_genknode(pobj, EXEC_PART, statements.Call, attrs=attrs)
 
-        if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+        if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
             if stmt.is_numeric() and var.is_array():
                 attrs = {'items': ['"KGEN DEBUG: DBLE(SUM(" // printname // " %%%s)) = "'%entity_name, 'DBLE(SUM(var%%%s, mask=(var%%%s .eq. var%%%s)))'%(entity_name, entity_name, entity_name)]}
             else:
@@ -143,7 +143,7 @@ class Gen_Type(Kgen_Plugin):
         attrs = {'items': ['var%%%s'%entity_name], 'specs': ['UNIT = kgen_unit']}
         part_append_gensnode(pobj, EXEC_PART, statements.Write, attrs=attrs)
 
-        if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+        if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
             if stmt.is_numeric() and var.is_array():
                 attrs = {'items': ['"KGEN DEBUG: DBLE(SUM(" // printname // "%%%s)) = "'%entity_name, 'DBLE(SUM(var%%%s, mask=(var%%%s .eq. var%%%s)))'%(entity_name, entity_name, entity_name)]}
             else:
@@ -169,7 +169,7 @@ class Gen_Type(Kgen_Plugin):
 
         part_append_genknode(ifobj, EXEC_PART, statements.Else)
 
-        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
         attrs = {'designator': callname, 'items': ['var%%%s'%entity_name, 'kgen_unit', 'printname // "%%%s"'%entity_name, pstr]}
         part_append_genknode(ifobj, EXEC_PART, statements.Call, attrs=attrs)
 
@@ -183,7 +183,7 @@ class Gen_Type(Kgen_Plugin):
 
         part_append_gensnode(ifobj, EXEC_PART, statements.Else)
 
-        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
         attrs = {'designator': callname, 'items': ['var%%%s'%entity_name, 'kgen_unit', 'printname // "%%%s"'%entity_name, pstr]}
         part_append_gensnode(ifobj, EXEC_PART, statements.Call, attrs=attrs)
 
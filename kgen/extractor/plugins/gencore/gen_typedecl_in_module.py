@@ -572,7 +572,7 @@ class Gen_Typedecl_In_Module(Kgen_Plugin):
                 'kgen_array_sum', 'DBLE(SUM(%s, mask=(%s .eq. %s)))'%(prefix+entity_name, prefix+entity_name, prefix+entity_name), '.TRUE.']}
             part_append_genknode(pobj, EXEC_PART, statements.Call, attrs=attrs)
 
-        if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+        if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
             if stmt.is_numeric() and var.is_array():
                 attrs = {'items': ['"KGEN DEBUG: DBLE(SUM(%s)) = "'%(prefix+entity_name), 'DBLE(SUM(%s, mask=(%s .eq. %s)))'%(prefix+entity_name, prefix+entity_name, prefix+entity_name)]}
             else:
@@ -586,7 +586,7 @@ class Gen_Typedecl_In_Module(Kgen_Plugin):
         attrs = {'items': [entity_name], 'specs': ['UNIT = kgen_unit']}
         part_append_gensnode(pobj, EXEC_PART, statements.Write, attrs=attrs)
 
-        if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+        if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
             if stmt.is_numeric() and var.is_array():
                 attrs = {'items': ['"KGEN DEBUG: DBLE(SUM(%s)) = "'%(prefix+entity_name), 'DBLE(SUM(%s, mask=(%s .eq. %s)))'%(entity_name, entity_name, entity_name)]}
             else:
@@ -595,13 +595,13 @@ class Gen_Typedecl_In_Module(Kgen_Plugin):
 
     def create_read_call(self, subrobj, callname, entity_name, stmt, var, prefix=''):
 
-        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
         attrs = {'designator': callname, 'items': [prefix+entity_name, 'kgen_unit', '"%s"'%(prefix+entity_name), pstr]}
         part_append_genknode(subrobj, EXEC_PART, statements.Call, attrs=attrs)
 
     def create_write_call(self, subrobj, callname, entity_name, stmt, var, prefix=''):
 
-        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
         attrs = {'designator': callname, 'items': [entity_name, 'kgen_unit', '"%s"'%(prefix+entity_name), pstr]}
         part_append_gensnode(subrobj, EXEC_PART, statements.Call, attrs=attrs)
 
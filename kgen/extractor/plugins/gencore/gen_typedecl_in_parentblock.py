@@ -481,7 +481,7 @@ class Gen_Typedecl_In_Parentblock(Kgen_Plugin):
                     'kgen_array_sum', 'DBLE(SUM(%s, mask=(%s .eq. %s)))'%(ename_prefix+entity_name, ename_prefix+entity_name, ename_prefix+entity_name), '.TRUE.']}
                 part_append_genknode(pobj, EXEC_PART, statements.Call, attrs=attrs)
 
-            if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+            if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
                 if stmt.is_numeric() and var.is_array():
                     attrs = {'items': ['"KGEN DEBUG: DBLE(SUM( %s)) = "'%(ename_prefix+entity_name), 'DBLE(SUM(%s, mask=(%s .eq. %s)))'%(ename_prefix+entity_name, ename_prefix+entity_name, ename_prefix+entity_name)]}
                 else:
@@ -495,7 +495,7 @@ class Gen_Typedecl_In_Parentblock(Kgen_Plugin):
                     'kgen_array_sum', 'DBLE(SUM(%s, mask=(%s .eq. %s)))'%(ename_prefix+entity_name, ename_prefix+entity_name, ename_prefix+entity_name), '.TRUE.']}
                 part_append_genknode(pobj, EXEC_PART, statements.Call, attrs=attrs)
 
-            if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+            if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
                 if stmt.is_numeric() and var.is_array():
                     attrs = {'items': ['"KGEN DEBUG: DBLE(SUM( %s)) = "'%(ename_prefix+entity_name), 'DBLE(SUM(%s, mask=(%s .eq. %s)))'%(ename_prefix+entity_name, ename_prefix+entity_name, ename_prefix+entity_name)]}
                 else:
@@ -508,7 +508,7 @@ class Gen_Typedecl_In_Parentblock(Kgen_Plugin):
         attrs = {'items': [entity_name], 'specs': ['UNIT = kgen_unit']}
         if pobj:
             part_append_gensnode(pobj, EXEC_PART, statements.Write, attrs=attrs)
-            if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+            if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
                 if stmt.is_numeric() and var.is_array():
                     attrs = {'items': ['"KGEN DEBUG: DBLE(SUM( %s)) = "'%entity_name, 'DBLE(SUM(%s, mask=(%s .eq. %s)))'%(entity_name, entity_name, entity_name)]}
                 else:
@@ -516,7 +516,7 @@ class Gen_Typedecl_In_Parentblock(Kgen_Plugin):
                 part_append_gensnode(pobj, EXEC_PART, statements.Write, attrs=attrs)
         else:
             namedpart_append_gensnode(kernel_id, partid, statements.Write, attrs=attrs)
-            if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+            if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
                 if stmt.is_numeric() and var.is_array():
                     attrs = {'items': ['"KGEN DEBUG: DBLE(SUM(%s)) = "'%entity_name, 'DBLE(SUM(%s, mask=(%s .eq. %s)))'%(entity_name, entity_name, entity_name)]}
                 else:
@@ -524,12 +524,12 @@ class Gen_Typedecl_In_Parentblock(Kgen_Plugin):
                 namedpart_append_gensnode(kernel_id, partid, statements.Write, attrs=attrs)
 
     def create_read_call(self, kernel_id, partid, callname, entity_name, stmt, var, ename_prefix=''):
-        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
         attrs = {'designator': callname, 'items': [ename_prefix+entity_name, 'kgen_unit', '"%s%s"'%(ename_prefix, entity_name), pstr]}
         namedpart_append_genknode(kernel_id, partid, statements.Call, attrs=attrs)
 
     def create_write_call(self, kernel_id, partid, callname, entity_name, stmt, var):
 
-        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
         attrs = {'designator': callname, 'items': [entity_name, 'kgen_unit', '"%s"'%entity_name, pstr]}
         namedpart_append_gensnode(kernel_id, partid, statements.Call, attrs=attrs)
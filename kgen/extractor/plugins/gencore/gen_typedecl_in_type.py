@@ -143,7 +143,7 @@ class Gen_Typedecl_In_Type(Kgen_Plugin):
 
                         part_append_genknode(ifpvarobj, EXEC_PART, statements.Else)
 
-                        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+                        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
                         attrs = {'designator': callname, 'items': ['var(%s)'%str_indexes, 'kgen_unit', 'printname // "(%s)"'%str_indexes, pstr]}
                         part_append_genknode(ifpvarobj, EXEC_PART, statements.Call, attrs=attrs)
 
@@ -163,7 +163,7 @@ class Gen_Typedecl_In_Type(Kgen_Plugin):
                         attrs = {'items': ['"KGEN DEBUG: " // printname // " = "', 'var']}
                     part_append_genknode(ifpvarobj, EXEC_PART, statements.Write, attrs=attrs)
 
-                    if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+                    if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
 
                         part_append_genknode(ifpvarobj, EXEC_PART, statements.Else)
 
@@ -199,7 +199,7 @@ class Gen_Typedecl_In_Type(Kgen_Plugin):
 
                         part_append_genknode(ifpvarobj, EXEC_PART, statements.Else)
 
-                        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+                        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
                         attrs = {'designator': callname, 'items': ['var', 'kgen_unit', 'printname', pstr]}
                         part_append_genknode(ifpvarobj, EXEC_PART, statements.Call, attrs=attrs)
 
@@ -213,7 +213,7 @@ class Gen_Typedecl_In_Type(Kgen_Plugin):
                     attrs = {'items': ['"KGEN DEBUG: " // printname // " = "', 'var']}
                     part_append_genknode(ifpvarobj, EXEC_PART, statements.Write, attrs=attrs)
 
-                    if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+                    if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
 
                         part_append_genknode(ifpvarobj, EXEC_PART, statements.Else)
 
@@ -323,7 +323,7 @@ class Gen_Typedecl_In_Type(Kgen_Plugin):
 
                         part_append_gensnode(ifpvarobj, EXEC_PART, statements.Else)
 
-                        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+                        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
                         attrs = {'designator': callname, 'items': ['var(%s)'%str_indexes, 'kgen_unit', 'printname // "(%s)"'%str_indexes, pstr]}
                         part_append_gensnode(ifpvarobj, EXEC_PART, statements.Call, attrs=attrs)
 
@@ -340,7 +340,7 @@ class Gen_Typedecl_In_Type(Kgen_Plugin):
                         attrs = {'items': ['"KGEN DEBUG: " // printname // " = "', 'var']}
                     part_append_gensnode(ifpvarobj, EXEC_PART, statements.Write, attrs=attrs)
 
-                    if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+                    if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
 
                         part_append_gensnode(ifpvarobj, EXEC_PART, statements.Else)
 
@@ -372,7 +372,7 @@ class Gen_Typedecl_In_Type(Kgen_Plugin):
 
                         part_append_gensnode(ifpvarobj, EXEC_PART, statements.Else)
 
-                        pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+                        pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
                         attrs = {'designator': callname, 'items': ['var', 'kgen_unit', 'printname', pstr]}
                         part_append_gensnode(ifpvarobj, EXEC_PART, statements.Call, attrs=attrs)
 
@@ -386,7 +386,7 @@ class Gen_Typedecl_In_Type(Kgen_Plugin):
                     attrs = {'items': ['"KGEN DEBUG: " // printname // " = "', 'var']}
                     part_append_gensnode(ifpvarobj, EXEC_PART, statements.Write, attrs=attrs)
 
-                    if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')):
+                    if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False):
 
                         part_append_gensnode(ifpvarobj, EXEC_PART, statements.Else)
 
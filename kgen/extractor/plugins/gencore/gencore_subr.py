@@ -115,7 +115,7 @@ def create_read_subr(subrname, entity_name, parent, var, stmt, allocate=False, e
 
                     part_append_genknode(ifpvarobj, EXEC_PART, statements.Else)
 
-                    pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+                    pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
                     attrs = {'designator': callname, 'items': ['var(%s)'%str_indexes, 'kgen_unit', 'printname // "(%s)"'%str_indexes, pstr]}
                     part_append_genknode(ifpvarobj, EXEC_PART, statements.Call, attrs=attrs)
 
@@ -165,7 +165,7 @@ def create_read_subr(subrname, entity_name, parent, var, stmt, allocate=False, e
 
                     part_append_genknode(ifpvarobj, EXEC_PART, statements.Else)
 
-                    pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+                    pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
                     attrs = {'designator': callname, 'items': ['var', 'kgen_unit', 'printname', pstr]}
                     part_append_genknode(ifpvarobj, EXEC_PART, statements.Call, attrs=attrs)
 
@@ -282,7 +282,7 @@ def create_write_subr(subrname, entity_name, parent, var, stmt, implicit=False):
 
                     part_append_gensnode(ifpvarobj, EXEC_PART, statements.Else)
 
-                    pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+                    pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
                     attrs = {'designator': callname, 'items': ['var(%s)'%str_indexes, 'kgen_unit', 'printname // "(%s)"'%str_indexes, pstr]}
                     part_append_gensnode(ifpvarobj, EXEC_PART, statements.Call, attrs=attrs)
 
@@ -321,7 +321,7 @@ def create_write_subr(subrname, entity_name, parent, var, stmt, implicit=False):
 
                     part_append_gensnode(ifpvarobj, EXEC_PART, statements.Else)
 
-                    pstr = '.TRUE.' if any(match_namepath(pattern, pack_exnamepath(stmt, entity_name), internal=False) for pattern in getinfo('print_var_names')) else '.FALSE.'
+                    pstr = '.TRUE.' if match_namepaths(getinfo('print_var_names'), pack_exnamepath(stmt, entity_name), internal=False) else '.FALSE.'
                     attrs = {'designator': callname, 'items': ['var', 'kgen_unit', 'printname', pstr]}
                     part_append_gensnode(ifpvarobj, EXEC_PART, statements.Call, attrs=attrs)
 
@@ -5,9 +5,9 @@ import sys
 import glob
 import shutil
 import collections
-import copy
 import optparse
-from kgutils import UserException, run_shcmd, INTERNAL_NAMELEVEL_SEPERATOR, traverse, match_namepath, dequote
+import multiprocessing
+from kgutils import UserException, run_shcmd, INTERNAL_NAMELEVEL_SEPERATOR, traverse, namepath_matcher, dequote
 try:
     import configparser
 except:
@@ -190,6 +190,26 @@ class Config(object):
         self._attrs['bin']['cpp_flags'] = '-w -traditional -P'
         #self._attrs['bin']['fpp_flags'] = '-w'
 
+        # preprocessing parameters
+        self._attrs['preprocess'] = collections.OrderedDict()
+        self._attrs['preprocess']['builtin'] = True
+
+        # parse cache parameters
+        self._attrs['parsecache'] = collections.OrderedDict()
+        self._attrs['parsecache']['enabled'] = True
+        self._attrs['parsecache']['path'] = None
+        self._attrs['parsecache']['maxsize'] = 1024 # MB
+
+        # parallel parsing parameters
+        self._attrs['prefetch'] = collections.OrderedDict()
+        self._attrs['prefetch']['enabled'] = True
+        self._attrs['prefetch']['nprocs'] = multiprocessing.cpu_count()
+        self._attrs['prefetch']['timeout'] = 300
+
+        # memoization of Fortran2003 matching
+        self._attrs['parsememo'] = collections.OrderedDict()
+        self._attrs['parsememo']['enabled'] = False
+
         # search parameters
         self._attrs['search'] = collections.OrderedDict()
         self._attrs['search']['skip_intrinsic'] = True
@@ -217,6 +237,7 @@ class Config(object):
 
         # include parameters
         self._attrs['includefile'] = 'include.ini'
+        self._attrs['includedbfile'] = 'include.db'
         self._attrs['include'] = collections.OrderedDict()
         self._attrs['include']['macro'] = collections.OrderedDict()
         self._attrs['include']['path'] = []
@@ -226,11 +247,17 @@ class Config(object):
         self._attrs['include']['file'] = collections.OrderedDict()
         self._attrs['include']['opt'] = None
 
+        # module index parameters
+        self._attrs['modindexfile'] = 'modindex.ini'
+        self._attrs['modindex'] = None
+        self._attrs['depgraphfile'] = 'depgraph.ini'
+
         # exclude parameters
         self._attrs['exclude'] = collections.OrderedDict()
 
         # program units
         self._attrs['program_units'] = {}
+        self._attrs['program_unit_index'] = {} # name -> [ (filepath, unit) ]
 
         # debugging parameters
         self._attrs['debug'] = collections.OrderedDict()
@@ -250,6 +277,12 @@ class Config(object):
         self._attrs['stracefile'] = 'strace.log'
         self._attrs['strace'] = collections.OrderedDict()
 
+        # compiler command capture: strace or shim
+        self._attrs['compflag'] = collections.OrderedDict()
+        self._attrs['compflag']['capture'] = 'strace'
+        self._attrs['compflag']['compdb'] = None
+        self._attrs['compflag']['dir'] = 'compflag'
+
 
         ###############################################################
         # Kernel Extraction
@@ -354,6 +387,7 @@ class Config(object):
 
         # model parameters
         self._attrs['modelfile'] = 'model.ini'
+        self._attrs['modeldb'] = 'model.db'
         self._attrs['model'] = collections.OrderedDict()
         self._attrs['model']['reuse_rawdata'] = True
         self._attrs['model']['types'] = collections.OrderedDict()
@@ -372,6 +406,8 @@ class Config(object):
         self._attrs['model']['types']['etime']['minval'] = None
         self._attrs['model']['types']['etime']['maxval'] = None
         self._attrs['model']['types']['etime']['timer'] = None
+        self._attrs['model']['types']['etime']['binning'] = 'linear'
+        self._attrs['model']['types']['etime']['seed'] = 0
         self._attrs['model']['types']['etime']['enabled'] = True
         self._attrs['model']['types']['papi'] = collections.OrderedDict()
         self._attrs['model']['types']['papi']['id'] = '2'
@@ -431,6 +467,10 @@ class Config(object):
         self.parser.add_option("--machinefile", dest="machinefile", action='store', type='string', default=None, help="Specifying machinefile")
         self.parser.add_option("--debug", dest="debug", action='append', type='string', help=optparse.SUPPRESS_HELP)
         self.parser.add_option("--logging", dest="logging", action='append', type='string', help=optparse.SUPPRESS_HELP)
+        self.parser.add_option("--parse-cache", dest="parse_cache", action='append', type='string', default=None, help="Control on-disk cache of parsed source files")
+        self.parser.add_option("--prefetch", dest="prefetch", action='append', type='string', default=None, help="Control parallel parsing of source files")
+        self.parser.add_option("--preprocess", dest="preprocess", action='store', type='string', default=None, help="Select builtin or external preprocessor of source files")
+        self.parser.add_option("--parse-memo", dest="parse_memo", action='store_true', default=False, help="Memoize Fortran2003 matching per statement")
 
         ###############################################################
         # Add extraction options
@@ -442,6 +482,7 @@ class Config(object):
         self.parser.add_option("--mpi", dest="mpi", action='append', type='string', default=None, help="MPI information for data collection")
         self.parser.add_option("--timing", dest="timing", action='store', type='string', default=None, help="Timing measurement information")
         self.parser.add_option("--prerun", dest="prerun", action='append', type='string', default=None, help="prerun commands")
+        self.parser.add_option("--compflag", dest="compflag", action='append', type='string', default=None, help="Specifying how compiler flags are collected")
         self.parser.add_option("--rebuild", dest="rebuild", action='append', type='string', default=None, help="rebuild controls")
         self.parser.add_option("--state-switch", dest="state_switch", action='append', type='string', default=None, help="Specifying how to switch orignal sources with instrumented ones.")
         self.parser.add_option("--cmd-clean", dest="cmd_clean", action='store', type='string', default=None, help="Clean information to generate makefile")
@@ -465,6 +506,14 @@ class Config(object):
         if cfgargs is None:
             cfgargs = sys.argv[1:]
 
+        # command line arguments except rebuild controls for dependency graph
+        self._attrs['cfgargs'] = []
+        for arg in cfgargs:
+            if self._attrs['cfgargs'] and self._attrs['cfgargs'][-1]=='--rebuild':
+                self._attrs['cfgargs'].pop()
+            elif not arg.startswith('--rebuild='):
+                self._attrs['cfgargs'].append(arg)
+
         if "--mpi" in cfgargs and "--add-mpi-frame" not in cfgargs:
             cfgargs.extend(["--add-mpi-frame", "np=2"])
 
@@ -573,7 +622,7 @@ class Config(object):
                             for stmt, depth in parser.api.walk(tree, -1):
                                 bag['key'] = name
                                 bag[name] = []
-                                if hasattr(stmt, 'f2003'):
+                                if stmt.has_f2003():
                                     traverse(stmt.f2003, get_MPI_PARAM, bag, subnode='content')
                                     if len(bag[name]) > 0:
                                         self._attrs['mpi'][config_key] = bag[name][-1]
@@ -801,6 +850,52 @@ class Config(object):
                 else:
                     curdict[param_split[-1]] = eval(value_split)
 
+        # parsing parse cache options
+        if opts.parse_cache:
+            for line in opts.parse_cache:
+                for pcopt in line.split(','):
+                    split_pcopt = pcopt.split('=', 1)
+                    if len(split_pcopt)==1:
+                        if split_pcopt[0] == 'enable':
+                            self._attrs['parsecache']['enabled'] = True
+                        elif split_pcopt[0] == 'disable':
+                            self._attrs['parsecache']['enabled'] = False
+                        else:
+                            raise UserException('Unknown parse-cache option: %s' % pcopt)
+                    elif split_pcopt[0] == 'path':
+                        self._attrs['parsecache']['path'] = os.path.realpath(os.path.expandvars(split_pcopt[1]))
+                    elif split_pcopt[0] == 'maxsize':
+                        self._attrs['parsecache']['maxsize'] = int(split_pcopt[1])
+                    else:
+                        raise UserException('Unknown parse-cache option: %s' % pcopt)
+
+        if opts.prefetch:
+            for line in opts.prefetch:
+                for pfopt in line.split(','):
+                    split_pfopt = pfopt.split('=', 1)
+                    if len(split_pfopt)==1:
+                        if split_pfopt[0] == 'enable':
+                            self._attrs['prefetch']['enabled'] = True
+                        elif split_pfopt[0] == 'disable':
+                            self._attrs['prefetch']['enabled'] = False
+                        else:
+                            raise UserException('Unknown prefetch option: %s' % pfopt)
+                    elif split_pfopt[0] in ('nprocs', 'timeout'):
+                        self._attrs['prefetch'][split_pfopt[0]] = int(split_pfopt[1])
+                    else:
+                        raise UserException('Unknown prefetch option: %s' % pfopt)
+
+        if opts.preprocess:
+            if opts.preprocess == 'builtin':
+                self._attrs['preprocess']['builtin'] = True
+            elif opts.preprocess == 'external':
+                self._attrs['preprocess']['builtin'] = False
+            else:
+                raise UserException('Unknown preprocess option: %s' % opts.preprocess)
+
+        if opts.parse_memo:
+            self._attrs['parsememo']['enabled'] = True
+
         if opts.outdir:
             self._attrs['path']['outdir'] = opts.outdir
 
@@ -925,6 +1020,20 @@ class Config(object):
                     else:
                         raise UserException('Unknown prerun option: %s' % comp)
 
+        if opts.compflag:
+            for line in opts.compflag:
+                for comp in line.split(','):
+                    key, value = comp.split('=', 1)
+                    if key=='capture':
+                        if value in [ 'strace', 'shim' ]:
+                            self._attrs['compflag'][key] = value
+                        else:
+                            raise UserException('Unknown compflag capture: %s' % value)
+                    elif key=='compdb':
+                        self._attrs['compflag'][key] = os.path.abspath(os.path.expanduser(dequote(value)))
+                    else:
+                        raise UserException('Unknown compflag option: %s' % comp)
+
         if opts.rebuild:
             for line in opts.rebuild:
                 for comp in line.split(','):
@@ -1044,10 +1153,14 @@ class Config(object):
 
                         if split_eopt[0] in [ 'minval', 'maxval' ]:
                             self._attrs['model']['types']['etime'][split_eopt[0]] = float(split_eopt[1])
-                        elif split_eopt[0] in ('nbins', 'ndata'):
+                        elif split_eopt[0] in ('nbins', 'ndata', 'seed'):
                             self._attrs['model']['types']['etime'][split_eopt[0]] = int(split_eopt[1])
                         elif split_eopt[0] in ('timer', ):
                             self._attrs['model']['types']['etime'][split_eopt[0]] = split_eopt[1]
+                        elif split_eopt[0] in ('binning', ):
+                            if split_eopt[1] not in ('linear', 'log', 'quantile'):
+                                raise UserException('Unknown elapsed-time binning: %s' % split_eopt[1])
+                            self._attrs['model']['types']['etime'][split_eopt[0]] = split_eopt[1]
                         else:
                             raise UserException('Unknown elapsed-time flag option: %s' % eopt)
 
@@ -1092,8 +1205,8 @@ class Config(object):
                             self._attrs['model']['types']['code'][split_copt[0]] = float(split_copt[1])
                         elif split_copt[0] in [ 'filter' ]:
                             self._attrs['model']['types']['code'][split_copt[0]] = split_copt[1].strip().split(':')
-                        elif split_copt[0] in ( 'ndata' ):
-                            self._attrs['model']['types']['code'][split_popt[0]] = int(split_copt[1])
+                        elif split_copt[0] in [ 'ndata' ]:
+                            self._attrs['model']['types']['code'][split_copt[0]] = int(split_copt[1])
                         else:
                             raise UserException('Unknown code-coverage flag option: %s' % copt)
         
@@ -1107,9 +1220,10 @@ class Config(object):
 
             if section_name in self.exclude:
                 options = self.exclude[section_name]
-                for pattern, actions in options.items():
-                    if match_namepath(pattern, args[0]):
-                        return actions
+                matcher = namepath_matcher(options.keys())
+                idx = matcher.first(args[0])
+                if idx is not None:
+                    return options[matcher.patterns[idx]]
             return []
         else:
             UserException('Not supported section name in exclusion input file: %s'%section)
@@ -1123,48 +1237,24 @@ class Config(object):
             self.includefile = os.path.basename(incattrs['opt'])
             shutil.copy(incattrs['opt'], self.path['outdir'])
 
+        # per-file information is read lazily from include database
+        from parser import kgincdb
+        inipath = '%s/%s'%(self.path['outdir'], self.includefile)
+        dbpath = '%s/%s'%(self.path['outdir'], self.includedbfile)
+        if os.path.isfile(inipath):
+            if not kgincdb.isuptodate(dbpath, inipath):
+                kgincdb.build(dbpath, inipath)
+            incdb = kgincdb.IncludeDB(dbpath, self._attrs['source']['alias'])
+        else:
+            incdb = kgincdb.IncludeDB(None, self._attrs['source']['alias'])
+
         # collect include configuration information
-        Inc = KgenConfigParser(allow_no_value=True)
-        #Inc.optionxform = str
-        Inc.read('%s/%s'%(self.path['outdir'], self.includefile))
-        for section in Inc.sections():
-            lsection = section.lower().strip()
+        for lsection, option, value in incdb.common():
             #if lsection in [ 'type', 'rename', 'state', 'extern' ]:
-            if lsection in [ 'type', 'macro' ]:
-                for option in Inc.options(section):
-                    incattrs[lsection][option] = Inc.get(section, option).strip()
-            elif lsection=='import':
-                for option in Inc.options(section):
-                    incattrs[lsection][option] = Inc.get(section, option).strip()
-    #                subflags = collections.OrderedDict()
-    #                for subf in Inc.get(section, option).split(','):
-    #                    subflags[subf.strip()] = None
-    #                incattrs[lsection][option] = subflags
+            if lsection in [ 'type', 'macro', 'import', 'compiler' ]:
+                incattrs[lsection][option] = value.strip() if value is not None else value
             elif lsection=='include':
-                for option in Inc.options(section):
-                    incattrs['path'].append(option.strip())
-            elif lsection=='compiler':
-                for option in Inc.options(section):
-                    incattrs[lsection][option] = Inc.get(section, option).strip()
-            elif os.path.isfile(section):
-                realpath = os.path.realpath(section)
-                if not realpath in incattrs['file']:
-                    incattrs['file'][realpath] = collections.OrderedDict()
-                    incattrs['file'][realpath]['path'] = ['.']
-                    incattrs['file'][realpath]['compiler'] = None 
-                    incattrs['file'][realpath]['compiler_options'] = None
-                    incattrs['file'][realpath]['macro'] = collections.OrderedDict()
-                for option in Inc.options(section):
-                    if option=='include':
-                        pathlist = Inc.get(section, option).split(':')
-                        incattrs['file'][realpath]['path'].extend(pathlist)
-                    elif option in [ 'compiler', 'compiler_options' ]:
-                        incattrs['file'][realpath][option] = Inc.get(section, option)
-                    else:
-                        incattrs['file'][realpath]['macro'][option] = Inc.get(section, option)
-            else:
-                pass
-                #print '%s is either not suppored keyword or can not be found. Ignored.' % section
+                incattrs['path'].append(option.strip())
 
         # dupulicate paths per each alias
         newpath = set() 
@@ -1177,30 +1267,15 @@ class Config(object):
                     newpath.add(p1+path[len(p2):])
         self._attrs['include']['path'] = list(newpath)
 
-        newfile =  collections.OrderedDict()
-        for path, value in self._attrs['include']['file'].items():
-            newfile[path] = value
-            for p1, p2 in self._attrs['source']['alias'].items():
-                if path.startswith(p1):
-                    newpath = p2+path[len(p1):]
-                    newfile[newpath] = copy.deepcopy(value) 
-                elif path.startswith(p2):
-                    newpath = p1+path[len(p2):]
-                    newfile[newpath] = copy.deepcopy(value) 
-        self._attrs['include']['file'] = newfile
-
-        for path, value in self._attrs['include']['file'].items():
-            if 'path' in value:
-                newpath = set()
-                for path in value['path']:
-                    newpath.add(path)
-                    for p1, p2 in self._attrs['source']['alias'].items():
-                        if path.startswith(p1):
-                            newpath.add(p2+path[len(p1):])
-                        elif path.startswith(p2):
-                            newpath.add(p1+path[len(p2):])
-                value['path'] = list(newpath)
+        # aliased paths of files are resolved at lookup
+        self._attrs['include']['file'] = incdb
 
+        # index modules defined in the files of include INI file
+        from parser.kgindex import ModuleIndex
+        modindex = ModuleIndex('%s/%s'%(self.path['outdir'], self.modindexfile))
+        modindex.add_files(self._attrs['include']['file'].keys())
+        modindex.save()
+        self._attrs['modindex'] = modindex
 
 
     def find_machine(self):
@@ -11,7 +11,7 @@ from importlib import import_module
 
 from parser import api, base_classes, statements, block_statements, typedecl_statements, Fortran2003
 from parser import kgparse
-from kgutils import ProgramException, traverse, match_namepath, pack_innamepath, pack_exnamepath
+from kgutils import ProgramException, traverse, match_namepath, match_namepaths, namepath_matcher, pack_innamepath, pack_exnamepath
 from kgplugin import Kgen_Plugin
 from kgconfig import Config
 
@@ -379,6 +379,7 @@ def set_plugin_env(mod):
     mod.get_entity_name = get_entity_name
     mod.pack_exnamepath = pack_exnamepath
     mod.match_namepath = match_namepath
+    mod.match_namepaths = match_namepaths
 
     mod.GENERATION_STAGE = GENERATION_STAGE
     mod.FILE_TYPE = FILE_TYPE
@@ -935,10 +936,9 @@ class GenK_Statement(Gen_Statement):
 
         def process_exclude(node, bag, depth):
             if isinstance(node, Fortran2003.Name):
-                for namepath, actions in bag['excludes'].items():
-                    if match_namepath(namepath, pack_innamepath(bag['stmt'], node.string)):
-                        bag['matched'] = True
-                        return True
+                if namepath_matcher(bag['excludes'].keys()).first(pack_innamepath(bag['stmt'], node.string)) is not None:
+                    bag['matched'] = True
+                    return True
 
         super(GenK_Statement, self).__init__(parent, stmt, match_class, kernel_id, attrs=attrs)
 
@@ -947,7 +947,7 @@ class GenK_Statement(Gen_Statement):
 
             if not hasattr(stmt, 'geninfo') and not hasattr(stmt, 'unknowns'):
                 self.kgen_isvalid = False
-            elif hasattr(stmt, 'f2003') and 'namepath' in Config.exclude:
+            elif stmt.has_f2003() and 'namepath' in Config.exclude:
                 bag = {'excludes': Config.exclude['namepath'], 'matched': False, 'stmt':stmt}
                 traverse(stmt.f2003, process_exclude, bag)
                 if bag['matched']:
@@ -966,7 +966,7 @@ class GenK_Statement(Gen_Statement):
         return self.statement_flatten(kernel_id, plugins)
 
     def tostring(self):
-        if hasattr(self, 'kgen_stmt') and hasattr(self.kgen_stmt, 'f2003') and hasattr(self.kgen_stmt.f2003, 'after_exclude'):
+        if hasattr(self, 'kgen_stmt') and self.kgen_stmt is not None and self.kgen_stmt.has_f2003() and hasattr(self.kgen_stmt.f2003, 'after_exclude'):
             self.skip_tostring = self.kgen_stmt.f2003.after_exclude
         return super(GenK_Statement, self).tostring()
 
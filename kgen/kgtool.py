@@ -2,6 +2,8 @@
 '''
 
 import os
+import sqlite3
+import itertools
 from kgconfig import Config
 try:
     import configparser
@@ -9,6 +11,54 @@ except:
     import ConfigParser as configparser
 
 GEN = 'general'
+CATALOG = 'kgen_sections'
+MODEL_HEADER = '; KGen Model Data File'
+
+def _quote(name):
+    return '"%s"'%name.replace('"', '""')
+
+def _tostr(value):
+    if isinstance(value, float):
+        return repr(value)
+    return '%s'%value
+
+def read_manifest(modelfile):
+    ''' returns an ordered list of (modeltype, [ section, ... ]) in model manifest '''
+
+    cfg = configparser.ConfigParser()
+    cfg.optionxform = str
+    cfg.read(modelfile)
+
+    if not cfg.has_section(GEN):
+        return []
+
+    return [ (mtype, [ s.strip() for s in cfg.get(GEN, mtype).split(',') ]) for mtype in cfg.options(GEN) ]
+
+def export_model(modelfile, modeldb, fd):
+    ''' writes model manifest and model data in INI format '''
+
+    manifest = read_manifest(modelfile)
+
+    fd.write('%s\n[%s]\n'%(MODEL_HEADER, GEN))
+    for mtype, sections in manifest:
+        fd.write('%s = %s\n'%(mtype, ', '.join(sections)))
+    fd.write('\n')
+
+    if not os.path.exists(modeldb):
+        return
+
+    conn = sqlite3.connect(modeldb)
+    try:
+        catalog = conn.execute('SELECT name, keys, sep FROM %s ORDER BY rowid'%CATALOG).fetchall()
+        for name, keys, sep in catalog:
+            fd.write('[%s]\n'%name)
+            rows = conn.execute('SELECT * FROM %s ORDER BY rowid'%_quote(name))
+            for key, group in itertools.groupby(rows, lambda row: row[:keys]):
+                value = ', '.join(sep.join(_tostr(v) for v in row[keys:]) for row in group)
+                fd.write('%s = %s\n'%(' '.join(_tostr(k) for k in key), value))
+            fd.write('\n')
+    finally:
+        conn.close()
 
 class KGTool(object):
 
@@ -19,116 +69,110 @@ class KGTool(object):
         raise Exception('"%s" should implement "run" method.'%self.__class__.__name__)
 
 class KGModelingTool(object):
+    ''' model manifest is kept in Config.modelfile and model sections are kept
+        as tables in Config.modeldb. A model section is added with one insert
+        and without reading other sections. '''
+
+    def _modelfile(self):
+        return '%s/%s'%(Config.path['outdir'], Config.modelfile)
+
+    def _connect(self):
+        conn = sqlite3.connect('%s/%s'%(Config.path['outdir'], Config.modeldb))
+        conn.execute('CREATE TABLE IF NOT EXISTS %s (name TEXT PRIMARY KEY, keys INTEGER, sep TEXT)'%CATALOG)
+        return conn
 
     def hasmodel(self, modeltype):
 
-        modelfile = '%s/%s'%(Config.path['outdir'], Config.modelfile)
- 
-        if not os.path.exists(modelfile):
+        modelfile = self._modelfile()
+
+        if not os.path.exists(modelfile) or not os.path.exists('%s/%s'%(Config.path['outdir'], Config.modeldb)):
             return False
 
-        has_general = False
-        has_modeltype = False
-        has_modelsection = False
-        section = ''
-        required_modelsections = []
-        model_sections = {}
-        with open(modelfile, 'r') as mf:
-
-            for line in mf.readlines():
-                if line.startswith('['):
-                    pos = line.find(']')
-                    if pos > 0:
-                        section = line[1:pos].strip()
-                        if section == 'general':
-                            has_general = True
-                        else:
-                            mtype, msec = section.split('.')
-                            if mtype not in model_sections:
-                                model_sections[mtype] = []
-                            model_sections[mtype].append(msec)
-                elif section == 'general' and line.find('=') > 0:
-                    mtype, msections = line.split('=') 
-                    if mtype.strip() == modeltype:
-                        required_modelsections = [s.strip() for s in msections.split(',')]
-                        has_modeltype = True
-                if has_modeltype and modeltype in model_sections and all( (msec in model_sections[modeltype]) for msec in required_modelsections):
-                    has_modelsection = True
-
-                if has_general and has_modeltype and has_modelsection:
-                    break
-#        cfg = configparser.ConfigParser()
-#        cfg.optionxform = str
-#        
-#        with open(modelfile, 'r') as mf:
-#            if not cfg.read(mf):
-#                return False
-#
-#            if not cfg.has_section(GEN):
-#                return False
-#
-#            if not cfg.has_option(GEN, modeltype):
-#                return False
-#
-#            for subsec in [ s.strip() for s in cfg.get(GEN, modeltype).split(',') ]:
-#                if not cfg.has_section('%s.%s'%(modeltype, subsec)):
-#                    return False
-
-        return has_general and has_modeltype and has_modelsection
+        for mtype, sections in read_manifest(modelfile):
+            if mtype == modeltype:
+                conn = self._connect()
+                try:
+                    for sec in sections:
+                        if conn.execute('SELECT 1 FROM %s WHERE name=?'%CATALOG, ('%s.%s'%(modeltype, sec),)).fetchone() is None:
+                            return False
+                finally:
+                    conn.close()
+                return True
+
+        return False
 
     def addmodel(self, modeltype, sections):
-         
-        modelfile = '%s/%s'%(Config.path['outdir'], Config.modelfile)
-
-        mode = 'r+'
-        if not os.path.exists(modelfile):
-            mode = 'w+'
-
-        with open(modelfile, mode) as mf:
-            mf.seek(0, os.SEEK_END)
-            size = mf.tell()
-            if size == 0:
-                mf.write('; KGen Model Data File\n')
-
-        cfg = configparser.ConfigParser()
-        cfg.optionxform = str
-        cfg.read(modelfile)
-
-        if not cfg.has_section(GEN):
-            cfg.add_section(GEN)
-
-        if not cfg.has_option(GEN, modeltype):
-            cfg.set(GEN, modeltype, ', '.join(sections))
-#
-#        for sec in sections:
-#            secname = '%s.%s'%(modeltype, sec)
-#            if not cfg.has_section(secname):
-#                cfg.add_section(secname)
-       
-        with open(modelfile, mode) as mf:
-            cfg.write(mf)
 
+        modelfile = self._modelfile()
+        manifest = [ (mtype, secs) for mtype, secs in read_manifest(modelfile) if mtype != modeltype ]
+        manifest.append((modeltype, sections))
+
+        with open(modelfile, 'w') as mf:
+            mf.write('%s\n[%s]\n'%(MODEL_HEADER, GEN))
+            for mtype, secs in manifest:
+                mf.write('%s = %s\n'%(mtype, ', '.join(secs)))
+
+        # sections of previous model data are replaced
+        conn = self._connect()
+        try:
+            with conn:
+                prefix = '%s.'%modeltype
+                for (name,) in conn.execute('SELECT name FROM %s'%CATALOG).fetchall():
+                    if name.startswith(prefix):
+                        conn.execute('DROP TABLE IF EXISTS %s'%_quote(name))
+                        conn.execute('DELETE FROM %s WHERE name=?'%CATALOG, (name,))
+        finally:
+            conn.close()
 
     def addsection(self, modeltype, section, options):
-         
-        modelfile = '%s/%s'%(Config.path['outdir'], Config.modelfile)
+        ''' adds a section of (option, value) string pairs '''
 
-        mode = 'r+'
-        if not os.path.exists(modelfile):
-            raise Exception('Modelfile does not exists: %s'%modelfile)
+        self.addtable(modeltype, section, [ ('option', 'TEXT'), ('value', 'TEXT') ], options, keys=1)
 
-        cfg = configparser.ConfigParser()
-        cfg.optionxform = str
-        cfg.read(modelfile)
- 
-        subsec = '%s.%s'%(modeltype, section)
-        if cfg.has_section(subsec):
-            raise Exception('Section already exists: %s'%subsec)
+    def addtable(self, modeltype, section, columns, rows, keys=1, sep=', '):
+        ''' adds a section of typed columns. first "keys" columns are indexed and
+            form an option name when exported. rows of an option should be
+            added consecutively. '''
 
-        cfg.add_section(subsec)
+        if not os.path.exists(self._modelfile()):
+            raise Exception('Modelfile does not exists: %s'%self._modelfile())
 
-        for opt, val in options:
-            cfg.set(subsec, opt, val)
-       
-        with open(modelfile, mode) as mf:
-            cfg.write(mf)
+        subsec = '%s.%s'%(modeltype, section)
+        table = _quote(subsec)
+
+        conn = self._connect()
+        try:
+            if conn.execute('SELECT 1 FROM %s WHERE name=?'%CATALOG, (subsec,)).fetchone() is not None:
+                raise Exception('Section already exists: %s'%subsec)
+
+            with conn:
+                conn.execute('CREATE TABLE %s (%s)'%(table, ', '.join('%s %s'%(n, t) for n, t in columns)))
+                conn.execute('CREATE INDEX %s ON %s (%s)'%(_quote('%s.index'%subsec), table, \
+                    ', '.join(n for n, t in columns[:keys])))
+                conn.executemany('INSERT INTO %s VALUES (%s)'%(table, ', '.join('?'*len(columns))), rows)
+                conn.execute('INSERT INTO %s VALUES (?, ?, ?)'%CATALOG, (subsec, keys, sep))
+        finally:
+            conn.close()
+
+    def getoption(self, modeltype, section, option):
+
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT value FROM %s WHERE option=?'%_quote('%s.%s'%(modeltype, section)), \
+                (option,)).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            raise Exception('No option "%s" in section: %s.%s'%(option, modeltype, section))
+        return row[0]
+
+    def gettable(self, modeltype, section):
+        ''' generates rows of a section in the order of addition '''
+
+        conn = self._connect()
+        try:
+            for row in conn.execute('SELECT * FROM %s ORDER BY rowid'%_quote('%s.%s'%(modeltype, section))):
+                yield row
+        finally:
+            conn.close()
@@ -3,6 +3,7 @@
 
 from __future__ import print_function
 
+import re
 import sys
 import logging
 import subprocess
@@ -20,18 +21,64 @@ def encode_NS(namepath):
 def decode_NS(namepath):
     return namepath.replace(INTERNAL_NAMELEVEL_SEPERATOR, EXTERNAL_NAMELEVEL_SEPERATOR)
 
+# identifier that Data_Ref matches as a Name
+plain_name = re.compile(r'[a-z][a-z0-9_]*\Z').match
+
 class KGName(object):
-    def __init__(self, name, node=None, stmt=None):
-        from parser.Fortran2003 import Data_Ref
+    """ name path of a Fortran entity
+
+    KGName objects are interned so that identical name paths share one
+    immutable object and compare by identity. node and stmt are accepted
+    for compatibility and are not kept in the shared object.
+    """
+
+    __slots__ = ('namepath', 'namelist', '_dataref', '_firstpartname')
+
+    # name or name path -> KGName
+    _interned = {}
+
+    def __new__(cls, name, node=None, stmt=None):
+        obj = cls._interned.get(name, None)
+        if obj is not None:
+            return obj
+
         if not name: raise ProgramException('Name can not be none or blank')
         if name[0].isdigit(): raise ProgramException('Name can not have digit as its first character')
 
-        self.namepath = encode_NS(name).strip().lower() # lower case
-        self.namelist = self.namepath.split(INTERNAL_NAMELEVEL_SEPERATOR)
-        self.dataref = Data_Ref(self.namelist[-1])
-        self.node = node
-        self.stmt = stmt
-        #self.rename = []
+        namepath = encode_NS(name).strip().lower() # lower case
+        obj = cls._interned.get(namepath, None)
+        if obj is None:
+            obj = object.__new__(cls)
+            namelist = namepath.split(INTERNAL_NAMELEVEL_SEPERATOR)
+            object.__setattr__(obj, 'namepath', namepath)
+            object.__setattr__(obj, 'namelist', namelist)
+            if plain_name(namelist[-1]):
+                # a plain identifier is not parsed until its dataref is used
+                object.__setattr__(obj, '_dataref', None)
+                object.__setattr__(obj, '_firstpartname', namelist[-1])
+            else:
+                from parser.Fortran2003 import Data_Ref
+                object.__setattr__(obj, '_dataref', Data_Ref(namelist[-1]))
+                object.__setattr__(obj, '_firstpartname', None)
+            cls._interned[namepath] = obj
+        cls._interned[name] = obj
+        return obj
+
+    def __init__(self, name, node=None, stmt=None):
+        pass
+
+    def __setattr__(self, name, value):
+        raise AttributeError('KGName is immutable')
+
+    def __reduce__(self):
+        return (KGName, (self.namepath,))
+
+    @property
+    def dataref(self):
+        if self._dataref is None:
+            from parser.Fortran2003 import Name
+            object.__setattr__(self, '_dataref', Name(self.namelist[-1]))
+        return self._dataref
 
     def path(self):
         return decode_NS(self.namepath)
@@ -39,9 +86,6 @@ class KGName(object):
     def list(self):
         return self.namelist
 
-    def dataref(self):
-        return self.dataref
-
     def last(self):
         return self.namelist[-1]
 
@@ -49,26 +93,20 @@ class KGName(object):
         return self.namelist[0]
 
     def firstpartname(self):
-        from parser.Fortran2003 import Name
-        if isinstance(self.dataref, Name):
-            return self.dataref.string
-        else:
-            return self.dataref.items[0].string
-
-    def __eq__(self, other):
-        return self.namepath==other.namepath
-
-    def __hash__(self):
-        return hash(self.namepath)
+        if self._firstpartname is None:
+            from parser.Fortran2003 import Name
+            if isinstance(self.dataref, Name):
+                firstpartname = self.dataref.string
+            else:
+                firstpartname = self.dataref.items[0].string
+            object.__setattr__(self, '_firstpartname', firstpartname)
+        return self._firstpartname
 
     def __str__(self):
         raise Exception('KGName')
 
 def _get_namepath(stmt, external):
-    if external:
-        return EXTERNAL_NAMELEVEL_SEPERATOR.join([ a.name.lower() for a in stmt.ancestors() ])
-    else:
-        return INTERNAL_NAMELEVEL_SEPERATOR.join([ a.name.lower() for a in stmt.ancestors() ])
+    return stmt.ancestor_namepath(external)
 
 def _pack_namepath(stmt, lastname, external):
     if external:
@@ -102,51 +140,167 @@ def match_namepath(pattern, namepath, internal=True):
 
     if not pattern or not namepath: return False
 
-    if internal:
-        split_pattern = pattern.split(INTERNAL_NAMELEVEL_SEPERATOR)
-        split_namepath = namepath.split(INTERNAL_NAMELEVEL_SEPERATOR)
-    else:
-        split_pattern = pattern.split(EXTERNAL_NAMELEVEL_SEPERATOR)
-        split_namepath = namepath.split(EXTERNAL_NAMELEVEL_SEPERATOR)
-
-    p = list(split_pattern)
-
-    leading_mark = False
-    if len(p[0])==0:
-        leading_mark = True
-        p = p[1:]
-
-    ending_mark = False
-    if len(p[-1])==0:
-        ending_mark = True
-        p = p[:-1]
-        if len(p)==0:
-            raise UserException('Wrong namepath format: %s'%split_pattern)
-
-    n = list(split_namepath)
-    while len(p)>0 and len(n)>0:
-        if p[0]==n[0]:
-            p = p[1:]
-            n = n[1:]
-        elif leading_mark:
-            n = n[1:]
-        elif len(p[0])==0:
-            leading_mark = True
+    return _compile_namepath(pattern, internal).match(_split_namepath(namepath, internal))
+
+# size of LRU caches of name path matching
+NAMEPATH_CACHE_SIZE = 4096
+
+class LRUCache(object):
+    """ dictionary of limited size that drops the least recently used item """
+
+    def __init__(self, size):
+        from collections import OrderedDict
+        self.size = size
+        self.items = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self.items:
+            return default
+        value = self.items.pop(key)
+        self.items[key] = value
+        return value
+
+    def set(self, key, value):
+        if key in self.items:
+            del self.items[key]
+        elif len(self.items) >= self.size:
+            self.items.popitem(last=False)
+        self.items[key] = value
+
+class _NamepathPattern(object):
+    """ a name path pattern split into names """
+
+    def __init__(self, pattern, sep):
+        split_pattern = pattern.split(sep)
+        p = list(split_pattern)
+
+        self.leading_mark = False
+        if len(p[0])==0:
+            self.leading_mark = True
             p = p[1:]
-        else:
-            return False
 
-    if len(p)==0:
-        if len(n)>0:
-            if ending_mark: return True
-            return False
-        else:
-            return True
-    else:
-        if len(n)>0:
-            raise ProgramException('Incorrect namepath match: (%s, %s)'%(split_pattern, split_namepath))
-        else:
-            return False
+        self.ending_mark = False
+        self.error = None
+        if len(p[-1])==0:
+            self.ending_mark = True
+            p = p[:-1]
+            if len(p)==0:
+                self.error = 'Wrong namepath format: %s'%split_pattern
+
+        self.names = tuple(p)
+
+    def match(self, n):
+        """ matches names of a name path in the same way as match_namepath """
+
+        if self.error:
+            raise UserException(self.error)
+
+        p = self.names
+        leading_mark = self.leading_mark
+        lp = len(p)
+        ln = len(n)
+        i = j = 0
+        while i<lp and j<ln:
+            if p[i]==n[j]:
+                i += 1
+                j += 1
+            elif leading_mark:
+                j += 1
+            elif len(p[i])==0:
+                leading_mark = True
+                i += 1
+            else:
+                return False
+
+        if i==lp:
+            return j==ln or self.ending_mark
+        return False
+
+_compiled_namepaths = {}
+_split_namepaths = { True: LRUCache(NAMEPATH_CACHE_SIZE), False: LRUCache(NAMEPATH_CACHE_SIZE) }
+
+def _compile_namepath(pattern, internal):
+    key = (pattern, internal)
+    if key not in _compiled_namepaths:
+        sep = INTERNAL_NAMELEVEL_SEPERATOR if internal else EXTERNAL_NAMELEVEL_SEPERATOR
+        _compiled_namepaths[key] = _NamepathPattern(pattern, sep)
+    return _compiled_namepaths[key]
+
+def _split_namepath(namepath, internal):
+    cache = _split_namepaths[internal]
+    names = cache.get(namepath)
+    if names is None:
+        names = tuple(namepath.split(INTERNAL_NAMELEVEL_SEPERATOR if internal else EXTERNAL_NAMELEVEL_SEPERATOR))
+        cache.set(namepath, names)
+    return names
+
+class NamepathMatcher(object):
+    """ matches name paths against a list of patterns
+
+    Patterns are compiled once and results are cached per name path. The
+    result of each pattern is the same as match_namepath.
+    """
+
+    def __init__(self, patterns, internal=True, cachesize=NAMEPATH_CACHE_SIZE):
+        self.patterns = list(patterns)
+        self.internal = internal
+        self.compiled = [ _compile_namepath(pattern, internal) if pattern else None for pattern in self.patterns ]
+        self.cache = LRUCache(cachesize)
+
+    def _match(self, namepath):
+        # returns (indices of matched patterns, index of the first wrong pattern or None)
+        result = self.cache.get(namepath)
+        if result is None:
+            matched = []
+            error = None
+            if namepath:
+                names = _split_namepath(namepath, self.internal)
+                for idx, compiled in enumerate(self.compiled):
+                    if compiled is None:
+                        continue
+                    elif compiled.error:
+                        if error is None: error = idx
+                    elif compiled.match(names):
+                        matched.append(idx)
+            result = (tuple(matched), error)
+            self.cache.set(namepath, result)
+        return result
+
+    def first(self, namepath):
+        """ returns index of the first matched pattern or None """
+
+        matched, error = self._match(namepath)
+        if error is not None and (not matched or error < matched[0]):
+            raise UserException(self.compiled[error].error)
+        return matched[0] if matched else None
+
+    def matches(self, namepath):
+        """ returns indices of all matched patterns """
+
+        matched, error = self._match(namepath)
+        if error is not None:
+            raise UserException(self.compiled[error].error)
+        return matched
+
+    def match(self, namepath):
+        return self.first(namepath) is not None
+
+_namepath_matchers = {}
+
+def namepath_matcher(patterns, internal=True):
+    """ returns a cached NamepathMatcher of patterns """
+
+    key = (tuple(patterns), internal)
+    if key not in _namepath_matchers:
+        _namepath_matchers[key] = NamepathMatcher(key[0], internal)
+    return _namepath_matchers[key]
+
+def match_namepaths(patterns, namepath, internal=True):
+    """ returns True if any of patterns matches namepath """
+
+    if not patterns or not namepath: return False
+
+    return namepath_matcher(patterns, internal).match(namepath)
 
 #############################################################################
 ## EXCEPTION
@@ -183,35 +337,59 @@ def run_shcmd(cmd, input=None, **kwargs):
         proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, \
             stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, text=True, **kwargs)
     out, err = proc.communicate(input=input)
-    print('output=%s'%out)
 
     if proc.returncode != 0 and show_error_msg:
         print('>> %s' % cmd)
-        print('returned non-zero code from shell('+str(ret_code)+')\n OUTPUT: '+str(out)+'\n ERROR: '+str(err)+'\n')
+        print('returned non-zero code from shell('+str(proc.returncode)+')\n OUTPUT: '+str(out)+'\n ERROR: '+str(err)+'\n')
 
     return out, err, proc.returncode
 
+_END_OF_CHILDREN = object()
+
 # traverse f2003 nodes
 # traverse and func will return None if to continue processing
 # traverse and func will return return code if to stop processing
 # The return code will be forwarded to initial caller
 # func will collect anything in bag during processing
 def traverse(node, func, bag, subnode='items', prerun=True, depth=0):
-    ret = None
+    # nodes are visited with an explicit stack instead of recursion
 
-    if prerun and func is not None:
-        ret = func(node, bag, depth)
-        if ret is not None: return ret
-
-    if node and hasattr(node, subnode) and getattr(node, subnode) is not None:
-        for child in getattr(node, subnode):
-            ret = traverse(child, func, bag, subnode=subnode, prerun=prerun, depth=depth+1)
-
-    if not prerun and func is not None:
-        ret = func(node, bag, depth)
-        if ret is not None: return ret
-
-    return ret
+    ret = None
+    if prerun:
+        # a recursive call returns the value of func on the last visited node
+        stack = [ (node, depth) ]
+        while stack:
+            node, depth = stack.pop()
+            if func is not None:
+                ret = func(node, bag, depth)
+                if ret is not None: continue
+            children = getattr(node, subnode, None) if node else None
+            if children:
+                depth += 1
+                stack.extend([ (child, depth) for child in reversed(children) ])
+        return ret
+
+    # a frame is [node, depth, iterator of children]
+    stack = []
+    while True:
+        children = getattr(node, subnode, None) if node else None
+        if children:
+            stack.append([node, depth, iter(children)])
+        elif func is not None:
+            ret = func(node, bag, depth)
+
+        while stack:
+            frame = stack[-1]
+            child = next(frame[2], _END_OF_CHILDREN)
+            if child is not _END_OF_CHILDREN:
+                node = child
+                depth = frame[1] + 1
+                break
+            stack.pop()
+            if func is not None:
+                ret = func(frame[0], bag, frame[1])
+        else:
+            return ret
 
 def get_subtree(obj, tree, prefix='top', depth=0):
     tab = '    '
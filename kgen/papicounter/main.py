@@ -12,16 +12,16 @@ import random
 import collections
 import multiprocessing
 from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 from kgtool import KGModelingTool
 from parser.kgparse import KGGenType
 from kggenfile import gensobj, KERNEL_ID_0, event_register, Gen_Statement, set_indent
 import kgutils
 from kgconfig import Config
-try:
-    import configparser
-except:
-    import ConfigParser as configparser
 
 BEGIN_DATA_MARKER = r'kgpathbegin'
 END_DATA_MARKER = r'kgpathend'
@@ -37,7 +37,7 @@ def chunks(l, n):
 
 def update(d, u):
     for k, v in u.items():
-        if isinstance(v, collections.Mapping):
+        if isinstance(v, Mapping):
             r = update(d.get(k, {}), v)
             d[k] = r
         else:
@@ -293,8 +293,9 @@ class PapiCounter(KGModelingTool):
                         for ranknum, threadnums in papis.items():
                             for threadnum, invokenums in threadnums.items():
                                 for invokenum, pvalue  in invokenums.items():
-                                    papi.append( ( '%s %s %s'%(ranknum, threadnum, invokenum), str(pvalue) ) )
-                        self.addsection('papi', 'counters', papi)
+                                    papi.append( ( int(ranknum), int(threadnum), int(invokenum), int(pvalue) ) )
+                        self.addtable('papi', 'counters', [ ('rank', 'INTEGER'), ('thread', 'INTEGER'), \
+                            ('invoke', 'INTEGER'), ('counter', 'INTEGER') ], papi, keys=3)
 
                         summary = []
                         summary.append( ('minimum_papicounter', str(papimin)) )
@@ -323,15 +324,11 @@ class PapiCounter(KGModelingTool):
             # read ini file
             kgutils.logger.info('Reading %s/%s'%(Config.path['outdir'], Config.modelfile))
 
-            cfg = configparser.ConfigParser()
-            cfg.optionxform = str
-            cfg.read('%s/%s'%(Config.path['outdir'], Config.modelfile))
-
             try:
 
-                papimin = int(cfg.get('papi.summary', 'minimum_papicounter').strip())
-                papimax = int(cfg.get('papi.summary', 'maximum_papicounter').strip())
-                npapis = int(cfg.get('papi.summary', 'number_papicounters').strip())
+                papimin = int(self.getoption('papi', 'summary', 'minimum_papicounter').strip())
+                papimax = int(self.getoption('papi', 'summary', 'maximum_papicounter').strip())
+                npapis = int(self.getoption('papi', 'summary', 'number_papicounters').strip())
                 papidiff = papimax - papimin
 
                 # <MPI rank> < OpenMP Thread> <invocation order> =  <file number>:<line number>:<num papis> ... 
@@ -356,9 +353,7 @@ class PapiCounter(KGModelingTool):
 
                 idx = 0
                 # TODO: conver to counters
-                for opt in cfg.options('papi.counters'):
-                    ranknum, threadnum, invokenum = tuple( num for num in opt.split() )
-                    count = cfg.getint('papi.counters', opt)
+                for ranknum, threadnum, invokenum, count in self.gettable('papi', 'counters'):
 
                     if nbins > 1:
                         binnum = int(math.floor((count - papimin) / papidiff * (nbins - 1)))
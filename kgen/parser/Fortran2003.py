@@ -9,6 +9,7 @@ import logging
 from .splitline import string_replace_map
 from . import pattern_tools as pattern
 from .readfortran import FortranReaderBase
+from .utils import with_metaclass
 
 logger = logging.getLogger("kgen")
 
@@ -21,6 +22,79 @@ class Comment(object):
 class Begin_Source(object):
     pass
 
+def _new_base(cls):
+    # used to unpickle Base instances without matching a string
+    return object.__new__(cls)
+
+# attributes that KGen sets on Fortran2003 node of a statement
+STMT_SLOTS = ('stmtpair', 'after_exclude', 'after_coverage', 'coverage_name')
+
+def slotstate(obj):
+    state = {}
+    for cls in obj.__class__.__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            if name not in state and hasattr(obj, name):
+                state[name] = getattr(obj, name)
+    return state
+
+class MatchMemo(object):
+    """ Packrat memo of Base.__new__ results within a statement.
+
+    Results are keyed by class, string and the classes already tried for
+    the string that the class may try again, so that memoized results are
+    the same as re-matching.
+    """
+    enabled = False
+    table = None
+    hits = 0
+    misses = 0
+    reachable = {}
+
+    @classmethod
+    def key(cls, basecls, string, parent_cls):
+        reach = cls.reachable.get(basecls, None)
+        if reach is None:
+            reach = set()
+            names = [ basecls.__name__ ]
+            while names:
+                for subcls in Base.subclasses.get(names.pop(), []):
+                    if subcls not in reach:
+                        reach.add(subcls)
+                        names.append(subcls.__name__)
+            cls.reachable[basecls] = reach
+        return (basecls, string, frozenset([ c for c in parent_cls if c in reach ]))
+
+    @classmethod
+    def begin(cls):
+        if cls.enabled:
+            cls.table = {}
+
+    @classmethod
+    def end(cls):
+        cls.table = None
+
+    @classmethod
+    def copy(cls, obj):
+        if isinstance(obj, Base):
+            newobj = object.__new__(obj.__class__)
+            for name, value in slotstate(obj).items():
+                setattr(newobj, name, value)
+            if hasattr(obj, 'items'):
+                newobj.items = cls.copy(obj.items)
+            return newobj
+        elif isinstance(obj, tuple):
+            return tuple([ cls.copy(item) for item in obj ])
+        elif isinstance(obj, list):
+            return [ cls.copy(item) for item in obj ]
+        return obj
+
+    @classmethod
+    def hitrate(cls):
+        total = cls.hits + cls.misses
+        if total > 0:
+            return 100.0 * cls.hits / total
+        return 0.0
+
 # end of KGEN
 ###############################################################################
 ############################## BASE CLASSES ###################################
@@ -41,7 +115,19 @@ def show_result(func):
         return r
     return new_func
 
-class Base(object):
+# start of KGEN addition
+class BaseMeta(type):
+    """ Gives empty __slots__ to Base subclasses that do not declare their
+    own so that Fortran2003 nodes do not have per-instance __dict__.
+    """
+    def __new__(mcs, name, bases, namespace):
+        if '__slots__' not in namespace:
+            namespace['__slots__'] = ()
+        return type.__new__(mcs, name, bases, namespace)
+# end of KGEN addition
+
+#class Base(object): # KGEN deletion
+class Base(with_metaclass(BaseMeta, object)): # KGEN addition
     """ Base class for Fortran 2003 syntax rules.
 
     All Base classes have the following attributes:
@@ -49,12 +135,47 @@ class Base(object):
                 is either str or FortranReaderBase.
       .item   - Line instance (holds label) or None.
     """
+    # start of KGEN addition
+    __slots__ = ('string', 'item', 'items', 'parent', 'skip_search')
+    # end of KGEN addition
+
     subclasses = {}
 
     @show_result
     def __new__(cls, string, parent_cls = None):
         """
         """
+        # start of KGEN addition
+        if MatchMemo.table is not None and isinstance(string, str):
+            if parent_cls is None:
+                parent_cls = [cls]
+            elif cls not in parent_cls:
+                parent_cls.append(cls)
+            key = MatchMemo.key(cls, string, parent_cls)
+            memo = MatchMemo.table.get(key, None)
+            if memo is None:
+                MatchMemo.misses += 1
+                nparents = len(parent_cls)
+                try:
+                    obj = Base._new(cls, string, parent_cls)
+                    MatchMemo.table[key] = (obj, None, parent_cls[nparents:])
+                    return obj
+                except NoMatchError as msg:
+                    MatchMemo.table[key] = (None, str(msg), parent_cls[nparents:])
+                    raise
+            MatchMemo.hits += 1
+            obj, errmsg, tried = memo
+            for tcls in tried:
+                if tcls not in parent_cls:
+                    parent_cls.append(tcls)
+            if errmsg is not None:
+                raise NoMatchError(errmsg)
+            return MatchMemo.copy(obj)
+        return Base._new(cls, string, parent_cls)
+
+    @staticmethod
+    def _new(cls, string, parent_cls = None):
+        # end of KGEN addition
         if parent_cls is None:
             parent_cls = [cls]
         elif cls not in parent_cls:
@@ -141,6 +262,11 @@ class Base(object):
     def restore_reader(self, reader):
         reader.put_item(self.item)
 
+    # start of KGEN addition
+    def __reduce_ex__(self, protocol):
+        return (_new_base, (self.__class__,), (None, slotstate(self)))
+    # end of KGEN addition
+
 class BlockBase(Base):
     """
 ::
@@ -154,6 +280,8 @@ Attributes
 ----------
 content : tuple
     """
+    __slots__ = ('content',) # KGEN addition
+
     def match(startcls, subclasses, endcls, reader,
               match_labels = False,
               match_names = False, set_unspecified_end_name = False,
@@ -339,6 +467,8 @@ class SequenceBase(Base):
 ::
     <sequence-base> = <obj>, <obj> [ , <obj> ]...
     """
+    __slots__ = ('separator',) # KGEN addition
+
     def match(separator, subcls, string):
         from .utils import entity_split_comma
         line, repmap = string_replace_map(string)
@@ -642,6 +772,8 @@ Attributes
 ----------
 item : readfortran.Line
     """
+    __slots__ = STMT_SLOTS # KGEN addition
+
     def tofortran(self, tab='', isfix=None):
         label = None
         name = None
@@ -672,6 +804,8 @@ class EndStmtBase(StmtBase):
 ::
     <end-stmt-base> = END [ <stmt> [ <stmt-name>] ]
     """
+    __slots__ = ('type', 'name') # KGEN addition
+
     @staticmethod
     def match(stmt_type, stmt_name, string, require_stmt_type=False):
         start = string[:3].upper()
@@ -1615,6 +1749,8 @@ class Sequence_Stmt(STRINGBase): # R434
     """
     <sequence-stmt> = SEQUENCE
     """
+    __slots__ = STMT_SLOTS # KGEN addition
+
     subclass_names = []
     @staticmethod
     def match(string):
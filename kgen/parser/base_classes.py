@@ -28,8 +28,9 @@ from .utils import classes, with_metaclass
 # start of KGEN addition
 logger = logging.getLogger('kgen')
 
-from kgutils import KGName, ProgramException, traverse
+from kgutils import KGName, ProgramException, traverse, EXTERNAL_NAMELEVEL_SEPERATOR, INTERNAL_NAMELEVEL_SEPERATOR
 from .kgextra import Intrinsic_Procedures
+from .kgclassify import ClassIndex
 from kgconfig import Config
 
 class KGen_Resolver(object):
@@ -41,14 +42,15 @@ class KGen_Resolver(object):
 
     # save names that this self resolved
     def add_geninfo(self, uname, request):
+        from .kgparse import GenInfoList
 
         if uname is None or request is None: return
 
         if not hasattr(self, 'geninfo'):
             self.geninfo = OrderedDict()
         if not request.gentype in self.geninfo:
-            self.geninfo[request.gentype] = []
-        if (uname, request) not in self.geninfo[request.gentype]:
+            self.geninfo[request.gentype] = GenInfoList()
+        if not self.geninfo[request.gentype].has_pair(uname, request):
             self.geninfo[request.gentype].append((uname, request))
 
     def get_variable(self, name):
@@ -122,6 +124,14 @@ class AttributeHolder(object):
                   % (self.__class__.__name__,name,','.join(self._attributes.keys())))
         self._attributes[name] = value
 
+    # start of KGEN addition
+    def __getstate__(self):
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+    # end of KGEN addition
+
     def isempty(self):
         for k in self._attributes.keys():
             v = getattr(self,k)
@@ -688,6 +698,29 @@ class Statement(with_metaclass(classes, object)):
 
     # start of KGEN
 
+    # number of statements converted to Fortran2003 nodes
+    f2003_converted = 0
+
+    def __getattr__(self, name):
+        # f2003 attribute of a parsed statement is created on first access
+        if name=='f2003' and self.__dict__.get('f2003_lazy', False):
+            if 'f2003_error' not in self.__dict__:
+                try:
+                    self.parse_f2003()
+                    return self.__dict__['f2003']
+                except Exception as e:
+                    self.__dict__['f2003_error'] = str(e)
+            raise ProgramException('Conversion to Fortran2003 node is failed at "%s": %s'%(str(self).strip(), \
+                self.__dict__['f2003_error']))
+        raise AttributeError("'%s' object has no attribute '%s'"%(self.__class__.__name__, name))
+
+    def has_f2003(self):
+        ''' returns True if f2003 attribute exists or is created on first access
+
+        Unlike hasattr, conversion errors are not hidden.
+        '''
+        return 'f2003' in self.__dict__ or self.__dict__.get('f2003_lazy', False)
+
     def remove_label(self, line):
         # remove label
         _label_re = re.compile(r'\s*(?P<label>\d+)\s*(\b|(?=&)|\Z)',re.I)
@@ -720,28 +753,69 @@ class Statement(with_metaclass(classes, object)):
 #        else:
 #            return self.item.apply_map(self.tofortran().lstrip())
 
-    def ancestors(self, include_beginsource=False):
-        from .block_statements import BeginSource, HasUseStmt, Type
-
-        anc = []
-
-        parent = self.parent
-        while not isinstance(parent, BeginSource):
-            if isinstance(parent, HasUseStmt) or parent.__class__ in [Type]:
-                anc.append(parent)
-            parent = parent.parent
+    # incremented whenever a statement is reparented. cached ancestors of
+    # an older generation are computed again.
+    parent_generation = 0
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent):
+        if '_parent' in self.__dict__ and self.__dict__['_parent'] is not parent:
+            Statement.parent_generation += 1
+        self.__dict__['_parent'] = parent
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_ancestors', None)
+        return state
+
+    def _ancestor_cache(self):
+        # [generation, ancestors, BeginSource, ancestor set, internal namepath, external namepath]
+        cache = self.__dict__.get('_ancestors', None)
+        if cache is None or cache[0]!=Statement.parent_generation:
+            from .block_statements import BeginSource, HasUseStmt, Type
+
+            parent = self.parent
+            if isinstance(parent, BeginSource):
+                cache = [ Statement.parent_generation, [], parent, None, None, None ]
+            else:
+                pcache = parent._ancestor_cache()
+                if isinstance(parent, HasUseStmt) or parent.__class__ in [Type]:
+                    cache = [ Statement.parent_generation, pcache[1] + [ parent ], pcache[2], None, None, None ]
+                else:
+                    cache = pcache
+            self.__dict__['_ancestors'] = cache
+        return cache
 
+    def ancestors(self, include_beginsource=False):
+        cache = self._ancestor_cache()
         if include_beginsource:
-            anc.append(parent)
-
-        anc.reverse()
-        return anc
+            return [ cache[2] ] + cache[1]
+        return list(cache[1])
+
+    def has_ancestor(self, stmt):
+        cache = self._ancestor_cache()
+        if cache[3] is None:
+            cache[3] = set(cache[1])
+        return stmt in cache[3]
+
+    def ancestor_namepath(self, external):
+        cache = self._ancestor_cache()
+        idx = 5 if external else 4
+        if cache[idx] is None:
+            sep = EXTERNAL_NAMELEVEL_SEPERATOR if external else INTERNAL_NAMELEVEL_SEPERATOR
+            cache[idx] = sep.join([ a.name.lower() for a in cache[1] ])
+        return cache[idx]
 
     def parse_f2003(self):
         from .block_statements import BeginSource, SubProgramStatement
         from .statements import Continue
+        from .Fortran2003 import MatchMemo
 
-        if not hasattr(self, 'f2003'):
+        if 'f2003' not in self.__dict__:
             if hasattr(self, 'f2003_class'):
                 if hasattr(self.item, 'line') and self.item.line:
                     line = self.tokgen()
@@ -777,7 +851,11 @@ class Statement(with_metaclass(classes, object)):
 #                    if m:
 #                        name = m.group('name')
 #                        line = line[m.end():].lstrip()
-                    self.f2003 = self.f2003_class(line)
+                    MatchMemo.begin()
+                    try:
+                        self.f2003 = self.f2003_class(line)
+                    finally:
+                        MatchMemo.end()
                 elif hasattr(self.item, 'comment'):
                     #self.f2003 = self.f2003_class(self.item.comment)
                     self.f2003 = self.f2003_class()
@@ -790,27 +868,32 @@ class Statement(with_metaclass(classes, object)):
                     raise Exception('None f2003 attribute: ', str(self))
 
                 self.f2003.stmtpair = self
-                traverse(self.f2003, self.set_parent, None)
+                self.set_parent(self.f2003, None, 0)
+                Statement.f2003_converted += 1
             else:
                 raise ProgramException('Class %s does not have f2003_class attribute.' % self.__class__)
 
     def set_parent(self, node, bag, depth):
         from . import Fortran2003
 
-        if hasattr(node, 'item') and node.item and isinstance(node.item, Fortran2003.Base):
-            node.item.parent = node
-
-        if node and hasattr(node, 'items') and node.items:
-            for item in node.items:
-                if isinstance(item, list) or isinstance(item, tuple):
-                    for subitem in item:
-                        if subitem and not isinstance(subitem, str) and \
-                            not isinstance(item, list) and not isinstance(item, tuple):
-                            subitem.parent = node
-                            self.set_parent(subitem, bag, depth+1)
-                elif item and  not isinstance(item, str):
-                    item.parent = node
-                    self.set_parent(item, bag, depth+1)
+        # nodes are visited in pre-order with an explicit stack
+        stack = [ node ]
+        while stack:
+            node = stack.pop()
+
+            if hasattr(node, 'item') and node.item and isinstance(node.item, Fortran2003.Base):
+                node.item.parent = node
+
+            if node and hasattr(node, 'items') and node.items:
+                children = []
+                for item in node.items:
+                    if isinstance(item, list) or isinstance(item, tuple):
+                        continue
+                    elif item and not isinstance(item, str):
+                        item.parent = node
+                        children.append(item)
+                children.reverse()
+                stack.extend(children)
 
     def expr_by_name(self, name, node=None):
         from . import Fortran2003
@@ -818,40 +901,66 @@ class Statement(with_metaclass(classes, object)):
         if not name:
             raise ProgramException("Callsite name is not found. Please check if callsite is specified correctly.")
 
-        expr = None
         if isinstance(name, str):
             name = KGName(name) 
 
-        if isinstance(node, Fortran2003.Name):
-            if name.firstpartname().lower()==node.string.lower():
+        firstname = name.firstpartname().lower()
+        ancnames = []
+
+        def match(namenode):
+            if firstname==namenode.string.lower():
                 if len(name.namelist)>1:
-                    ancnames = [ a.name.lower() for a in self.ancestors() ]
+                    if not ancnames:
+                        ancnames.append([ a.name.lower() for a in self.ancestors() ])
                     lennl = len(name.namelist[:-1])
-                    if ancnames[-1*lennl:]==name.namelist[:-1]:
-                        expr = node.parent
+                    if ancnames[0][-1*lennl:]==name.namelist[:-1]:
+                        return namenode.parent
                 else:
-                    expr = node.parent
-        elif isinstance(node, list) or isinstance(node, tuple):
-            for item in node:
-                if isinstance(item, Fortran2003.Name):
-                    if name.firstpartname().lower()==item.string.lower():
-                        if len(name.namelist)>1:
-                            ancnames = [ a.name.lower() for a in self.ancestors() ]
-                            lennl = len(name.namelist[:-1])
-                            if ancnames[-1*lennl:]==name.namelist[:-1]:
-                                expr = item.parent
-                        else:
-                            expr = item.parent
-                else:
-                    expr = self.expr_by_name(name, item)
-                    if expr is not None: break
-        else:
-            if node and hasattr(node, 'items') and node.items:
-                for item in node.items:
-                    expr = self.expr_by_name(name, item)
-                    if expr is not None: break
+                    return namenode.parent
+
+        # nodes are searched in the same order as a recursive search with an
+        # explicit stack of [is list or tuple, iterator of items, expr]
+        stack = []
+        while True:
+            returned = True
+            if isinstance(node, Fortran2003.Name):
+                expr = match(node)
+            elif isinstance(node, list) or isinstance(node, tuple):
+                stack.append([True, iter(node), None])
+                returned = False
+            elif node and hasattr(node, 'items') and node.items:
+                stack.append([False, iter(node.items), None])
+                returned = False
+            else:
+                expr = None
+
+            while stack:
+                frame = stack[-1]
+                if returned:
+                    frame[2] = expr
+                    if expr is not None:
+                        stack.pop()
+                        continue
+                    returned = False
+
+                descend = False
+                for item in frame[1]:
+                    if frame[0] and isinstance(item, Fortran2003.Name):
+                        # a name in a list does not stop the search
+                        nameexpr = match(item)
+                        if nameexpr is not None:
+                            frame[2] = nameexpr
+                    else:
+                        node = item
+                        descend = True
+                        break
 
-        return expr
+                if descend: break
+                stack.pop()
+                expr = frame[2]
+                returned = True
+            else:
+                return expr
 
     def can_resolve(self, request):
         from .typedecl_statements import TypeDeclarationStatement
@@ -881,6 +990,7 @@ class Statement(with_metaclass(classes, object)):
 
     # save names that this self resolved
     def add_geninfo(self, uname, request):
+        from .kgparse import GenInfoList
 
         if uname is None or request is None: return
 
@@ -888,29 +998,57 @@ class Statement(with_metaclass(classes, object)):
         if not hasattr(self, 'geninfo'):
             self.geninfo = OrderedDict()
         if not request.gentype in self.geninfo:
-            self.geninfo[request.gentype] = []
-        if (uname, request) not in self.geninfo[request.gentype]:
-            self.geninfo[request.gentype].append((uname, request))
+            self.geninfo[request.gentype] = GenInfoList()
+        reqlist = self.geninfo[request.gentype]
+        if isinstance(reqlist, GenInfoList):
+            if not reqlist.has_pair(uname, request):
+                reqlist.append((uname, request))
+        elif (uname, request) not in reqlist:
+            reqlist.append((uname, request))
 
         # EndStatement
         if isinstance(self, BeginStatement) and isinstance(self.content[-1], EndStatement):
             if not hasattr(self.content[-1], 'geninfo'):
                 self.content[-1].geninfo = OrderedDict()
             if not request.gentype in self.content[-1].geninfo:
-                self.content[-1].geninfo[request.gentype] = []
+                self.content[-1].geninfo[request.gentype] = GenInfoList()
 
-        # Ancestors
-        for anc in self.ancestors(include_beginsource=True):
+        # Ancestors from the nearest one; ancestors of an initialized ancestor are initialized
+        for anc in reversed(self.ancestors(include_beginsource=True)):
+            if hasattr(anc, 'geninfo') and request.gentype in anc.geninfo:
+                if not isinstance(anc, BeginStatement) or not isinstance(anc.content[-1], EndStatement) or \
+                    (hasattr(anc.content[-1], 'geninfo') and request.gentype in anc.content[-1].geninfo):
+                    break
             if not hasattr(anc, 'geninfo'):
                 anc.geninfo = OrderedDict()
             if not request.gentype in anc.geninfo:
-                anc.geninfo[request.gentype] = []
+                anc.geninfo[request.gentype] = GenInfoList()
             if isinstance(anc, BeginStatement) and isinstance(anc.content[-1], EndStatement):
                 if not hasattr(anc.content[-1], 'geninfo'):
                     anc.content[-1].geninfo = OrderedDict()
                 if not request.gentype in anc.content[-1].geninfo:
-                    anc.content[-1].geninfo[request.gentype] = []
+                    anc.content[-1].geninfo[request.gentype] = GenInfoList()
 
+    def resolve_unknowns(self):
+        from .kgparse import ResState
+        from .kgsearch import f2003_search_unknowns
+        from .api import walk
+
+        # statements in this block are not walked again once all resolved
+        if getattr(self, 'unknowns_resolved', False):
+            return
+
+        resolved = True
+        for _stmt, _depth in walk(self, -1):
+            if not hasattr(_stmt, 'unknowns'):
+                f2003_search_unknowns(_stmt, _stmt.f2003)
+            if hasattr(_stmt, 'unknowns'):
+                for unk, req in _stmt.unknowns.items():
+                    if req.state != ResState.RESOLVED:
+                        _stmt.resolve(req) 
+                    if req.state != ResState.RESOLVED:
+                        resolved = False
+        self.unknowns_resolved = resolved
 
     def check_spec_stmts(self, uname, request):
         # the last resolver
@@ -992,30 +1130,30 @@ class Statement(with_metaclass(classes, object)):
         if request.state != ResState.RESOLVED:
             if self is request.originator:
                 # check if program units can resolve the request
-                for filepath, units in Config.program_units.items():
-                    for unit in units:
-                        if any( isinstance(unit, resolver) for resolver in request.resolvers) and \
-                            hasattr(unit, 'name') and request.uname.firstpartname()==unit.name:
-                            logger.debug('The request is being resolved by a program unit')
-                            if unit not in request.originator.ancestors():
-                                request.res_stmts.append(unit)
-                                request.state = ResState.RESOLVED
-                                unit.add_geninfo(request.uname, request)
-                                self.check_spec_stmts(request.uname, request)
-                                logger.debug('%s is resolved'%request.uname.firstpartname())
-                                for _stmt, _depth in walk(unit, -1):
-                                    if not hasattr(_stmt, 'unknowns'):
-                                        f2003_search_unknowns(_stmt, _stmt.f2003)
-                                    if hasattr(_stmt, 'unknowns'):
-                                        for unk, req in _stmt.unknowns.items():
-                                            if req.state != ResState.RESOLVED:
-                                                _stmt.resolve(req) 
-
-                                # if newly found program unit is not in srcfiles
-                                if not unit in Config.srcfiles[self.top.reader.id][2]:
-                                    Config.srcfiles[self.top.reader.id][2].append(unit)
-                    if request.state==ResState.RESOLVED:
+                units = Config.program_unit_index.get(request.uname.firstpartname(), [])
+                if len(units)>1:
+                    # keep the search order of Config.program_units
+                    order = dict([ (filepath, i) for i, filepath in enumerate(Config.program_units.keys()) ])
+                    units = sorted(units, key=lambda u: order[u[0]])
+                resolved_path = None
+                for filepath, unit in units:
+                    if resolved_path is not None and filepath!=resolved_path:
                         break
+                    if any( isinstance(unit, resolver) for resolver in request.resolvers):
+                        logger.debug('The request is being resolved by a program unit')
+                        if not request.originator.has_ancestor(unit):
+                            request.res_stmts.append(unit)
+                            request.state = ResState.RESOLVED
+                            unit.add_geninfo(request.uname, request)
+                            self.check_spec_stmts(request.uname, request)
+                            logger.debug('%s is resolved'%request.uname.firstpartname())
+                            unit.resolve_unknowns()
+
+                            # if newly found program unit is not in srcfiles
+                            if not unit in Config.srcfiles[self.top.reader.id][2]:
+                                Config.srcfiles[self.top.reader.id][2].append(unit)
+                    if request.state==ResState.RESOLVED:
+                        resolved_path = filepath
 
                 # check if intrinsic procedure can resolve
                 if request.state != ResState.RESOLVED:
@@ -1098,8 +1236,7 @@ class BeginStatement(Statement):
     # start of KGEN
     def check_access(self, req):
 
-        ancs = req.originator.ancestors()
-        if self in ancs: return True
+        if req.originator.has_ancestor(self): return True
 
         if not hasattr(self, 'check_private'): return False
 
@@ -1107,6 +1244,30 @@ class BeginStatement(Statement):
         if self.check_private(uname): return False
         else: return True
 
+    def symbol_table(self):
+        """ returns name tables of interface blocks in this scope """
+        from .block_statements import Function, Subroutine
+
+        if not hasattr(self, 'symtab'):
+            symtab = {}
+            symtab['interface'] = {}
+            symtab['abstract_subprogram'] = OrderedDict()
+            symtab['module_interface_subprogram'] = OrderedDict()
+            symtab['subprogram_interface_subprogram'] = OrderedDict()
+
+            for attr in [ 'module_interface', 'subprogram_interface' ]:
+                if not hasattr(self.a, attr): continue
+                for if_obj in getattr(self.a, attr):
+                    if attr=='module_interface' and if_obj.name not in symtab['interface']:
+                        symtab['interface'][if_obj.name] = if_obj
+                    for item in if_obj.content:
+                        if item.__class__ in [ Function, Subroutine ]:
+                            symtab[attr+'_subprogram'].setdefault(item.name, []).append(item)
+                            if attr=='module_interface' and if_obj.isabstract:
+                                symtab['abstract_subprogram'].setdefault(item.name, []).append(item)
+            self.symtab = symtab
+        return self.symtab
+
     def resolve(self, request):
         from .kgparse import ResState
         from .kgsearch import f2003_search_unknowns
@@ -1139,10 +1300,7 @@ class BeginStatement(Statement):
                 elif hasattr(self.a, 'module_subprogram') and request.uname.firstpartname() in self.a.module_subprogram.keys():
                     subp = self.a.module_subprogram[request.uname.firstpartname()]
                 elif hasattr(self.a, 'module_interface'):
-                    for if_stmt in self.a.module_interface:
-                        if request.uname.firstpartname()==if_stmt.name:
-                            subp = if_stmt
-                            break
+                    subp = self.symbol_table()['interface'].get(request.uname.firstpartname(), None)
 
                 if subp and any( isinstance(subp, resolver) for resolver in request.resolvers ):
                     logger.debug('The request is being resolved by a subprogram or interface')
@@ -1152,14 +1310,8 @@ class BeginStatement(Statement):
                     self.check_spec_stmts(request.uname, request)
                     logger.debug('%s is resolved'%request.uname.firstpartname())
 
-                    if subp not in request.originator.ancestors():
-                        for _stmt, _depth in walk(subp, -1):
-                            if not hasattr(_stmt, 'unknowns'):
-                                f2003_search_unknowns(_stmt, _stmt.f2003)
-                            if hasattr(_stmt, 'unknowns'):
-                                for unk, req in _stmt.unknowns.items():
-                                    if req.state != ResState.RESOLVED:
-                                        _stmt.resolve(req) 
+                    if not request.originator.has_ancestor(subp):
+                        subp.resolve_unknowns()
 
             # check if self is a subprogram and it can resolve
             if request.state != ResState.RESOLVED:
@@ -1175,14 +1327,8 @@ class BeginStatement(Statement):
                     self.check_spec_stmts(request.uname, request)
                     logger.debug('%s is resolved'%request.uname.firstpartname())
 
-                    if subp not in request.originator.ancestors():
-                        for _stmt, _depth in walk(subp, -1):
-                            if not hasattr(_stmt, 'unknowns'):
-                                f2003_search_unknowns(_stmt, _stmt.f2003)
-                            if hasattr(_stmt, 'unknowns'):
-                                for unk, req in _stmt.unknowns.items():
-                                    if req.state != ResState.RESOLVED:
-                                        _stmt.resolve(req) 
+                    if not request.originator.has_ancestor(subp):
+                        subp.resolve_unknowns()
 
 # TODO: With this, KGen fails to resolve for variables defined in different module
 #                if isinstance(self, SubProgramStatement) and any( request.uname.firstpartname() == arg for arg in self.args ):
@@ -1197,23 +1343,14 @@ class BeginStatement(Statement):
             # check if subprogram stmt in Interface block can resolve
             if request.state != ResState.RESOLVED and isinstance(request.originator, SpecificBinding) and \
                 hasattr(self.a, 'module_interface') and Interface in request.resolvers:
-                for if_obj in self.a.module_interface:
-                    if if_obj.isabstract:
-                        for item in if_obj.content:
-                            if item.__class__ in [ Function, Subroutine ] and request.uname.firstpartname()==item.name:
-                                logger.debug('The request is being resolved by a Subprogram in abstract interface')
-                                request.res_stmts.append(item)
-                                request.state = ResState.RESOLVED
-                                item.add_geninfo(request.uname, request)
-                                self.check_spec_stmts(request.uname, request)
-                                logger.debug('%s is resolved'%request.uname.firstpartname())
-                                for _stmt, _depth in walk(item, -1):
-                                    if not hasattr(_stmt, 'unknowns'):
-                                        f2003_search_unknowns(_stmt, _stmt.f2003)
-                                    if hasattr(_stmt, 'unknowns'):
-                                        for unk, req in _stmt.unknowns.items():
-                                            if req.state != ResState.RESOLVED:
-                                                _stmt.resolve(req) 
+                for item in self.symbol_table()['abstract_subprogram'].get(request.uname.firstpartname(), []):
+                    logger.debug('The request is being resolved by a Subprogram in abstract interface')
+                    request.res_stmts.append(item)
+                    request.state = ResState.RESOLVED
+                    item.add_geninfo(request.uname, request)
+                    self.check_spec_stmts(request.uname, request)
+                    logger.debug('%s is resolved'%request.uname.firstpartname())
+                    item.resolve_unknowns()
 
             # check if a type can resolve
             if request.state != ResState.RESOLVED and hasattr(self.a, 'type_decls') and \
@@ -1227,13 +1364,7 @@ class BeginStatement(Statement):
                     self.check_spec_stmts(request.uname, request)
                     logger.debug('%s is resolved'%request.uname.firstpartname())
 
-                    for _stmt, _depth in walk(type_stmt, -1):
-                        if not hasattr(_stmt, 'unknowns'):
-                            f2003_search_unknowns(_stmt, _stmt.f2003)
-                        if hasattr(_stmt, 'unknowns'):
-                            for unk, req in _stmt.unknowns.items():
-                                if req.state != ResState.RESOLVED:
-                                    _stmt.resolve(req) 
+                    type_stmt.resolve_unknowns()
 
             # check if a module variable can resolve
             # NOTE: check if the resolver is in the file or in other file
@@ -1263,42 +1394,26 @@ class BeginStatement(Statement):
             # check if an interface block in a module can resolve
             if request.state != ResState.RESOLVED and isinstance(request.originator, Call) and \
                 hasattr(self.a, 'module_interface') and Interface in request.resolvers:
-                for if_obj in self.a.module_interface:
-                    for item in if_obj.content:
-                        if item.__class__ in [ Function, Subroutine ] and request.uname.firstpartname()==item.name:
-                            logger.info('The request is being resolved by a Subprogram in an interface')
-                            request.res_stmts.append(item)
-                            request.state = ResState.RESOLVED
-                            item.add_geninfo(request.uname, request)
-                            self.check_spec_stmts(request.uname, request)
-                            logger.info('%s is resolved'%request.uname.firstpartname())
-                            for _stmt, _depth in walk(item, -1):
-                                if not hasattr(_stmt, 'unknowns'):
-                                    f2003_search_unknowns(_stmt, _stmt.f2003)
-                                if hasattr(_stmt, 'unknowns'):
-                                    for unk, req in _stmt.unknowns.items():
-                                        if req.state != ResState.RESOLVED:
-                                            _stmt.resolve(req) 
+                for item in self.symbol_table()['module_interface_subprogram'].get(request.uname.firstpartname(), []):
+                    logger.info('The request is being resolved by a Subprogram in an interface')
+                    request.res_stmts.append(item)
+                    request.state = ResState.RESOLVED
+                    item.add_geninfo(request.uname, request)
+                    self.check_spec_stmts(request.uname, request)
+                    logger.info('%s is resolved'%request.uname.firstpartname())
+                    item.resolve_unknowns()
 
             # check if an interface block in a subprogram can resolve
             if request.state != ResState.RESOLVED and isinstance(request.originator, Call) and \
                 hasattr(self.a, 'subprogram_interface') and Interface in request.resolvers:
-                for if_obj in self.a.subprogram_interface:
-                    for item in if_obj.content:
-                        if item.__class__ in [ Function, Subroutine ] and request.uname.firstpartname()==item.name:
-                            logger.info('The request is being resolved by a Subprogram in an interface')
-                            request.res_stmts.append(item)
-                            request.state = ResState.RESOLVED
-                            item.add_geninfo(request.uname, request)
-                            self.check_spec_stmts(request.uname, request)
-                            logger.info('%s is resolved'%request.uname.firstpartname())
-                            for _stmt, _depth in walk(item, -1):
-                                if not hasattr(_stmt, 'unknowns'):
-                                    f2003_search_unknowns(_stmt, _stmt.f2003)
-                                if hasattr(_stmt, 'unknowns'):
-                                    for unk, req in _stmt.unknowns.items():
-                                        if req.state != ResState.RESOLVED:
-                                            _stmt.resolve(req) 
+                for item in self.symbol_table()['subprogram_interface_subprogram'].get(request.uname.firstpartname(), []):
+                    logger.info('The request is being resolved by a Subprogram in an interface')
+                    request.res_stmts.append(item)
+                    request.state = ResState.RESOLVED
+                    item.add_geninfo(request.uname, request)
+                    self.check_spec_stmts(request.uname, request)
+                    logger.info('%s is resolved'%request.uname.firstpartname())
+                    item.resolve_unknowns()
 
             # check if a common statement can resolve
             #if request.state != ResState.RESOLVED and hasattr(self.a, 'common_stmts') and \
@@ -1459,13 +1574,7 @@ class BeginStatement(Statement):
                     if self is request.originator.parent:
                         pass
                     else:
-                        for _stmt, _depth in walk(type_stmt, -1):
-                            if not hasattr(_stmt, 'unknowns'):
-                                f2003_search_unknowns(_stmt, _stmt.f2003)
-                            if hasattr(_stmt, 'unknowns'):
-                                for unk, req in _stmt.unknowns.items():
-                                    if req.state != ResState.RESOLVED:
-                                        _stmt.resolve(req) 
+                        type_stmt.resolve_unknowns()
             elif request.state != ResState.RESOLVED and isinstance(request.originator, GenericBinding):
                 for child in self.content:
                     if isinstance(child, SpecificBinding):
@@ -1478,13 +1587,7 @@ class BeginStatement(Statement):
                             logger.debug('%s is resolved'%request.uname.firstpartname())
 
                             #if self not in request.originator.ancestors():
-                            for _stmt, _depth in walk(child, -1):
-                                if not hasattr(_stmt, 'unknowns'):
-                                    f2003_search_unknowns(_stmt, _stmt.f2003)
-                                if hasattr(_stmt, 'unknowns'):
-                                    for unk, req in _stmt.unknowns.items():
-                                        if req.state != ResState.RESOLVED:
-                                            _stmt.resolve(req) 
+                            child.resolve_unknowns()
 
         elif isinstance(self, Associate):
             def get_name(node, bag, depth):
@@ -1617,7 +1720,16 @@ class BeginStatement(Statement):
             classes = self.classes
 
         # Look for statement match
-        for cls in classes:
+        # start of KGEN addition
+        index = ClassIndex.get(classes)
+        candidates = index.candidates(line)
+        i = 0
+        while i < len(candidates):
+            pos = candidates[i]
+            i += 1
+            cls = index.classes[pos]
+        # end of KGEN addition
+        #for cls in classes: # KGEN deletion
             if cls.match(line):
                 stmt = cls(self, item)
                 if stmt.isvalid:
@@ -1625,7 +1737,14 @@ class BeginStatement(Statement):
                         self.content.append(stmt)
                     return False
                 # item may be cloned that changes the items line:
-                line = item.get_line()
+                # start of KGEN addition
+                newline = item.get_line()
+                if newline != line:
+                    candidates = index.candidates(newline, pos + 1)
+                    i = 0
+                line = newline
+                # end of KGEN addition
+                #line = item.get_line() # KGEN deletion
 
         # Check if f77 code contains inline comments or other f90
         # constructs that got undetected by get_source_info.
@@ -17,8 +17,9 @@ def update_state_info(parent):
         if isinstance(node, Name) and node.string==bag['name'] and not node.parent in bag:
             anc = [node]
             while hasattr(node, 'parent'):
-                anc.insert(0, node.parent)
+                anc.append(node.parent)
                 node = node.parent
+            anc.reverse()
             bag['lineage'].append(anc)
 
     if hasattr(parent, 'content'):
@@ -0,0 +1,189 @@
+'''KGen parse cache
+
+On-disk cache of parsed source trees. An entry is keyed by the content of
+a preprocessed source file, its include paths and macros, the source
+format and a fingerprint of the parser itself so that any change in one of
+them automatically misses the cache.
+'''
+
+import os
+import sys
+import glob
+import types
+import hashlib
+import logging
+from kgconfig import Config
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import copyreg
+except ImportError:
+    import copy_reg as copyreg
+
+logger = logging.getLogger('kgen')
+
+CACHE_FORMAT = '1'
+CACHE_EXT = '.kgtree'
+EVICT_RATIO = 0.9 # eviction shrinks cache below this ratio of maxsize
+PICKLE_RECURSIONLIMIT = 10000
+
+# bound methods(get_item/put_item of blocks) can not be pickled in Python 2
+if sys.version_info < (3,0):
+    def _reduce_method(method):
+        return getattr, (method.im_self, method.im_func.__name__)
+    copyreg.pickle(types.MethodType, _reduce_method)
+
+def dumps(tree):
+    '''serializes a parse tree'''
+
+    limit = sys.getrecursionlimit()
+    try:
+        sys.setrecursionlimit(max(limit, PICKLE_RECURSIONLIMIT))
+        return pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)
+    finally:
+        sys.setrecursionlimit(limit)
+
+def loads(data):
+    '''restores a parse tree serialized by dumps'''
+
+    limit = sys.getrecursionlimit()
+    try:
+        sys.setrecursionlimit(max(limit, PICKLE_RECURSIONLIMIT))
+        return pickle.loads(data)
+    finally:
+        sys.setrecursionlimit(limit)
+
+_fingerprint = []
+
+def parser_fingerprint():
+    '''returns a string that changes whenever KGen parser sources change'''
+
+    if not _fingerprint:
+        srcdir = os.path.dirname(os.path.realpath(__file__))
+        items = [ CACHE_FORMAT, '.'.join(str(v) for v in Config.kgen['version']), '%d.%d'%sys.version_info[:2] ]
+        for path in sorted(glob.glob(os.path.join(srcdir, '*.py'))):
+            with open(path, 'rb') as f:
+                items.append('%s:%s'%(os.path.basename(path), hashlib.sha1(f.read()).hexdigest()))
+        _fingerprint.append('|'.join(items))
+    return _fingerprint[0]
+
+def cachekey(lines, isfree, isstrict, include_dirs, macros):
+    h = hashlib.sha1()
+    h.update(parser_fingerprint().encode('utf-8'))
+    h.update(('\n'.join([str(isfree), str(isstrict), ':'.join(include_dirs), macros])).encode('utf-8'))
+    for line in lines:
+        h.update(line.encode('utf-8') if not isinstance(line, bytes) else line)
+        h.update(b'\n')
+    return h.hexdigest()
+
+class ParseCache(object):
+
+    def __init__(self, path, maxsize):
+        self.path = path
+        self.maxsize = maxsize
+        self.size = None # total size of entries known to this process
+        self.hits = 0
+        self.misses = 0
+
+    def _entrypath(self, key):
+        return os.path.join(self.path, key + CACHE_EXT)
+
+    def load(self, key):
+        entry = self._entrypath(key)
+        if not os.path.exists(entry):
+            self.misses += 1
+            return None
+
+        try:
+            with open(entry, 'rb') as f:
+                tree = loads(f.read())
+            # refresh LRU order
+            os.utime(entry, None)
+        except Exception as e:
+            logger.debug('Parse cache entry is discarded(%s): %s'%(str(e), entry))
+            try: os.remove(entry)
+            except OSError: pass
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return tree
+
+    def save(self, key, tree):
+        if not os.path.exists(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                return
+
+        entry = self._entrypath(key)
+        tmpentry = '%s.%d'%(entry, os.getpid())
+
+        try:
+            oldsize = os.path.getsize(entry)
+        except OSError:
+            oldsize = 0
+
+        try:
+            data = dumps(tree)
+            with open(tmpentry, 'wb') as f:
+                f.write(data)
+            os.rename(tmpentry, entry)
+        except Exception as e:
+            logger.debug('Parse tree is not cached(%s): %s'%(str(e), entry))
+            if os.path.exists(tmpentry):
+                os.remove(tmpentry)
+            return
+
+        # cache directory is scanned once and then only when the size may be over
+        if self.size is None:
+            self.evict()
+        else:
+            self.size += len(data) - oldsize
+            if self.size > self.maxsize:
+                self.evict()
+
+    def evict(self):
+        ''' removes least-recently-used entries if cache size is over maxsize '''
+
+        entries = []
+        total = 0
+        for entry in glob.glob(os.path.join(self.path, '*' + CACHE_EXT)):
+            try:
+                st = os.stat(entry)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry))
+            total += st.st_size
+
+        if total > self.maxsize:
+            entries.sort()
+            for mtime, size, entry in entries:
+                try:
+                    os.remove(entry)
+                    total -= size
+                except OSError:
+                    pass
+                if total <= self.maxsize * EVICT_RATIO:
+                    break
+
+        self.size = total
+
+_cache = []
+
+def get_parsecache():
+    '''returns ParseCache object if parse cache is enabled'''
+
+    if not Config.parsecache['enabled']:
+        return None
+
+    if not _cache:
+        path = Config.parsecache['path']
+        if not path:
+            path = os.path.join(Config.machine['variable']['work_directory'], 'parsecache')
+        _cache.append(ParseCache(os.path.realpath(path), Config.parsecache['maxsize']*1024*1024))
+    return _cache[0]
@@ -0,0 +1,132 @@
+'''KGen statement classification index
+
+Maps the first character of a line to the statement classes of a block
+whose match pattern can start with that character. Candidates are kept in
+the order of the class list so that the first matching class is the same
+as in a linear scan. Classes whose match is not a regular expression or
+whose pattern can not be analyzed are candidates for every line.
+'''
+
+import string
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+IGNORECASE = sre_parse.SRE_FLAG_IGNORECASE
+
+# ASCII characters that can lead a statement line
+LEADING_CHARS = string.printable
+
+def _literal_chars(value, flags):
+    ch = chr(value)
+    if flags & IGNORECASE:
+        return set([ch.lower(), ch.upper()])
+    return set([ch])
+
+def _first_chars(subpattern, flags):
+    ''' returns (chars, nullable) of a parsed pattern or None if unknown '''
+
+    chars = set()
+    for op, av in subpattern:
+        if op==sre_parse.LITERAL:
+            chars |= _literal_chars(av, flags)
+            return chars, False
+        elif op==sre_parse.IN:
+            for iop, iav in av:
+                if iop==sre_parse.LITERAL:
+                    chars |= _literal_chars(iav, flags)
+                elif iop==sre_parse.RANGE and iav[1]<128:
+                    for value in range(iav[0], iav[1]+1):
+                        chars |= _literal_chars(value, flags)
+                else:
+                    return None
+            return chars, False
+        elif op==sre_parse.AT:
+            continue
+        elif op==sre_parse.BRANCH:
+            nullable = False
+            for item in av[1]:
+                first = _first_chars(item, flags)
+                if first is None:
+                    return None
+                chars |= first[0]
+                nullable = nullable or first[1]
+            if not nullable:
+                return chars, False
+        elif op==sre_parse.SUBPATTERN:
+            # (group, pattern) in Python 2, (group, add_flags, del_flags, pattern) in Python 3
+            if len(av)>2 and (av[1] or av[2]):
+                return None
+            first = _first_chars(av[-1], flags)
+            if first is None:
+                return None
+            chars |= first[0]
+            if not first[1]:
+                return chars, False
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            first = _first_chars(av[2], flags)
+            if first is None:
+                return None
+            chars |= first[0]
+            if av[0]>0 and not first[1]:
+                return chars, False
+        else:
+            return None
+    return chars, True
+
+def leading_chars(cls):
+    ''' returns characters that a line matched by cls can start with or None if unknown '''
+
+    pattern = getattr(cls.match, '__self__', None)
+    if not hasattr(pattern, 'pattern') or not hasattr(pattern, 'flags'):
+        return None
+    try:
+        first = _first_chars(sre_parse.parse(pattern.pattern, pattern.flags), pattern.flags)
+    except Exception:
+        return None
+    if first is None or first[1]:
+        return None
+    return first[0]
+
+class ClassIndex(object):
+
+    # when False, every class is a candidate as in a linear scan
+    enabled = True
+
+    _indices = {}
+
+    def __init__(self, classes):
+        self.classes = list(classes)
+
+        # buckets keep positions in class list as a class may appear more than once
+        leading = [ leading_chars(cls) for cls in self.classes ]
+        self.buckets = {}
+        for ch in LEADING_CHARS:
+            self.buckets[ch] = [ pos for pos, chars in enumerate(leading) if chars is None or ch in chars ]
+        self.buckets[''] = [ pos for pos, chars in enumerate(leading) if chars is None ]
+        self.allpos = list(range(len(self.classes)))
+
+    @classmethod
+    def get(cls, classes):
+        key = tuple(classes)
+        index = cls._indices.get(key, None)
+        if index is None:
+            index = cls(key)
+            cls._indices[key] = index
+        return index
+
+    def candidates(self, line, start=0):
+        ''' returns positions of classes that may match line in increasing order
+
+        Only positions from start are returned.
+        '''
+
+        bucket = self.buckets.get(line[:1], None) if self.enabled else None
+        if bucket is None:
+            # non-ASCII leading character: case-insensitive matching is not limited to ASCII
+            bucket = self.allpos
+        if start==0:
+            return bucket
+        return [ pos for pos in bucket if pos >= start ]
@@ -0,0 +1,205 @@
+'''KGen source dependency graph
+
+Keeps content hashes of the source files used in an extraction, the files
+that each of them depends on through modules and program units, and hashes
+of the generated files. A rerun compares the graph with the previous one
+to find the source files changed since then and the files depending on
+them, and writes only the generated files whose content has changed.
+'''
+
+import os
+import re
+import hashlib
+import collections
+import logging
+
+try:
+    import configparser
+except:
+    import ConfigParser as configparser
+
+logger = logging.getLogger('kgen')
+
+# generation time in file header does not change the content of generated files
+timestamp_line = re.compile(r'^\s*!\s*Generated at\s*:.*$', re.M)
+
+def texthash(text):
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return hashlib.sha1(text).hexdigest()
+
+def filehash(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+def outputhash(text):
+    return texthash(timestamp_line.sub('', text))
+
+def outputfile_hash(path):
+    try:
+        with open(path, 'r') as f:
+            return outputhash(f.read())
+    except (IOError, OSError, UnicodeDecodeError):
+        return None
+
+def srcfile_hash(srcobj):
+    ''' hash of preprocessed lines so that changes in included files and macros are detected '''
+
+    prep = getattr(srcobj.tree, 'prep', None)
+    if prep is None:
+        return filehash(srcobj.realpath)
+    return texthash('\n'.join(prep))
+
+def srcfile_depends(filepath, mods_used, units_used):
+    depends = []
+    for mod in mods_used:
+        if mod.reader.id!=filepath and mod.reader.id not in depends:
+            depends.append(mod.reader.id)
+    for unit in units_used:
+        if unit.item.reader.id!=filepath and unit.item.reader.id not in depends:
+            depends.append(unit.item.reader.id)
+    return depends
+
+class DepGraph(object):
+
+    def __init__(self, path):
+        self.path = path
+
+        # previous extraction
+        self.prev_options = None
+        self.prev_files = collections.OrderedDict()
+        self.prev_outputs = collections.OrderedDict()
+        self.state_built = False
+
+        # current extraction
+        self.options = None
+        # file path -> [ hash, dependent file paths ]
+        self.files = collections.OrderedDict()
+        # generated file path -> hash
+        self.outputs = collections.OrderedDict()
+
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return
+
+        Graph = configparser.RawConfigParser()
+        Graph.optionxform = str
+        try:
+            Graph.read(self.path)
+        except configparser.Error as e:
+            logger.debug('Dependency graph is discarded(%s): %s'%(str(e), self.path))
+            return
+
+        for section in Graph.sections():
+            if section=='kgen':
+                if Graph.has_option(section, 'options'):
+                    self.prev_options = Graph.get(section, 'options')
+                if Graph.has_option(section, 'state'):
+                    self.state_built = Graph.get(section, 'state')=='built'
+            elif section=='output':
+                for path, digest in Graph.items(section):
+                    self.prev_outputs[path] = digest
+            else:
+                try:
+                    digest = Graph.get(section, 'hash')
+                    depends = [ p.strip() for p in Graph.get(section, 'depends').split(',') if p.strip() ]
+                except configparser.Error:
+                    continue
+                self.prev_files[section] = [ digest, depends ]
+
+    def save(self):
+        Graph = configparser.RawConfigParser()
+        Graph.optionxform = str
+
+        Graph.add_section('kgen')
+        Graph.set('kgen', 'options', self.options)
+        Graph.set('kgen', 'state', 'built' if self.state_built else 'none')
+
+        for path, (digest, depends) in self.files.items():
+            Graph.add_section(path)
+            Graph.set(path, 'hash', digest)
+            Graph.set(path, 'depends', ', '.join(depends))
+
+        Graph.add_section('output')
+        outputs = self.outputs if self.outputs else self.prev_outputs
+        for path, digest in outputs.items():
+            Graph.set('output', path, digest)
+
+        try:
+            with open(self.path, 'w') as f:
+                Graph.write(f)
+        except (IOError, OSError) as e:
+            logger.debug('Dependency graph is not saved(%s): %s'%(str(e), self.path))
+
+    def update(self, srcfiles, options):
+        ''' builds the graph of current extraction from Config.srcfiles '''
+
+        self.options = texthash(options)
+        self.files.clear()
+        for filepath, (srcobj, mods_used, units_used) in srcfiles.items():
+            self.files[filepath] = [ srcfile_hash(srcobj), srcfile_depends(filepath, mods_used, units_used) ]
+
+    def changed_files(self):
+        ''' returns source files added, removed or modified since previous extraction '''
+
+        changed = [ path for path, (digest, depends) in self.files.items() \
+            if path not in self.prev_files or self.prev_files[path][0]!=digest ]
+        changed.extend([ path for path in self.prev_files if path not in self.files ])
+        return changed
+
+    def dependents(self, paths):
+        ''' returns paths and the files that depend on them directly or indirectly '''
+
+        users = collections.OrderedDict()
+        for path, (digest, depends) in self.files.items():
+            for dep in depends:
+                if dep not in users:
+                    users[dep] = []
+                users[dep].append(path)
+
+        affected = []
+        stack = list(reversed(paths))
+        while stack:
+            path = stack.pop()
+            if path in affected: continue
+            affected.append(path)
+            stack.extend(reversed(users.get(path, [])))
+        return affected
+
+    def isuptodate(self):
+        return self.options==self.prev_options and not self.changed_files()
+
+    def write(self, path, text):
+        ''' writes a generated file only if its content changed and returns True if written '''
+
+        digest = outputhash(text)
+        self.outputs[path] = digest
+        if self.prev_outputs.get(path, None)==digest and outputfile_hash(path)==digest:
+            return False
+        with open(path, 'w') as f:
+            f.write(text)
+        return True
+
+    def record(self, path):
+        ''' records a file generated elsewhere and returns True if it changed '''
+
+        digest = outputfile_hash(path)
+        self.outputs[path] = digest
+        return self.prev_outputs.get(path, None)!=digest
+
+    def outputs_changed(self, directory):
+        ''' returns True if any recorded output in directory is changed or removed '''
+
+        prefix = os.path.join(directory, '')
+        for path, digest in self.outputs.items():
+            if path.startswith(prefix) and self.prev_outputs.get(path, None)!=digest:
+                return True
+        for path in self.prev_outputs:
+            if path.startswith(prefix) and path not in self.outputs:
+                return True
+        return False
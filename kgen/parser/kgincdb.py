@@ -0,0 +1,234 @@
+'''KGen include database
+
+Indexed store of include.ini. Per-file sections are kept in a SQLite
+table keyed by the real path of a source file and are read lazily when a
+file is looked up. Source path aliases are resolved at lookup time. The
+INI file stays the format that users read and edit; the database is
+rebuilt whenever the INI file changes.
+'''
+
+import os
+import sys
+import json
+import hashlib
+import sqlite3
+import collections
+import logging
+
+logger = logging.getLogger('kgen')
+
+SCHEMA_VERSION = '1'
+
+# sections that are not per-file information
+COMMON_SECTIONS = [ 'type', 'macro', 'import', 'include', 'compiler' ]
+
+def tostr(value):
+    ''' converts unicode text from sqlite and json to str in Python 2 '''
+
+    if value is None or isinstance(value, str):
+        return value
+    return value.encode('utf-8')
+
+def totext(value):
+    ''' converts str to unicode text for sqlite in Python 2 '''
+
+    if sys.version_info < (3,0) and isinstance(value, str):
+        return value.decode('utf-8')
+    return value
+
+def inifile_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def alias_paths(path, alias):
+    ''' returns paths that path is mapped to by source path aliases '''
+
+    paths = []
+    for p1, p2 in alias.items():
+        if path.startswith(p1):
+            paths.append(p2+path[len(p1):])
+        elif path.startswith(p2):
+            paths.append(p1+path[len(p2):])
+    return paths
+
+def new_entry():
+    entry = collections.OrderedDict()
+    entry['path'] = ['.']
+    entry['compiler'] = None
+    entry['compiler_options'] = None
+    entry['macro'] = collections.OrderedDict()
+    return entry
+
+def read_inifile(path):
+    ''' returns (common sections, per-file entries) of an include INI file '''
+
+    from kgconfig import KgenConfigParser
+
+    Inc = KgenConfigParser(allow_no_value=True)
+    Inc.read(path)
+
+    common = []
+    files = collections.OrderedDict()
+    for section in Inc.sections():
+        lsection = section.lower().strip()
+        if lsection in COMMON_SECTIONS:
+            for option in Inc.options(section):
+                common.append((lsection, option, Inc.get(section, option)))
+        elif os.path.isfile(section):
+            realpath = os.path.realpath(section)
+            if not realpath in files:
+                files[realpath] = new_entry()
+            for option in Inc.options(section):
+                if option=='include':
+                    pathlist = Inc.get(section, option).split(':')
+                    files[realpath]['path'].extend(pathlist)
+                elif option in [ 'compiler', 'compiler_options' ]:
+                    files[realpath][option] = Inc.get(section, option)
+                else:
+                    files[realpath]['macro'][option] = Inc.get(section, option)
+    return common, files
+
+def build(dbpath, inipath):
+    ''' converts an include INI file to an include database '''
+
+    common, files = read_inifile(inipath)
+
+    tmppath = '%s.%d.tmp'%(dbpath, os.getpid())
+    if os.path.exists(tmppath):
+        os.remove(tmppath)
+    conn = sqlite3.connect(tmppath)
+    try:
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute('CREATE TABLE common (seq INTEGER PRIMARY KEY, section TEXT, option TEXT, value TEXT)')
+        conn.execute('CREATE TABLE file (path TEXT PRIMARY KEY, seq INTEGER, include TEXT, ' + \
+            'compiler TEXT, compiler_options TEXT, macro TEXT)')
+        conn.executemany('INSERT INTO meta VALUES (?, ?)', [ ('version', SCHEMA_VERSION), ('inihash', inifile_hash(inipath)) ])
+        conn.executemany('INSERT INTO common (section, option, value) VALUES (?, ?, ?)', \
+            [ tuple(totext(v) for v in row) for row in common ])
+        conn.executemany('INSERT INTO file VALUES (?, ?, ?, ?, ?, ?)', \
+            [ (totext(path), seq, json.dumps(entry['path']), totext(entry['compiler']), totext(entry['compiler_options']), \
+            json.dumps(list(entry['macro'].items()))) for seq, (path, entry) in enumerate(files.items()) ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.rename(tmppath, dbpath)
+    logger.debug('Include database is built from %s: %s'%(inipath, dbpath))
+
+def isuptodate(dbpath, inipath):
+    if not os.path.isfile(dbpath):
+        return False
+    try:
+        conn = sqlite3.connect(dbpath)
+        try:
+            meta = dict(conn.execute('SELECT key, value FROM meta').fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return meta.get('version', None)==SCHEMA_VERSION and meta.get('inihash', None)==inifile_hash(inipath)
+
+class IncludeDB(object):
+    ''' dict-like view of per-file include information in an include database
+
+    Entries have the same layout as the ones created from include.ini:
+    'path', 'compiler', 'compiler_options' and 'macro'.
+    '''
+
+    def __init__(self, dbpath=None, alias=None):
+        self.dbpath = dbpath
+        self.alias = alias if alias is not None else {}
+
+        self._conn = None
+        self._pid = None
+        # looked-up path -> entry or None
+        self._cache = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_pid'] = None
+        return state
+
+    def _connect(self):
+        # a connection is not shared with forked processes
+        if self._conn is None or self._pid!=os.getpid():
+            self._conn = sqlite3.connect(self.dbpath)
+            self._pid = os.getpid()
+        return self._conn
+
+    def common(self):
+        ''' returns (section, option, value) of common sections in order '''
+
+        if not self.dbpath:
+            return []
+        rows = self._connect().execute('SELECT section, option, value FROM common ORDER BY seq').fetchall()
+        return [ (tostr(section), tostr(option), tostr(value)) for section, option, value in rows ]
+
+    def _read(self, path):
+        row = self._connect().execute('SELECT include, compiler, compiler_options, macro FROM file WHERE path=?', \
+            (totext(path),)).fetchone()
+        if row is None:
+            return None
+        return self._entry(row)
+
+    def _entry(self, row):
+        include, compiler, compiler_options, macro = row
+        entry = collections.OrderedDict()
+        entry['path'] = []
+        for path in json.loads(include):
+            path = tostr(path)
+            for p in [ path ] + alias_paths(path, self.alias):
+                if p not in entry['path']:
+                    entry['path'].append(p)
+        entry['compiler'] = tostr(compiler)
+        entry['compiler_options'] = tostr(compiler_options)
+        entry['macro'] = collections.OrderedDict((tostr(k), tostr(v)) for k, v in json.loads(macro))
+        return entry
+
+    def get(self, path, default=None):
+        if path not in self._cache:
+            entry = None
+            if self.dbpath:
+                for p in [ path ] + alias_paths(path, self.alias):
+                    entry = self._read(p)
+                    if entry is not None: break
+            self._cache[path] = entry
+        entry = self._cache[path]
+        return default if entry is None else entry
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    def __getitem__(self, path):
+        entry = self.get(path)
+        if entry is None:
+            raise KeyError(path)
+        return entry
+
+    def keys(self):
+        if not self.dbpath:
+            return []
+        return [ tostr(row[0]) for row in self._connect().execute('SELECT path FROM file ORDER BY seq') ]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        if not self.dbpath:
+            return 0
+        return self._connect().execute('SELECT COUNT(*) FROM file').fetchone()[0]
+
+    def items(self):
+        ''' yields (path, entry) of stored files; aliased paths are not included '''
+
+        if not self.dbpath:
+            return
+        for row in self._connect().execute('SELECT path, include, compiler, compiler_options, macro FROM file ORDER BY seq').fetchall():
+            path = tostr(row[0])
+            if path not in self._cache:
+                self._cache[path] = self._entry(row[1:])
+            yield path, self._cache[path]
+
+    def values(self):
+        for path, entry in self.items():
+            yield entry
@@ -0,0 +1,169 @@
+'''KGen module index
+
+Maps Fortran module names to the source files that define them. Module
+names of each file are kept in an INI file together with the modification
+time of the file so that only new or modified files are scanned again.
+'''
+
+import os
+import re
+import glob
+import collections
+import logging
+from .utils import module_file_extensions
+
+try:
+    import configparser
+except:
+    import ConfigParser as configparser
+
+logger = logging.getLogger('kgen')
+
+module_stmt = re.compile(r'\s*module\s+(?P<name>[a-z]\w*)', re.I).match
+
+def scan_modules(path):
+    ''' returns lower-case names of modules defined in a source file '''
+
+    names = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                match = module_stmt(line)
+                if match:
+                    name = match.group('name').lower()
+                    # skip "module procedure" statements
+                    if name!='procedure' and name not in names:
+                        names.append(name)
+    except (IOError, OSError, UnicodeDecodeError):
+        pass
+    return names
+
+class ModuleIndex(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.updated = False
+
+        # file path -> [ mtime, module names ]
+        self.files = collections.OrderedDict()
+        # module name -> file paths listed in include INI file
+        self.modules = collections.OrderedDict()
+        # include directory -> { module name: file path }
+        self.dirs = {}
+
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return
+
+        Idx = configparser.RawConfigParser()
+        Idx.optionxform = str
+        try:
+            Idx.read(self.path)
+        except configparser.Error as e:
+            logger.debug('Module index is discarded(%s): %s'%(str(e), self.path))
+            return
+
+        for section in Idx.sections():
+            if section=='duplicate': continue
+            try:
+                mtime = Idx.getfloat(section, 'mtime')
+                names = [ n.strip() for n in Idx.get(section, 'modules').split(',') if n.strip() ]
+            except (configparser.Error, ValueError):
+                continue
+            self.files[section] = [ mtime, names ]
+
+    def save(self):
+        if not self.updated:
+            return
+
+        Idx = configparser.RawConfigParser()
+        Idx.optionxform = str
+        for path, (mtime, names) in self.files.items():
+            Idx.add_section(path)
+            Idx.set(path, 'mtime', repr(mtime))
+            Idx.set(path, 'modules', ', '.join(names))
+
+        duplicates = self.duplicates()
+        if duplicates:
+            Idx.add_section('duplicate')
+            for name, paths in duplicates.items():
+                Idx.set('duplicate', name, ', '.join(paths))
+
+        try:
+            with open(self.path, 'w') as f:
+                Idx.write(f)
+            self.updated = False
+        except (IOError, OSError) as e:
+            logger.debug('Module index is not saved(%s): %s'%(str(e), self.path))
+
+    def modules_in_file(self, path):
+        ''' returns module names of a file, scanning the file only if modified '''
+
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return []
+
+        entry = self.files.get(path, None)
+        if entry is None or entry[0]!=mtime:
+            entry = [ mtime, scan_modules(path) ]
+            self.files[path] = entry
+            self.updated = True
+        return entry[1]
+
+    def add_files(self, paths):
+        for path in paths:
+            for name in self.modules_in_file(path):
+                if name not in self.modules:
+                    self.modules[name] = []
+                if path not in self.modules[name]:
+                    self.modules[name].append(path)
+
+        for name, paths in self.duplicates().items():
+            logger.debug('Module "%s" is defined in multiple files: %s'%(name, ', '.join(paths)))
+
+    def duplicates(self):
+        ''' returns modules defined in more than one distinct file '''
+
+        dups = collections.OrderedDict()
+        for name, paths in self.modules.items():
+            if len(set(os.path.realpath(p) for p in paths))>1:
+                dups[name] = paths
+        return dups
+
+    def directory_modules(self, directory):
+        if directory not in self.dirs:
+            modmap = {}
+            files = []
+            for ext in module_file_extensions:
+                files += glob.glob(os.path.join(directory,'*'+ext))
+            for fn in files:
+                for name in self.modules_in_file(fn):
+                    if name not in modmap:
+                        modmap[name] = fn
+            self.dirs[directory] = modmap
+        return self.dirs[directory]
+
+    def find(self, name, directories):
+        ''' returns the path of a file that defines a module
+
+        Include directories are searched first in order and then the files
+        listed in include INI file.
+        '''
+
+        name = name.lower()
+        for directory in directories:
+            if name.endswith('_module'):
+                for ext in module_file_extensions:
+                    fn = os.path.join(directory,name[:-7]+ext)
+                    if os.path.isfile(fn):
+                        return fn
+            fn = self.directory_modules(directory).get(name, None)
+            if fn is not None:
+                return fn
+
+        paths = self.modules.get(name, None)
+        if paths:
+            return paths[0]
@@ -6,9 +6,13 @@ from kgconfig import Config
 from .statements import Comment
 from .block_statements import Module, Program
 import os
+import re
 import logging
 import kgutils
 from . import api
+from . import kgpp
+from .kgcache import get_parsecache, cachekey, dumps, loads
+import time
 import collections
 
 logger = logging.getLogger('kgen')
@@ -17,6 +21,78 @@ logger = logging.getLogger('kgen')
 ## RESOLUTION TYPE
 #############################################################################
 
+class GenInfoList(list):
+    """ (uname, request) pairs of a gentype in geninfo
+
+    Keeps the order of a list with a set of the pairs and the first request
+    of each uname for constant-time lookups.
+    """
+
+    def __init__(self, items=()):
+        list.__init__(self)
+        self._reindex()
+        self.extend(items)
+
+    def __reduce__(self):
+        return (GenInfoList, (list(self),))
+
+    def _reindex(self):
+        self.pairs = set()
+        self.requests = {}
+        # STATE_OUT list and the number of its pairs merged by KGGenType.get_state
+        self.merged = (None, 0)
+        for uname, req in self:
+            self.pairs.add((uname, req))
+            if uname not in self.requests:
+                self.requests[uname] = req
+
+    def append(self, item):
+        list.append(self, item)
+        self.pairs.add(item)
+        if item[0] not in self.requests:
+            self.requests[item[0]] = item[1]
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def insert(self, index, item):
+        list.insert(self, index, item)
+        self._reindex()
+
+    def remove(self, item):
+        list.remove(self, item)
+        self._reindex()
+
+    def pop(self, *args):
+        item = list.pop(self, *args)
+        self._reindex()
+        return item
+
+    def __setitem__(self, index, item):
+        list.__setitem__(self, index, item)
+        self._reindex()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self._reindex()
+
+    def has_pair(self, uname, request):
+        return (uname, request) in self.pairs
+
+    def get_request(self, uname):
+        return self.requests.get(uname, None)
+
+def _get_request(uname, reqlist):
+    if isinstance(reqlist, GenInfoList):
+        return reqlist.get_request(uname)
+    for s_uname, req in reqlist:
+        if uname==s_uname: return req
+
 class KGGenType(object):
     STATE_IN = 0x2
     STATE_OUT = 0x3
@@ -47,38 +123,46 @@ class KGGenType(object):
 
     @classmethod
     def get_state_in(cls, geninfo):
-        return geninfo.get(cls.STATE_IN, [])
+        return geninfo.get(cls.STATE_IN, GenInfoList())
 
     @classmethod
     def get_state_out(cls, geninfo):
-        return geninfo.get(cls.STATE_OUT, [])
+        return geninfo.get(cls.STATE_OUT, GenInfoList())
 
     @classmethod
     def get_state(cls, geninfo):
+        # pairs of unames only in STATE_OUT are appended to STATE_IN list
         state = cls.get_state_in(geninfo)
         #state = cls.get_state_in_inout(geninfo)
-        for uname, req in cls.get_state_out(geninfo):
-            if all(not uname==u for u, r in state):
+        state_out = cls.get_state_out(geninfo)
+        if not isinstance(state, GenInfoList):
+            for uname, req in state_out:
+                if all(not uname==u for u, r in state):
+                    state.append((uname, req))
+            return state
+        outlist, nmerged = state.merged
+        if outlist is not state_out:
+            nmerged = 0
+        for uname, req in state_out[nmerged:]:
+            if state.get_request(uname) is None:
                 state.append((uname, req))
+        state.merged = (state_out, len(state_out))
         return state
 
     @classmethod
     def get_request_in(cls, uname, geninfo):
         if cls.has_state_in(geninfo):
-            for sin_uname, req in cls.get_state_in(geninfo):
-                if uname==sin_uname: return req
+            return _get_request(uname, cls.get_state_in(geninfo))
 
     @classmethod
     def get_request_out(cls, uname, geninfo):
         if cls.has_state_out(geninfo):
-            for sout_uname, req in cls.get_state_out(geninfo):
-                if uname==sout_uname: return req
+            return _get_request(uname, cls.get_state_out(geninfo))
 
     @classmethod
     def get_request(cls, uname, geninfo):
         if cls.has_state(geninfo):
-            for s_uname, req in cls.get_state(geninfo):
-                if uname==s_uname: return req
+            return _get_request(uname, cls.get_state(geninfo))
 
     @classmethod
     def has_uname_in(cls, uname, geninfo):
@@ -124,41 +208,319 @@ class ResState(object):
                     pass
             self.res_stmts[-1].geninfo.values()[0] = newlist
 
-class SrcFile(object):
-    def handle_include(self, lines):
-        import re
-        import os
-
-        insert_lines = []
-        for i, line in enumerate(lines):
-            match = re.match(r'^\s*include\s*("[^"]+"|\'[^\']+\')', line, re.I)
-            #if not match:
-            #    match = re.match(r'\s*#include\s*("[^"]+"|\<[^\']+\>)\s*\Z', line, re.I)
-            if match:
-                if self.realpath in Config.include['file']:
-                    include_dirs = Config.include['file'][self.realpath]['path']+Config.include['path']
-                else:
-                    include_dirs = Config.include['path']
-
-                if os.path.isfile(Config.mpi['header']):
-                    include_dirs.insert(0, os.path.dirname(Config.mpi['header']))
-
-                filename = match.group(1)[1:-1].strip()
-                path = filename
-                for incl_dir in include_dirs+[os.path.dirname(self.realpath)]:
-                    path = os.path.join(incl_dir, filename)
-                    if os.path.exists(path):
-                        break
-                if os.path.isfile(path):
+_INCLUDE_LINE = re.compile(r'^\s*include\s*("[^"]+"|\'[^\']+\')', re.I)
+
+# path -> lines of a Fortran include file
+_include_files = {}
+
+def handle_include(realpath, lines):
+
+    insert_lines = []
+    for i, line in enumerate(lines):
+        match = _INCLUDE_LINE.match(line)
+        #if not match:
+        #    match = re.match(r'\s*#include\s*("[^"]+"|\<[^\']+\>)\s*\Z', line, re.I)
+        if match:
+            if realpath in Config.include['file']:
+                include_dirs = Config.include['file'][realpath]['path']+Config.include['path']
+            else:
+                include_dirs = Config.include['path'][:]
+
+            if os.path.isfile(Config.mpi['header']):
+                include_dirs.insert(0, os.path.dirname(Config.mpi['header']))
+
+            filename = match.group(1)[1:-1].strip()
+            path = filename
+            for incl_dir in include_dirs+[os.path.dirname(realpath)]:
+                path = os.path.join(incl_dir, filename)
+                if os.path.exists(path):
+                    break
+            if os.path.isfile(path):
+                if path not in _include_files:
                     with open(path, 'r') as f:
-                        included_lines = f.read()
-                        insert_lines.extend(self.handle_include(included_lines.split('\n')))
-                else:
-                    raise UserException('Can not find %s in include paths of %s.'%(filename, self.realpath))
+                        _include_files[path] = f.read().split('\n')
+                insert_lines.extend(handle_include(realpath, _include_files[path]))
+            else:
+                raise UserException('Can not find %s in include paths of %s.'%(filename, realpath))
+        else:
+            insert_lines.append(line)
+
+    return insert_lines
+
+# arguments that are passed to the external preprocessor without quotes
+_PP_ARG = re.compile(r'^[A-Za-z0-9_./:+=,@%-]+$')
+
+def builtin_preprocess(realpath, text, pp, flags, incpaths, defines):
+    ''' returns the output of the builtin preprocessor or None if pp is to be used '''
+
+    if not Config.preprocess['builtin']:
+        return None
+    builtin = kgpp.get_preprocessor(pp, flags)
+    if builtin is None:
+        return None
+    for arg in incpaths + defines:
+        if not _PP_ARG.match(arg):
+            return None
+    try:
+        return builtin.run(text, incpaths, defines, os.getcwd())
+    except kgpp.Unsupported as e:
+        logger.debug('%s is used for %s: %s'%(pp, realpath, str(e)))
+        return None
+
+def parse_srcfile(realpath, preprocess=True):
+    ''' preprocesses and parses a source file and returns its parse tree '''
+
+    # set source file format
+    isfree = None
+    isstrict = None
+    if realpath in Config.source['file'].keys():
+        if 'isfree' in Config.source['file'][realpath]:
+            isfree = Config.source['file'][realpath]['isfree']
+        if 'isstrict' in Config.source['file'][realpath]:
+            isstrict = Config.source['file'][realpath]['isstrict']
+    else:
+        isstrict = Config.source['isstrict']
+        isfree = Config.source['isfree']
+    # prepare include paths and macro definitions
+    path_src = []
+    macros_src = []
+    if realpath in Config.include['file']:
+        path_src = Config.include['file'][realpath]['path']+[os.path.dirname(realpath)]
+        path_src = [ path for path in path_src if len(path)>0 ]
+        for k, v in Config.include['file'][realpath]['macro'].items():
+            if v is not None:
+                macros_src.append('-D%s=%s'%(k,v))
             else:
-                insert_lines.append(line)
+                macros_src.append('-D%s'%k)
+
+    if os.path.isfile(Config.mpi['header']):
+        incpaths = [os.path.dirname(Config.mpi['header'])] + Config.include['path']+path_src
+    else:
+        incpaths = Config.include['path']+path_src
+    includes = [ '-I %s'%incpath for incpath in incpaths ]
+
+    macros_common = []
+    for k, v in Config.include['macro'].items():
+        if v:
+            macros_common.append('-D%s=%s'%(k,v))
+        else:
+            macros_common.append('-D%s'%k)
+    macros = ' '.join(macros_common + macros_src)
+
+    # execute preprocessing
+    new_lines = []
+    with open(realpath, 'r') as f:
+        if preprocess:
+            pp = Config.bin['pp']
+            if pp.endswith('fpp'):
+                if isfree is None or isfree: srcfmt = ' -free'
+                else: srcfmt = ' -fixed'
+                flags = Config.bin['fpp_flags'] + srcfmt
+            elif pp.endswith('cpp'):
+                flags = Config.bin['cpp_flags']
+            else: raise UserException('Preprocessor is not either fpp or cpp')
+
+            text = f.read()
+            output = None
+            if pp.endswith('cpp'):
+                output = builtin_preprocess(realpath, text, pp, flags, incpaths, [ macro[2:] for macro in macros_common + macros_src ])
+            if output is None:
+                output, err, retcode = kgutils.run_shcmd('%s %s %s %s' % (pp, flags, ' '.join(includes), macros), input=text)
+            prep = list(map(lambda l: '!KGEN'+l if l.startswith('#') else l, output.split('\n')))
+            new_lines = handle_include(realpath, prep)
+        else:
+            new_lines = f.read().split('\n')
+
+    # add include paths
+    include_dirs = Config.include['path'][:]
+    if realpath in Config.include['file'] and 'path' in Config.include['file'][realpath]:
+        include_dirs.extend(Config.include['file'][realpath]['path'])
+        include_dirs.append(os.path.dirname(realpath))
+
+    # load from parse cache
+    tree = None
+    parsecache = get_parsecache()
+    if parsecache:
+        cache_key = cachekey(new_lines, isfree, isstrict, include_dirs, macros)
+        tree = parsecache.load(cache_key)
+        if tree is not None:
+            logger.debug('Parse cache is used for %s'%realpath)
+
+    if tree is None:
+        # fparse
+        tree = api.parse('\n'.join(new_lines), ignore_comments=False, analyze=True, isfree=isfree, \
+            isstrict=isstrict, include_dirs=include_dirs, source_only=None )
+        tree.prep = new_lines
 
-        return insert_lines
+        # f2003 attribute is created when a statement is first accessed
+        for stmt, depth in api.walk(tree, -1):
+            stmt.f2003_lazy = True
+
+        if parsecache:
+            parsecache.save(cache_key, tree)
+
+    return tree
+
+#############################################################################
+## PREFETCH
+#############################################################################
+
+# realpath -> serialized parse tree
+_prefetched = {}
+
+def _used_module_files(tree):
+    from .statements import Use
+    from .kgextra import Intrinsic_Modules
+
+    files = []
+    for stmt, depth in api.walk(tree, -1):
+        if not isinstance(stmt, Use) or stmt.name in tree.a.module:
+            continue
+        if (stmt.nature and stmt.nature=='INTRINSIC') or stmt.name.upper() in Intrinsic_Modules:
+            continue
+        if 'skip_module' in Config.get_exclude_actions('namepath', stmt.name):
+            continue
+        fn = stmt.reader.find_module_source_file(stmt.name)
+        if fn and fn not in files:
+            files.append(fn)
+    return files
+
+def _prefetch_worker(realpath):
+    try:
+        tree = parse_srcfile(realpath)
+        return realpath, dumps(tree), _used_module_files(tree)
+    except BaseException as e:
+        # readfortran exits on a syntax error. the file is parsed again serially.
+        return realpath, None, []
+
+def prefetch(srcpaths, nprocs):
+    ''' parses source files reachable through USE statements using a process pool '''
+
+    import multiprocessing
+
+    # worker processes share the builtin preprocessor
+    if Config.preprocess['builtin'] and Config.bin['pp'].endswith('cpp'):
+        kgpp.get_preprocessor(Config.bin['pp'], Config.bin['cpp_flags'])
+
+    pool = multiprocessing.Pool(nprocs)
+    pending = collections.OrderedDict()
+
+    def submit(path):
+        realpath = os.path.realpath(path)
+        if realpath in pending or realpath in Config.srcfiles or realpath in _prefetched:
+            return
+        pending[realpath] = pool.apply_async(_prefetch_worker, (realpath,))
+
+    # a result of a killed worker never arrives. files without results are parsed serially.
+    try:
+        for path in srcpaths:
+            submit(path)
+
+        lastresult = time.time()
+        while any(result is not None for result in pending.values()):
+            done = [ (realpath, result) for realpath, result in pending.items() if result is not None and result.ready() ]
+            if not done:
+                if time.time() - lastresult > Config.prefetch['timeout']:
+                    logger.warn('Prefetch is stopped as no source file is parsed for %d seconds.'%Config.prefetch['timeout'])
+                    break
+                time.sleep(0.01)
+                continue
+
+            lastresult = time.time()
+            for realpath, result in done:
+                pending[realpath] = None
+                try:
+                    _, data, usedfiles = result.get()
+                except Exception as e:
+                    data, usedfiles = None, []
+                if data is None:
+                    logger.debug('Prefetch is failed: %s'%realpath)
+                    continue
+                _prefetched[realpath] = data
+                for path in usedfiles:
+                    submit(path)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    logger.info('Prefetched %d source files'%len(_prefetched))
+
+def _name_nodes(node):
+    ''' returns (Name node, True if in a list or a tuple) in the order of expr_by_name
+
+    Names in lists or tuples of items are not visited by kgutils.traverse.
+    '''
+    from .Fortran2003 import Name
+
+    nodes = []
+    stack = [ (node, False) ]
+    while stack:
+        node, inlist = stack.pop()
+        if isinstance(node, Name):
+            nodes.append((node, inlist))
+        elif isinstance(node, list) or isinstance(node, tuple):
+            stack.extend([ (item, True) for item in reversed(node) ])
+        elif node and hasattr(node, 'items') and node.items:
+            stack.extend([ (item, inlist) for item in reversed(node.items) ])
+    return nodes
+
+class NameIndex(object):
+    ''' inverted index from lowercase names to (statement, Name node) occurrences in a source file
+
+    Names of a statement are collected when they are first needed. All
+    statements are indexed at the first lookup of a name. Occurrences are
+    in the order of statements and of nodes in a statement.
+    '''
+
+    def __init__(self, tree):
+        self.tree = tree
+        # id of stmt -> (stmt, [ (lowercase name, Name node, in list), ... ])
+        self.stmts = {}
+        self.index = None
+
+    def stmt_occurrences(self, stmt):
+        entry = self.stmts.get(id(stmt), None)
+        if entry is None:
+            occurs = []
+            if hasattr(stmt, 'f2003_class'):
+                occurs = [ (node.string.lower(), node, inlist) for node, inlist in _name_nodes(stmt.f2003) ]
+            entry = (stmt, occurs)
+            self.stmts[id(stmt)] = entry
+        return entry[1]
+
+    def stmt_names(self, stmt):
+        ''' returns names of a statement that kgutils.traverse visits without duplicates '''
+
+        names = []
+        for lname, node, inlist in self.stmt_occurrences(stmt):
+            if not inlist and node.string not in names:
+                names.append(node.string)
+        return names
+
+    def occurrences(self, name):
+        ''' returns (statement, Name node) occurrences of a name '''
+
+        if self.index is None:
+            index = {}
+            for stmt, depth in api.walk(self.tree, -1):
+                for lname, node, inlist in self.stmt_occurrences(stmt):
+                    if lname in index:
+                        index[lname].append((stmt, node))
+                    else:
+                        index[lname] = [ (stmt, node) ]
+            self.index = index
+        return self.index.get(name.lower(), [])
+
+    def statements(self, name):
+        ''' returns statements that have a name without duplicates '''
+
+        stmts = []
+        for stmt, node in self.occurrences(name):
+            if not stmts or stmts[-1] is not stmt:
+                stmts.append(stmt)
+        return stmts
+
+class SrcFile(object):
 
     def __init__(self, srcpath, preprocess=True):
 
@@ -167,80 +529,17 @@ class SrcFile(object):
         self.srcpath = srcpath
         self.realpath = os.path.realpath(self.srcpath)
 
-        
-        # set source file format
-        isfree = None
-        isstrict = None
-        if self.realpath in Config.source['file'].keys():
-            if 'isfree' in Config.source['file'][self.realpath]:
-                isfree = Config.source['file'][self.realpath]['isfree']
-            if 'isstrict' in Config.source['file'][self.realpath]:
-                isstrict = Config.source['file'][self.realpath]['isstrict']
-        else:
-            isstrict = Config.source['isstrict']
-            isfree = Config.source['isfree']
-        # prepare include paths and macro definitions
-        path_src = []
-        macros_src = []
-        if self.realpath in Config.include['file']:
-            path_src = Config.include['file'][self.realpath]['path']+[os.path.dirname(self.realpath)]
-            path_src = [ path for path in path_src if len(path)>0 ]
-            for k, v in Config.include['file'][self.realpath]['macro'].items():
-                if v is not None:
-                    macros_src.append('-D%s=%s'%(k,v))
-                else:
-                    macros_src.append('-D%s'%k)
-
-        if os.path.isfile(Config.mpi['header']):
-            includes = [ '-I %s'%incpath for incpath in [os.path.dirname(Config.mpi['header'])] + Config.include['path']+path_src ]
-        else:
-            includes = [ '-I %s'%incpath for incpath in Config.include['path']+path_src ]
-
-        macros_common = []
-        for k, v in Config.include['macro'].items():
-            if v:
-                macros_common.append('-D%s=%s'%(k,v))
-            else:
-                macros_common.append('-D%s'%k)
-        macros = ' '.join(macros_common + macros_src)
-
-        # execute preprocessing
         logger.info('Reading %s'%self.srcpath)
 
-        new_lines = []
-        with open(self.realpath, 'r') as f:
-            if preprocess:
-                pp = Config.bin['pp']
-                if pp.endswith('fpp'):
-                    if isfree is None or isfree: srcfmt = ' -free'
-                    else: srcfmt = ' -fixed'
-                    flags = Config.bin['fpp_flags'] + srcfmt
-                elif pp.endswith('cpp'):
-                    flags = Config.bin['cpp_flags']
-                else: raise UserException('Preprocessor is not either fpp or cpp')
-
-                output, err, retcode = kgutils.run_shcmd('%s %s %s %s' % (pp, flags, ' '.join(includes), macros), input=f.read())
-                prep = list(map(lambda l: '!KGEN'+l if l.startswith('#') else l, output.split('\n')))
-                new_lines = self.handle_include(prep)
-            else:
-                new_lines = f.read().split('\n')
-
-        # add include paths
-        include_dirs = Config.include['path'][:]
-        if self.realpath in Config.include['file'] and 'path' in Config.include['file'][self.realpath]:
-            include_dirs.extend(Config.include['file'][self.realpath]['path'])
-            include_dirs.append(os.path.dirname(self.realpath))
+        # use a tree parsed in advance
+        if preprocess and self.realpath in _prefetched:
+            try:
+                self.tree = loads(_prefetched.pop(self.realpath))
+            except Exception as e:
+                logger.debug('Prefetched tree is discarded(%s): %s'%(str(e), self.realpath))
 
-        # fparse
-        self.tree = api.parse('\n'.join(new_lines), ignore_comments=False, analyze=True, isfree=isfree, \
-            isstrict=isstrict, include_dirs=include_dirs, source_only=None )
-        self.tree.prep = new_lines
-
-        # parse f2003
-        lineno = 0
-        linediff = 0
-        for stmt, depth in api.walk(self.tree, -1):
-            stmt.parse_f2003()
+        if self.tree is None:
+            self.tree = parse_srcfile(self.realpath, preprocess=preprocess)
 
         # rename reader.id
         self.tree.reader.id = self.realpath
@@ -259,16 +558,30 @@ class SrcFile(object):
                 if item.reader.id not in Config.program_units.keys():
                     Config.program_units[item.reader.id] = []
                 Config.program_units[item.reader.id].append(item)
+                if hasattr(item, 'name'):
+                    if item.name not in Config.program_unit_index:
+                        Config.program_unit_index[item.name] = []
+                    Config.program_unit_index[item.name].append((item.reader.id, item))
 
         # create a tuple for file dependency
         Config.srcfiles[self.realpath] = ( self, [], [] )
 
+        # names in statements
+        self.name_index = NameIndex(self.tree)
+
         self.process_directive()
 
     def stmt_by_name(self, name, cls=None, lineafter=-1):
         from .statements import Comment
 
-        for stmt, depth in walk(self.tree, -1):
+        if not name:
+            raise kgutils.ProgramException("Callsite name is not found. Please check if callsite is specified correctly.")
+
+        if isinstance(name, str):
+            name = kgutils.KGName(name)
+
+        # only statements that have the first part of name are searched
+        for stmt in self.name_index.statements(name.firstpartname()):
             if isinstance(cls, list):
                 if not stmt.__class__ in cls: continue 
 
@@ -299,11 +612,6 @@ class SrcFile(object):
                 elif started:
                     if not isinstance(s, Comment): return s
 
-        def get_names(node, bag, depth):
-            from .Fortran2003 import Name
-            if isinstance(node, Name) and not node.string in bag:
-                bag.append(node.string)
-           
         # collect directives
         directs = []
         for stmt, depth in api.walk(self.tree):
@@ -371,10 +679,10 @@ class SrcFile(object):
                 Config.callsite['stmts'].append(stmt)
             else: # not in callsite
                 if Config.callsite['namepath'] and stmt.__class__ in executable_construct:
-                    names = []
-                    kgutils.traverse(stmt.f2003, get_names, names)
+                    names = self.name_index.stmt_names(stmt)
+                    matcher = kgutils.namepath_matcher([ Config.callsite['namepath'] ], internal=False)
                     for name in names:
-                        if kgutils.match_namepath(Config.callsite['namepath'], kgutils.pack_exnamepath(stmt, name), internal=False):
+                        if matcher.match(kgutils.pack_exnamepath(stmt, name)):
                             Config.kernel['name'] = name
                             for _s, _d in api.walk(stmt):
                                 Config.callsite['stmts'].append(_s)
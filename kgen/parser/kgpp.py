@@ -0,0 +1,508 @@
+'''KGen builtin preprocessor
+
+In-process replacement of "cpp -w -traditional -P" for the subset of the
+C preprocessor that Fortran sources use: #define, #undef, #if, #ifdef,
+#ifndef, #elif, #else, #endif and #include with traditional macro
+expansion. Included files are read once per process and predefined macros
+of the external preprocessor are collected once. Input that is not
+covered raises Unsupported so that the external preprocessor is used
+instead.
+'''
+
+import os
+import re
+import logging
+import kgutils
+
+logger = logging.getLogger('kgen')
+
+CPP_FLAGS = [ '-w', '-traditional', '-P' ]
+
+MAX_INCLUDE_DEPTH = 200
+MAX_EXPANSIONS = 10000
+
+# macros whose values are not known before preprocessing
+DYNAMIC_MACROS = set([ '__FILE__', '__LINE__', '__COUNTER__', '__DATE__', '__TIME__', '__TIMESTAMP__', \
+    '__INCLUDE_LEVEL__', '__BASE_FILE__', '__FILE_NAME__', '_Pragma' ])
+
+# input used to check the builtin preprocessor against the external one
+PROBE = 'a X\n\n#define F(x, y) [x|y]\n#if defined(X) && X > 1\nb F( X ,c)\n#elif 2*3 == 6\nF(unix,(1,2))\n' + \
+    '#else\nd\n#endif\n\n#define X 2\n  X\n#undef X\nX\n'
+
+# traditional mode: identifiers are searched anywhere outside of strings and
+# strings without a closing quote end at the end of a line
+_TOKEN = re.compile(r'''([A-Za-z_][A-Za-z0-9_]*)|('(?:[^'\\]|\\.)*(?:'|\\)?|"(?:[^"\\]|\\.)*(?:"|\\)?)|([ \t]+)|''' + \
+    r'''([^A-Za-z_'"(), \t]+)|([(),])''')
+_IDENT = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+_DIRECTIVE = re.compile(r'#[ \t]*([A-Za-z_][A-Za-z0-9_]*)?[ \t]*(.*)$')
+_DEFINED = re.compile(r'\bdefined\b[ \t]*(?:\([ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*\)|([A-Za-z_][A-Za-z0-9_]*))')
+_EXPR_TOKEN = re.compile(r'[ \t]*(?:(0[xX][0-9a-fA-F]+|[0-9]+)([uUlL]*)(?![A-Za-z0-9_.])|([A-Za-z_][A-Za-z0-9_]*)|' + \
+    r'(\+\+|--|\|\||&&|==|!=|<=|>=|<<|>>|[-+*/%<>&|^!~?:()]))')
+
+IDENT, STRING, SPACE, OTHER, PUNCT = 1, 2, 3, 4, 5
+
+class Unsupported(Exception):
+    ''' raised for input that the builtin preprocessor does not cover '''
+    pass
+
+def parse_define(text):
+    ''' returns (name, macro) of the text after #define
+
+    A macro is (None, body) if it is object-like and (number of
+    parameters, pieces of body) if it is function-like. A piece is either
+    a text or the index of a parameter.
+    '''
+
+    match = _IDENT.match(text)
+    if not match:
+        raise Unsupported('#define without a macro name')
+    name = match.group(0)
+    rest = text[match.end():]
+
+    if rest.startswith('('):
+        end = rest.find(')')
+        if end < 0:
+            raise Unsupported('incomplete parameters of macro %s'%name)
+        params = [ param.strip(' \t') for param in rest[1:end].split(',') ]
+        if params==['']:
+            params = []
+        for param in params:
+            if not _IDENT.match(param) or _IDENT.match(param).end()!=len(param) or params.count(param)>1:
+                raise Unsupported('parameter "%s" of macro %s'%(param, name))
+        body = rest[end+1:].strip(' \t')
+        pieces = []
+        pos = 0
+        # traditional mode substitutes parameters in strings too
+        for match in _IDENT.finditer(body):
+            if match.group(0) in params:
+                pieces.append(body[pos:match.start()])
+                pieces.append(params.index(match.group(0)))
+                pos = match.end()
+        pieces.append(body[pos:])
+        return name, (len(params), pieces)
+    elif rest and rest[0] not in ' \t':
+        raise Unsupported('no whitespace after macro name %s'%name)
+    else:
+        return name, (None, rest.strip(' \t'))
+
+def tokenize(text, hideset):
+    return [ (match.lastindex, match.group(0), hideset) for match in _TOKEN.finditer(text) ]
+
+class _Expression(object):
+    ''' evaluates an integer expression of #if '''
+
+    BINARY = [ ['||'], ['&&'], ['|'], ['^'], ['&'], ['==', '!='], ['<', '>', '<=', '>='], ['<<', '>>'], ['+', '-'], ['*', '/', '%'] ]
+    LIMIT = 2**63
+
+    def __init__(self, text):
+        self.tokens = []
+        pos = 0
+        text = text.rstrip(' \t')
+        while pos < len(text):
+            match = _EXPR_TOKEN.match(text, pos)
+            if not match:
+                raise Unsupported('#if expression: %s'%text)
+            number, suffix, name, op = match.groups()
+            if number:
+                if 'u' in suffix.lower():
+                    raise Unsupported('unsigned integer in #if')
+                try:
+                    if number[:2].lower()=='0x': value = int(number[2:], 16)
+                    elif number.startswith('0'): value = int(number, 8)
+                    else: value = int(number)
+                except ValueError:
+                    raise Unsupported('integer %s in #if'%number)
+                self.tokens.append(('n', value))
+            elif name:
+                if name=='defined' or text[match.end():].lstrip(' \t').startswith('('):
+                    raise Unsupported('%s in #if'%name)
+                # identifiers that are not macros are zero
+                self.tokens.append(('n', 0))
+            else:
+                self.tokens.append(('o', op))
+            pos = match.end()
+        self.pos = 0
+
+    def evaluate(self):
+        if not self.tokens:
+            raise Unsupported('#if without expression')
+        value = self.ternary(True)
+        if self.pos!=len(self.tokens):
+            raise Unsupported('#if expression')
+        return value
+
+    def peek(self):
+        if self.pos < len(self.tokens) and self.tokens[self.pos][0]=='o':
+            return self.tokens[self.pos][1]
+
+    def next(self):
+        if self.pos>=len(self.tokens):
+            raise Unsupported('incomplete #if expression')
+        self.pos += 1
+        return self.tokens[self.pos-1]
+
+    def check(self, value, live):
+        if live and abs(value)>=self.LIMIT:
+            raise Unsupported('integer overflow in #if')
+        return value
+
+    def ternary(self, live):
+        cond = self.binary(0, live)
+        if self.peek()!='?':
+            return cond
+        self.next()
+        first = self.ternary(live and cond!=0)
+        if self.next()!=('o', ':'):
+            raise Unsupported('incomplete conditional operator in #if')
+        second = self.ternary(live and cond==0)
+        return first if cond!=0 else second
+
+    def binary(self, level, live):
+        if level==len(self.BINARY):
+            return self.unary(live)
+        left = self.binary(level+1, live)
+        while self.peek() in self.BINARY[level]:
+            op = self.next()[1]
+            if op=='||':
+                right = self.binary(level+1, live and left==0)
+                left = int(left!=0 or right!=0)
+            elif op=='&&':
+                right = self.binary(level+1, live and left!=0)
+                left = int(left!=0 and right!=0)
+            else:
+                right = self.binary(level+1, live)
+                left = self.check(self.apply(op, left, right, live), live)
+        return left
+
+    def apply(self, op, left, right, live):
+        if op in ('/', '%'):
+            if right==0:
+                if live: raise Unsupported('division by zero in #if')
+                return 0
+            # C truncates toward zero
+            quotient = abs(left)//abs(right)
+            if (left<0)!=(right<0): quotient = -quotient
+            return quotient if op=='/' else left - right*quotient
+        elif op in ('<<', '>>'):
+            if right<0 or right>=64:
+                if live: raise Unsupported('shift count in #if')
+                return 0
+            return left<<right if op=='<<' else left>>right
+        elif op=='|': return left|right
+        elif op=='^': return left^right
+        elif op=='&': return left&right
+        elif op=='==': return int(left==right)
+        elif op=='!=': return int(left!=right)
+        elif op=='<': return int(left<right)
+        elif op=='>': return int(left>right)
+        elif op=='<=': return int(left<=right)
+        elif op=='>=': return int(left>=right)
+        elif op=='+': return left+right
+        elif op=='-': return left-right
+        elif op=='*': return left*right
+
+    def unary(self, live):
+        kind, value = self.next()
+        if kind=='n':
+            return value
+        elif value=='(':
+            value = self.ternary(live)
+            if self.next()!=('o', ')'):
+                raise Unsupported('unbalanced parentheses in #if')
+            return value
+        elif value=='!': return int(self.unary(live)==0)
+        elif value=='~': return ~self.unary(live)
+        elif value=='-': return self.check(-self.unary(live), live)
+        elif value=='+': return self.unary(live)
+        raise Unsupported('operator %s in #if'%value)
+
+class Preprocessor(object):
+    ''' preprocesses a source file in the way of "cpp -w -traditional -P" '''
+
+    def __init__(self, predefined, preamble):
+        self.predefined = predefined
+        # number of blank lines that the external preprocessor writes first
+        self.preamble = preamble
+
+        # macro definitions -> macro environment
+        self._environments = {}
+        # path -> lines of an included file
+        self._files = {}
+        # (directories, filename) -> path of an included file
+        self._found = {}
+
+    def environment(self, defines):
+        ''' returns macros of predefined ones and NAME or NAME=VALUE definitions '''
+
+        key = tuple(defines)
+        if key not in self._environments:
+            macros = dict(self.predefined)
+            for define in defines:
+                name, sep, value = define.partition('=')
+                if not sep: value = '1'
+                name, macro = parse_define('%s %s'%(name, value))
+                macros[name] = macro
+            self._environments[key] = macros
+        return dict(self._environments[key])
+
+    def run(self, text, includes, defines, curdir):
+        ''' returns preprocessed text
+
+        includes are include directories in the order of -I options,
+        defines are NAME or NAME=VALUE of -D options and curdir is the
+        directory for quoted includes of the text.
+        '''
+
+        macros = self.environment(defines)
+        out = []
+        self.process(self.split(text), curdir, includes, macros, out, 0)
+        if out:
+            return '\n'*self.preamble + '\n'.join(out) + '\n'
+        return '\n'*self.preamble
+
+    def split(self, text):
+        if '\r' in text or '/*' in text:
+            raise Unsupported('carriage return or C comment')
+        lines = text.split('\n')
+        if lines[-1]=='':
+            lines.pop()
+        for line in lines:
+            if line.endswith('\\'):
+                raise Unsupported('line continuation')
+        return lines
+
+    def read(self, path):
+        if path not in self._files:
+            try:
+                with open(path, 'r') as f:
+                    self._files[path] = self.split(f.read())
+            except Unsupported as e:
+                self._files[path] = e
+        lines = self._files[path]
+        if isinstance(lines, Unsupported):
+            raise lines
+        return lines
+
+    def find(self, filename, dirs):
+        key = (tuple(dirs), filename)
+        if key not in self._found:
+            path = None
+            for incdir in dirs:
+                if os.path.isfile(os.path.join(incdir, filename)):
+                    path = os.path.abspath(os.path.join(incdir, filename))
+                    break
+            self._found[key] = path
+        return self._found[key]
+
+    def include(self, rest, curdir, includes, macros, out, depth):
+        if rest.startswith('"'):
+            end = rest.find('"', 1)
+            dirs = [ curdir ] + includes
+        elif rest.startswith('<'):
+            end = rest.find('>', 1)
+            # system directories are not searched
+            dirs = includes
+        else:
+            raise Unsupported('#include %s'%rest)
+        if end < 0:
+            raise Unsupported('#include %s'%rest)
+        path = self.find(rest[1:end], dirs)
+        if path is None:
+            raise Unsupported('%s is not found'%rest[:end+1])
+        if depth>=MAX_INCLUDE_DEPTH:
+            raise Unsupported('#include nested too deeply')
+        self.process(self.read(path), os.path.dirname(path), includes, macros, out, depth+1)
+
+    def process(self, lines, curdir, includes, macros, out, depth):
+        # [active before, a group is taken, #else is seen]
+        stack = []
+        active = True
+        for line in lines:
+            if line.startswith('#'):
+                name, rest = _DIRECTIVE.match(line).groups()
+                if name in ('if', 'ifdef', 'ifndef'):
+                    cond = active and self.condition(name, rest, macros)
+                    stack.append([ active, cond, False ])
+                    active = cond
+                elif name in ('elif', 'else'):
+                    if not stack or stack[-1][2]:
+                        raise Unsupported('#%s without #if'%name)
+                    parent, taken, _ = stack[-1]
+                    if name=='else':
+                        stack[-1][2] = True
+                        active = parent and not taken
+                    else:
+                        active = parent and not taken and self.condition('if', rest, macros)
+                    stack[-1][1] = taken or active
+                elif name=='endif':
+                    if not stack:
+                        raise Unsupported('#endif without #if')
+                    active = stack.pop()[0]
+                elif not active:
+                    continue
+                elif name=='define':
+                    name, macro = parse_define(rest)
+                    macros[name] = macro
+                elif name=='undef':
+                    match = _IDENT.match(rest)
+                    if not match or rest[match.end():].strip(' \t'):
+                        raise Unsupported('#undef %s'%rest)
+                    macros.pop(match.group(0), None)
+                elif name=='include':
+                    self.include(rest, curdir, includes, macros, out, depth)
+                elif name is None and not rest.strip(' \t'):
+                    # null directive
+                    pass
+                else:
+                    raise Unsupported('#%s'%(name if name else rest))
+            elif active:
+                out.append(self.expand_line(line, macros))
+        if stack:
+            raise Unsupported('unterminated #if')
+
+    def condition(self, name, rest, macros):
+        if name=='if':
+            text = _DEFINED.sub(lambda m: '1' if (m.group(1) or m.group(2)) in macros else '0', rest)
+            text = self.expand(text, macros, frozenset())
+            text = _DEFINED.sub(lambda m: '1' if (m.group(1) or m.group(2)) in macros else '0', text)
+            return _Expression(text).evaluate()!=0
+        match = _IDENT.match(rest)
+        if not match:
+            raise Unsupported('#%s without a macro name'%name)
+        return (match.group(0) in macros)==(name=='ifdef')
+
+    def expand_line(self, line, macros):
+        return self.expand(line, macros, frozenset())
+
+    def expand(self, text, macros, hideset, complete=True):
+        ''' expands macros in a line
+
+        Arguments are expanded before substitution and a replacement is
+        rescanned together with the rest of the line. A function-like
+        macro name at the end of an argument is left when complete is
+        False.
+        '''
+
+        for name in _IDENT.findall(text):
+            if name in macros or name in DYNAMIC_MACROS:
+                break
+        else:
+            return text
+
+        tokens = tokenize(text, hideset)
+        out = []
+        nexpansions = 0
+        i = 0
+        while i < len(tokens):
+            kind, value, hs = tokens[i]
+            if kind!=IDENT or value not in macros:
+                if kind==IDENT and value in DYNAMIC_MACROS:
+                    raise Unsupported('macro %s'%value)
+                out.append(value)
+                i += 1
+                continue
+            if value in hs:
+                raise Unsupported('recursive macro %s'%value)
+
+            nparams, body = macros[value]
+            if nparams is None:
+                if not _IDENT.search(body):
+                    # nothing to rescan
+                    out.append(body)
+                    i += 1
+                    continue
+                replacement = body
+                end = i + 1
+            else:
+                j = i + 1
+                while j < len(tokens) and tokens[j][0]==SPACE:
+                    j += 1
+                if j==len(tokens):
+                    if complete:
+                        raise Unsupported('arguments of macro %s may be in the next line'%value)
+                    out.append(value)
+                    i += 1
+                    continue
+                elif tokens[j][1]!='(':
+                    out.append(value)
+                    i += 1
+                    continue
+                args, end = self.arguments(value, tokens, j)
+                if nparams==0:
+                    if args!=['']:
+                        raise Unsupported('arguments to macro %s'%value)
+                    args = []
+                elif len(args)!=nparams:
+                    raise Unsupported('number of arguments to macro %s'%value)
+                args = [ self.expand(arg, macros, hs, complete=False) for arg in args ]
+                replacement = ''.join(args[piece] if isinstance(piece, int) else piece for piece in body)
+
+            nexpansions += 1
+            if nexpansions > MAX_EXPANSIONS:
+                raise Unsupported('too many expansions of macros')
+            tokens[i:end] = tokenize(replacement, hs | frozenset([ value ]))
+        return ''.join(out)
+
+    def arguments(self, name, tokens, start):
+        ''' returns arguments of the invocation whose "(" is at start and the next position '''
+
+        args = []
+        current = []
+        level = 1
+        for k in range(start+1, len(tokens)):
+            kind, value, hs = tokens[k]
+            if kind==PUNCT:
+                if value=='(':
+                    level += 1
+                elif value==')':
+                    level -= 1
+                    if level==0:
+                        args.append(''.join(current))
+                        return args, k+1
+                elif value==',' and level==1:
+                    args.append(''.join(current))
+                    current = []
+                    continue
+            current.append(value)
+        raise Unsupported('arguments of macro %s continue to the next line'%name)
+
+# (preprocessor, flags) -> Preprocessor or None
+_builtins = {}
+
+def get_preprocessor(pp, flags):
+    ''' returns a builtin preprocessor that replaces pp with flags or None
+
+    Predefined macros and the blank lines written before the output are
+    collected from the external preprocessor, and the builtin one is
+    checked against it with a probe input.
+    '''
+
+    key = (pp, flags)
+    if key not in _builtins:
+        _builtins[key] = None
+        if pp.endswith('cpp') and flags.split()==CPP_FLAGS:
+            try:
+                _builtins[key] = _calibrate(pp, flags)
+            except Unsupported as e:
+                logger.debug('Builtin preprocessor is not used: %s'%str(e))
+    return _builtins[key]
+
+def _calibrate(pp, flags):
+    out, err, retcode = kgutils.run_shcmd('%s %s -dM'%(pp, flags), input='')
+    if retcode!=0:
+        raise Unsupported('predefined macros are not available from %s'%pp)
+    predefined = {}
+    for line in out.split('\n'):
+        if line.startswith('#define '):
+            name, macro = parse_define(line[8:])
+            predefined[name] = macro
+
+    out, err, retcode = kgutils.run_shcmd('%s %s'%(pp, flags), input='')
+    if retcode!=0 or out.strip():
+        raise Unsupported('unexpected output from %s'%pp)
+    builtin = Preprocessor(predefined, out.count('\n'))
+
+    out, err, retcode = kgutils.run_shcmd('%s %s'%(pp, flags), input=PROBE)
+    if retcode!=0 or builtin.run(PROBE, [], [], os.getcwd())!=out:
+        raise Unsupported('output is different from %s'%pp)
+    return builtin
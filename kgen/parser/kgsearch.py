@@ -97,11 +97,11 @@ def f2003_search_unknowns(stmt, node, resolvers=None, gentype=None):
                 if itemclsname=='Name':
                     get_name(stmt, item, resolvers, gentype=gentype)
                 else:
-                    exec('search_%s(stmt, item, gentype=gentype)' % itemclsname)
+                    get_search_func(itemclsname)(stmt, item, gentype=gentype)
         elif clsname.startswith('End_'):
             pass
         else:
-            exec('search_%s(stmt, node, gentype=gentype)' % clsname)
+            get_search_func(clsname)(stmt, node, gentype=gentype)
     except Exception as e:
         errname = clsname
         if itemclsname:
@@ -123,6 +123,14 @@ def f2003_search_unknowns(stmt, node, resolvers=None, gentype=None):
             import sys
             sys.exit(-1)
 
+def get_search_func(clsname):
+    """Return a search function for a class name of Fortran2003 node."""
+
+    try:
+        return search_funcs[clsname]
+    except KeyError:
+        raise NameError("name 'search_%s' is not defined" % clsname)
+
 def get_name_or_defer(stmt, node, resolvers, defer=True, gentype=None):
     """Select a name to be searched, or defer to lower level of nodes in AST.
 
@@ -151,7 +159,7 @@ def get_name_or_defer(stmt, node, resolvers, defer=True, gentype=None):
     defer_names
     """
 
-    from kgutils import KGName, pack_innamepath, match_namepath
+    from kgutils import KGName, pack_innamepath, namepath_matcher
     from .kgparse import ResState
     from .kgextra import Intrinsic_Procedures
     from .base_classes import is_except
@@ -201,20 +209,22 @@ def get_name_or_defer(stmt, node, resolvers, defer=True, gentype=None):
         # skip if excluded
         #if Config.exclude.has_key('namepath') and stmt.__class__ in execution_part:
         if 'namepath' in Config.exclude:
-            for pattern, actions in Config.exclude['namepath'].items():
-                name = node.string.lower()
-                namepath = pack_innamepath(stmt, name) 
-                #logger.debug('%s and %s are being checked for exclusion'%(pattern, namepath))
-                if match_namepath(pattern, namepath):
-                    #logger.debug('%s and %s are mathched for exclusion'%(pattern, namepath))
-                    if not hasattr(stmt, 'exclude_names'): stmt.exclude_names = OrderedDict()
-                    if name in stmt.exclude_names:
-                        stmt.exclude_names[name].extend(actions)
-                    else:
-                        stmt.exclude_names[name] = actions
-                    node.skip_search = True
-                    if hasattr(node, 'parent'): node.parent.skip_search = True
-                    return
+            excludes = Config.exclude['namepath']
+            name = node.string.lower()
+            namepath = pack_innamepath(stmt, name) 
+            matcher = namepath_matcher(excludes.keys())
+            idx = matcher.first(namepath)
+            if idx is not None:
+                actions = excludes[matcher.patterns[idx]]
+                #logger.debug('%s and %s are mathched for exclusion'%(matcher.patterns[idx], namepath))
+                if not hasattr(stmt, 'exclude_names'): stmt.exclude_names = OrderedDict()
+                if name in stmt.exclude_names:
+                    stmt.exclude_names[name].extend(actions)
+                else:
+                    stmt.exclude_names[name] = actions
+                node.skip_search = True
+                if hasattr(node, 'parent'): node.parent.skip_search = True
+                return
 
         ukey = KGName(pack_innamepath(stmt, node.string.lower()), node=node, stmt=stmt)
 
@@ -252,20 +262,22 @@ def defer_items(stmt, node, gentype=None):
 def search_Type_Declaration_Stmt(stmt, node, gentype=None):  
     """ Identifying a name in Type_Declaration_Stmt node"""
 
-    from kgutils import pack_innamepath, match_namepath
+    from kgutils import pack_innamepath, namepath_matcher
 
     # collect excluded names
     if 'namepath' in Config.exclude:
-        for pattern, actions in Config.exclude['namepath'].items():
-            decls = []
-            if isinstance(node.items[2], Fortran2003.Entity_Decl):
-                decls.append(node.items[2].items[0].string.lower())
-            elif isinstance(node.items[2], Fortran2003.Entity_Decl_List):
-                for item in node.items[2].items:
-                    decls.append(item.items[0].string.lower())
-            for decl in decls:
-                namepath = pack_innamepath(stmt, decl) 
-                if match_namepath(pattern, namepath):
+        excludes = Config.exclude['namepath']
+        decls = []
+        if isinstance(node.items[2], Fortran2003.Entity_Decl):
+            decls.append(node.items[2].items[0].string.lower())
+        elif isinstance(node.items[2], Fortran2003.Entity_Decl_List):
+            for item in node.items[2].items:
+                decls.append(item.items[0].string.lower())
+        matcher = namepath_matcher(excludes.keys())
+        matched = [ matcher.matches(pack_innamepath(stmt, decl)) for decl in decls ]
+        for idx, (pattern, actions) in enumerate(excludes.items()):
+            for decl, decl_matched in zip(decls, matched):
+                if idx in decl_matched:
                     if not hasattr(stmt, 'exclude_names'): stmt.exclude_names = OrderedDict()
                     if decl in stmt.exclude_names:
                         stmt.exclude_names[decl].extend(actions)
@@ -1172,4 +1184,11 @@ def search_Binding_PASS_Arg_Name(stmt, node, gentype=None):
     #import pdb ;pdb.set_trace()
 
     pass
- 
+
+###############################################################################
+################################## DISPATCH ###################################
+###############################################################################
+
+# class name of Fortran2003 node -> search function
+search_funcs = dict([ (name[7:], func) for name, func in list(globals().items()) \
+    if name.startswith('search_') and callable(func) ])
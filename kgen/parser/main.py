@@ -13,8 +13,17 @@ class Parser(kgtool.KGTool):
 
     def run(self):
         from .kgsearch import f2003_search_unknowns
+        from .Fortran2003 import MatchMemo
+        from .base_classes import Statement
         from . import kganalyze
 
+        MatchMemo.enabled = Config.parsememo['enabled']
+
+        # parse source files reachable from callsite file in parallel
+        if Config.prefetch['enabled'] and Config.prefetch['nprocs']>1:
+            srcpaths = [ key for key, value in Config.include['import'].items() if value == 'source' ]
+            kgparse.prefetch(srcpaths+[Config.callsite['filepath']], Config.prefetch['nprocs'])
+
         # preprocess if required
         for key, value in Config.include['import'].items():
             if value == 'source':
@@ -58,6 +67,15 @@ class Parser(kgtool.KGTool):
             if modstmt != Config.topblock['stmt']:
                 kganalyze.update_state_info(moddict['stmt'])
 
+        # keep modules found in include directories for next run
+        Config.modindex.save()
+
+        kgutils.logger.info('%d statements are converted to Fortran2003 nodes'%Statement.f2003_converted)
+
+        if MatchMemo.enabled:
+            kgutils.logger.info('Fortran2003 match memo: %d hits, %d misses (%.1f%% hit rate)'% \
+                (MatchMemo.hits, MatchMemo.misses, MatchMemo.hitrate()))
+
 
     def add_geninfo_ancestors(self, stmt):
         from .block_statements import EndStatement
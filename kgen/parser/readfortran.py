@@ -90,6 +90,13 @@ except:
 from .sourceinfo import get_source_info, get_source_info_str
 from .splitline import String, string_replace_map, splitquote
 from .utils import is_name
+
+# start of KGEN addition
+try:
+    from sys import intern
+except ImportError:
+    pass
+# end of KGEN addition
 from kgconfig import Config
 
 logger = logging.getLogger('kgen')
@@ -136,6 +143,22 @@ class FortranReaderError(Exception):
     #     print >> sys.stderr,message
     #     sys.stderr.flush()
 
+# start of KGEN addition
+_spans = {}
+
+def intern_span(span):
+    ''' returns a shared tuple for equal line number spans '''
+    if isinstance(span, tuple):
+        return _spans.setdefault(span, span)
+    return span
+
+def intern_str(s):
+    ''' returns a shared string for equal source strings '''
+    if type(s) is str:
+        return intern(s)
+    return s
+# end of KGEN addition
+
 class Line(object):
     """ Holds a Fortran source line.
 
@@ -155,16 +178,24 @@ class Line(object):
       the line contains f2py directive
     """
 
+    # start of KGEN addition
+    __slots__ = ('line', 'span', 'label', 'name', 'reader', 'strline', 'strlinemap', \
+        'is_f2py_directive', 'parse_cache', 'parent')
+    # end of KGEN addition
+
     f2py_strmap_findall = re.compile(r'(_F2PY_STRING_CONSTANT_\d+_|F2PY_EXPR_TUPLE_\d+)').findall
 
     def __init__(self, line, linenospan, label, name, reader):
-        self.line = line.strip()
+        #self.line = line.strip() # KGEN deletion
+        self.line = intern_str(line.strip()) # KGEN addition
         assert self.line, '{},{},{}'.format(line, linenospan, label)
-        self.span = linenospan
+        #self.span = linenospan # KGEN deletion
+        self.span = intern_span(linenospan) # KGEN addition
         assert label is None or isinstance(label,int),repr(label)
         assert name is None or isinstance(name,str) and name!='',repr(name)
         self.label = label
-        self.name = name
+        #self.name = name # KGEN deletion
+        self.name = intern_str(name) # KGEN addition
         self.reader = reader
         self.strline = None
         self.is_f2py_directive = linenospan[0] in reader.f2py_comment_lines
@@ -193,7 +224,8 @@ class Line(object):
         return Line(line, self.span, self.label, self.name, self.reader)
 
     def clone(self, line):
-        self.line = self.apply_map(line)
+        #self.line = self.apply_map(line) # KGEN deletion
+        self.line = intern_str(self.apply_map(line)) # KGEN addition
         self.strline = None
         return
 
@@ -247,6 +279,7 @@ class Line(object):
                     line = ''.join(substrings)
 
         line, str_map = string_replace_map(line, lower=not self.reader.ispyf)
+        line = intern_str(line) # KGEN addition
         self.strline = line
         self.strlinemap = str_map
         return line
@@ -272,10 +305,14 @@ class Line(object):
             #print self.line, cls.__name__,obj
         return obj
 
-class SyntaxErrorLine(Line, FortranReaderError):
+# Line with __slots__ can not be combined with Exception
+#class SyntaxErrorLine(Line, FortranReaderError): # KGEN deletion
+class SyntaxErrorLine(Line): # KGEN addition
+    __slots__ = ('message',) # KGEN addition
     def __init__(self, line, linenospan, label, name, reader, message):
         Line.__init__(self, line, linenospan, label, name, reader)
-        FortranReaderError.__init__(self, message)
+        #FortranReaderError.__init__(self, message) # KGEN deletion
+        self.message = message # KGEN addition
 
 class Comment(object):
     """ Holds Fortran comment.
@@ -288,9 +325,12 @@ class Comment(object):
       starting and ending line numbers
     reader : FortranReaderBase
     """
+    __slots__ = ('comment', 'span', 'reader') # KGEN addition
+
     def __init__(self, comment, linenospan, reader):
         self.comment = comment
-        self.span = linenospan
+        #self.span = linenospan # KGEN deletion
+        self.span = intern_span(linenospan) # KGEN addition
         self.reader = reader
     def __repr__(self):
         return self.__class__.__name__+'(%r,%s)' \
@@ -388,6 +428,16 @@ class FortranReaderBase(object):
     def __repr__(self):
         return '%s(%r, %r, %r)' % (self.__class__.__name__, self.source, self.isfree, self.isstrict)
 
+    # start of KGEN addition
+    def __getstate__(self):
+        # source is consumed after parsing and can not be pickled
+        state = self.__dict__.copy()
+        state['source'] = None
+        state.pop('file', None)
+        state.pop('string', None)
+        return state
+    # end of KGEN addition
+
     def find_module_source_file(self, mod_name):
         from .utils import get_module_file, module_in_file
         if self.source_only:
@@ -395,25 +445,17 @@ class FortranReaderBase(object):
                 if module_in_file(mod_name, sf):
                     return sf
         else:
-            fn = None
+#            fn = None # KGEN deletion
 #            for d in self.include_dirs: # KGEN deletion
-            for d in self.include_dirs+Config.include['path']: # KGEN addition
-                fn = get_module_file(mod_name, d)
-                if fn is not None:
-                    return fn
+#                fn = get_module_file(mod_name, d) # KGEN deletion
+#                if fn is not None: # KGEN deletion
+#                    return fn # KGEN deletion
 
             # start of KGEN addition
-            #if mod_name=='pio': import pdb; pdb.set_trace()
+            dirs = self.include_dirs+Config.include['path']
             if self.id in Config.include['file']:
-                for path in Config.include['file'][self.id]['path']:
-                    fn = get_module_file(mod_name, path) 
-                    if fn is not None:
-                        return fn
-
-            for fn in Config.include['file'].keys():
-                if module_in_file(mod_name, fn):
-                    if fn is not None:
-                        return fn
+                dirs = dirs+Config.include['file'][self.id]['path']
+            return Config.modindex.find(mod_name, dirs)
             # end of KGEN addition
 
     def set_mode(self, isfree, isstrict):
@@ -1276,6 +1318,10 @@ class FortranStringReader(FortranReaderBase):
     def __init__(self, string, include_dirs = None, source_only = None):
 
         self.id = 'string-'+str(id(string))
+        # start of KGEN addition
+        # id of the string is not reused while FortranParser.cache keeps this reader
+        self.string = string
+        # end of KGEN addition
         source = StringIO(string)
         isfree, isstrict = get_source_info_str(string)
 
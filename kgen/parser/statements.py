@@ -49,7 +49,9 @@ import logging
 logger = logging.getLogger('kgen')
 
 class DummyStatement(object):
-    pass
+
+    def has_f2003(self):
+        return False
 # end of KGEN addition
 
 class StatementWithNamelist(Statement):
@@ -248,7 +250,7 @@ class StmtFuncStatement(Statement):
             except:
                 self.isvalid = False
             finally:
-                if hasattr(self, 'f2003'):
+                if 'f2003' in self.__dict__:
                     delattr(self, 'f2003')
         else: self.isvalid = False
 
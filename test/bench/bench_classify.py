@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+'''Benchmark of keyword-indexed statement classification
+
+Parses Fortran sources with the statement classification index and with a
+linear scan of statement classes, checks that both produce the same trees
+and reports parsing times.
+
+Usage: bench_classify.py [-n repeat] [source files or directories]
+       (defaults to examples/ and test/kext/ of KGen)
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import logging
+import optparse
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+from parser import api
+from parser.parsefortran import FortranParser
+from parser.kgclassify import ClassIndex
+
+SOURCE_EXTS = ('.f', '.f90', '.F', '.F90')
+
+def collect_sources(paths):
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                for fn in sorted(filenames):
+                    if fn.endswith(SOURCE_EXTS):
+                        sources.append(os.path.join(dirpath, fn))
+        elif os.path.isfile(path):
+            sources.append(path)
+    return sorted(sources)
+
+def dump(tree):
+    lines = []
+    for stmt, depth in api.walk(tree, -1):
+        item = getattr(stmt, 'item', None)
+        if item is None:
+            lines.append('%d %s'%(depth, stmt.__class__.__name__))
+        else:
+            lines.append('%d %s %r %s'%(depth, stmt.__class__.__name__, item.span, getattr(item, 'line', item)))
+    return '\n'.join(lines)
+
+def parse(path, enabled):
+    ClassIndex.enabled = enabled
+    FortranParser.cache.clear()
+    with open(path, 'r') as f:
+        src = f.read()
+    start = time.time()
+    tree = api.parse(src, ignore_comments=False, analyze=False)
+    return time.time() - start, tree
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [-n repeat] [paths]')
+    parser.add_option('-n', dest='repeat', type='int', default=3, help='number of repetitions')
+    opts, args = parser.parse_args()
+
+    if not args:
+        args = [ os.path.join(KGEN_HOME, 'examples'), os.path.join(KGEN_HOME, 'test', 'kext') ]
+
+    logging.getLogger('kgen').disabled = True
+    sys.setrecursionlimit(10000)
+
+    total = { True: 0.0, False: 0.0 }
+    nfiles = 0
+    mismatch = []
+    for path in collect_sources(args):
+        try:
+            parse(path, True)
+        except Exception:
+            continue
+
+        best = {}
+        trees = {}
+        for r in range(opts.repeat):
+            for enabled in (False, True):
+                elapsed, trees[enabled] = parse(path, enabled)
+                best[enabled] = min(best.get(enabled, elapsed), elapsed)
+
+        if dump(trees[True]) != dump(trees[False]):
+            mismatch.append(path)
+        total[True] += best[True]
+        total[False] += best[False]
+        nfiles += 1
+
+    ClassIndex.enabled = True
+
+    print('files parsed     : %d'%nfiles)
+    print('linear scan      : %.3f sec'%total[False])
+    print('indexed          : %.3f sec'%total[True])
+    if total[True] > 0:
+        print('speedup          : %.2fx'%(total[False]/total[True]))
+    print('tree mismatches  : %d'%len(mismatch))
+    for path in mismatch:
+        print('    %s'%path)
+
+    return 1 if mismatch else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
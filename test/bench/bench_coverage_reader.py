@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+'''Benchmark of reading coverage raw data
+
+Creates coverage raw data of MPI ranks and OpenMP threads both in the
+previous layout, a text file per rank, thread and conditional block, and
+in the current layout, a binary record file per rank and thread. Then
+compares the previous visit with the current one. Collected invocations
+and visits are checked to be the same.
+
+Usage: bench_coverage_reader.py [-r ranks] [-t threads] [-b blocks] [-i invokes]
+'''
+
+from __future__ import print_function
+
+import os
+import re
+import sys
+import glob
+import time
+import random
+import struct
+import shutil
+import tempfile
+import optparse
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+from coverage import main as covermain
+
+def visit_text(path, invokes, usedfiles, usedlines, mpivisits, ompvisits, rank):
+    ''' previous visit '''
+
+    for tid in os.listdir(path):
+        if tid.isdigit() and os.path.isdir(os.path.join(path,tid)):
+            if tid not in invokes[rank]: invokes[rank][tid] = {}
+            omppath = os.path.join(path,tid)
+            for dfile in sorted(glob.glob('%s/*'%omppath)):
+                dfilename = os.path.basename(dfile)
+                match = re.match(r'^(\d+)\.(\d+)$', dfilename)
+                if match:
+                    fid = match.group(1)
+                    lid = match.group(2)
+
+                    if fid not in usedfiles: usedfiles.append(fid)
+
+                    if fid not in usedlines: usedlines[fid] = []
+                    if lid not in usedlines[fid]: usedlines[fid].append(lid)
+
+                    if fid not in mpivisits: mpivisits[fid] = {}
+                    if lid not in mpivisits[fid]: mpivisits[fid][lid] = {}
+                    if rank not in mpivisits[fid][lid]: mpivisits[fid][lid][rank] = 0
+
+                    if fid not in ompvisits: ompvisits[fid] = {}
+                    if lid not in ompvisits[fid]: ompvisits[fid][lid] = {}
+                    if tid not in ompvisits[fid][lid]: ompvisits[fid][lid][tid] = 0
+
+                    with open(dfile, 'r') as f:
+                        for line in f:
+                            invoke = line[:16].strip()
+                            visit = int(line[16:].strip())
+
+                            if invoke not in invokes[rank][tid]: invokes[rank][tid][invoke] = []
+                            invokes[rank][tid][invoke].append( (fid, lid, visit) )
+
+                            mpivisits[fid][lid][rank] += visit
+                            ompvisits[fid][lid][tid] += visit
+
+def create_data(textdir, binarydir, nranks, nthreads, nblocks, ninvokes):
+    random.seed(0)
+    for rank in range(nranks):
+        for tid in range(nthreads):
+            records = []
+            for invoke in range(1, ninvokes+1):
+                for lid in random.sample(range(nblocks), nblocks//2):
+                    records.append((0, lid, invoke, random.randint(1, 100)))
+
+            omppath = os.path.join(textdir, str(rank), str(tid))
+            os.makedirs(omppath)
+            for fid, lid, invoke, visits in sorted(records):
+                with open(os.path.join(omppath, '%d.%d'%(fid, lid)), 'a') as f:
+                    f.write('%16d%16d\n'%(invoke, visits))
+
+            with open(os.path.join(binarydir, '%d.%d'%(rank, tid)), 'wb') as f:
+                for record in records:
+                    f.write(struct.pack('=iiqq', *record))
+
+def collect(visitfunc, path, nranks):
+    usedfiles, usedlines, mpivisits, ompvisits, invokes = [], {}, {}, {}, {}
+    start = time.time()
+    for rank in range(nranks):
+        invokes[str(rank)] = {}
+        if visitfunc is visit_text:
+            visitfunc(os.path.join(path, str(rank)), invokes, usedfiles, usedlines, mpivisits, ompvisits, str(rank))
+        else:
+            visitfunc(path, invokes, usedfiles, usedlines, mpivisits, ompvisits, str(rank))
+    return time.time() - start, (invokes, sorted(usedfiles), dict((f, sorted(l)) for f, l in usedlines.items()), mpivisits, ompvisits)
+
+def main():
+    optparser = optparse.OptionParser(usage='%prog [-r ranks] [-t threads] [-b blocks] [-i invokes]')
+    optparser.add_option('-r', dest='nranks', type='int', default=16, help='number of MPI ranks')
+    optparser.add_option('-t', dest='nthreads', type='int', default=4, help='number of OpenMP threads')
+    optparser.add_option('-b', dest='nblocks', type='int', default=100, help='number of conditional blocks')
+    optparser.add_option('-i', dest='ninvokes', type='int', default=20, help='number of invocations')
+    opts, args = optparser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        textdir = os.path.join(workdir, 'text')
+        binarydir = os.path.join(workdir, 'binary')
+        os.makedirs(binarydir)
+        create_data(textdir, binarydir, opts.nranks, opts.nthreads, opts.nblocks, opts.ninvokes)
+
+        t_text, text = collect(visit_text, textdir, opts.nranks)
+        t_binary, binary = collect(covermain.visit, binarydir, opts.nranks)
+
+        nfiles = sum(len(files) for _, _, files in os.walk(textdir))
+        print('ranks: %d, threads: %d, blocks: %d, invocations: %d'%(opts.nranks, opts.nthreads, opts.nblocks, opts.ninvokes))
+        print('numpy        : %s'%('used' if covermain.numpy is not None else 'not available'))
+        print('text files   : %d files, %.3f sec'%(nfiles, t_text))
+        print('binary files : %d files, %.3f sec'%(len(os.listdir(binarydir)), t_binary))
+        print('mismatches   : %d'%(0 if text==binary else 1))
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+'''Benchmark of elapsed time binning and sampling
+
+Creates elapsed times of MPI ranks, OpenMP threads and invocations and
+times binning and sampling of them with each binning method. Binning is
+also timed with the previous per-sample loop over a part of the data.
+Bin populations of the both are checked to be the same for linear
+binning.
+
+Usage: bench_etime_sampling.py [-n samples] [-b bins] [-d ndata] [-p previous]
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import math
+import time
+import random
+import optparse
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+from elapsedtime import main as etimemain
+
+def create_data(nsamples):
+    if etimemain.numpy is not None:
+        rng = etimemain.numpy.random.RandomState(0)
+        idx = etimemain.numpy.arange(nsamples)
+        etimes = rng.lognormal(-10.0, 1.0, nsamples)
+        return idx % 64, idx // 64 % 4, idx // 256 + 1, etimes
+
+    random.seed(0)
+    idx = range(nsamples)
+    return [ i % 64 for i in idx ], [ i // 64 % 4 for i in idx ], [ i // 256 + 1 for i in idx ], \
+        [ random.lognormvariate(-10.0, 1.0) for i in idx ]
+
+def previous_counts(etimes, nbins):
+    ''' previous binning loop with the bin width of the bin report '''
+
+    etimemin = min(etimes)
+    etimediff = max(etimes) - etimemin
+    counts = [ 0 ] * nbins
+    for etimeval in etimes:
+        counts[min(int(math.floor((etimeval - etimemin) / etimediff * nbins)), nbins - 1)] += 1
+    return counts
+
+def main():
+    optparser = optparse.OptionParser(usage='%prog [-n samples] [-b bins] [-d ndata] [-p previous]')
+    optparser.add_option('-n', dest='nsamples', type='int', default=10000000, help='number of elapsed times')
+    optparser.add_option('-b', dest='nbins', type='int', default=5, help='number of bins')
+    optparser.add_option('-d', dest='ndata', type='int', default=20, help='number of selected invocations')
+    optparser.add_option('-p', dest='nprevious', type='int', default=1000000, help='number of elapsed times for the previous loop')
+    opts, args = optparser.parse_args()
+
+    ranks, threads, invokes, etimes = create_data(opts.nsamples)
+
+    print('samples: %d, bins: %d, ndata: %d'%(opts.nsamples, opts.nbins, opts.ndata))
+    print('numpy          : %s'%('used' if etimemain.numpy is not None else 'not available'))
+
+    for binning in ('linear', 'log', 'quantile'):
+        start = time.time()
+        edges = etimemain.bin_edges(etimes, opts.nbins, binning)
+        binnums, counts = etimemain.bin_etimes(etimes, edges)
+        selected = etimemain.sample_bins(binnums, counts, opts.ndata, 0)
+        elapsed = time.time() - start
+        print('%-15s: %.3f sec, %d selected, bin populations %s'%(binning, elapsed, \
+            sum(len(s) for s in selected), ' '.join(str(c) for c in counts)))
+
+    nprevious = min(opts.nprevious, opts.nsamples)
+    part = [ float(e) for e in etimes[:nprevious] ]
+    start = time.time()
+    counts = previous_counts(part, opts.nbins)
+    t_previous = time.time() - start
+    edges = etimemain.bin_edges(etimes[:nprevious], opts.nbins, 'linear')
+    binnums, newcounts = etimemain.bin_etimes(etimes[:nprevious], edges)
+    print('previous loop  : %.3f sec for %d samples'%(t_previous, nprevious))
+    print('mismatches     : %d'%sum(abs(c - n) for c, n in zip(counts, newcounts)))
+
+if __name__ == '__main__':
+    main()
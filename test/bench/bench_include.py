@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+'''Benchmark of include database
+
+Creates an include INI file with many per-file sections and compares
+loading it into dictionaries with alias copies, as KGen did before, with
+the include database. Entries of all files and their aliased paths are
+checked to be the same.
+
+Usage: bench_include.py [-n number of files] [-a number of aliases]
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import copy
+import shutil
+import tempfile
+import optparse
+import collections
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+from kgconfig import KgenConfigParser
+from parser import kgincdb
+
+def create_inifile(workdir, nfiles):
+    srcdir = os.path.join(workdir, 'src')
+    os.makedirs(srcdir)
+    inipath = os.path.join(workdir, 'include.ini')
+    with open(inipath, 'w') as f:
+        f.write('[include]\n/usr/include = \n\n[macro]\nNDEBUG = 1\n\n')
+        for i in range(nfiles):
+            path = os.path.join(srcdir, 'file%d.F90'%i)
+            open(path, 'w').close()
+            f.write('[%s]\n'%path)
+            f.write('compiler = /usr/bin/gfortran\n')
+            f.write('compiler_options = -O2 -fopenmp\n')
+            f.write('include = %s/inc:%s/mod%d:/opt/lib/include\n'%(srcdir, srcdir, i%10))
+            f.write('NX = %d\nNY = 64\nUSE_MPI = \n\n'%i)
+    return srcdir, inipath
+
+def load_dict(inipath, alias):
+    ''' previous loading of include.ini '''
+
+    files = collections.OrderedDict()
+    Inc = KgenConfigParser(allow_no_value=True)
+    Inc.read(inipath)
+    for section in Inc.sections():
+        if section.lower().strip() in kgincdb.COMMON_SECTIONS:
+            continue
+        elif os.path.isfile(section):
+            realpath = os.path.realpath(section)
+            if not realpath in files:
+                files[realpath] = kgincdb.new_entry()
+            for option in Inc.options(section):
+                if option=='include':
+                    files[realpath]['path'].extend(Inc.get(section, option).split(':'))
+                elif option in [ 'compiler', 'compiler_options' ]:
+                    files[realpath][option] = Inc.get(section, option)
+                else:
+                    files[realpath]['macro'][option] = Inc.get(section, option)
+
+    newfile = collections.OrderedDict()
+    for path, value in files.items():
+        newfile[path] = value
+        for newpath in kgincdb.alias_paths(path, alias):
+            newfile[newpath] = copy.deepcopy(value)
+
+    for path, value in newfile.items():
+        newpath = set()
+        for p in value['path']:
+            newpath.add(p)
+            newpath.update(kgincdb.alias_paths(p, alias))
+        value['path'] = list(newpath)
+    return newfile
+
+def load_db(inipath, dbpath, alias):
+    if not kgincdb.isuptodate(dbpath, inipath):
+        kgincdb.build(dbpath, inipath)
+    return kgincdb.IncludeDB(dbpath, alias)
+
+def same_entry(e1, e2):
+    return set(e1['path'])==set(e2['path']) and e1['compiler']==e2['compiler'] and \
+        e1['compiler_options']==e2['compiler_options'] and list(e1['macro'].items())==list(e2['macro'].items())
+
+def main():
+    optparser = optparse.OptionParser(usage='%prog [-n files] [-a aliases]')
+    optparser.add_option('-n', dest='nfiles', type='int', default=20000, help='number of files in include.ini')
+    optparser.add_option('-a', dest='naliases', type='int', default=2, help='number of source path aliases')
+    opts, args = optparser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        srcdir, inipath = create_inifile(workdir, opts.nfiles)
+        dbpath = os.path.join(workdir, 'include.db')
+        alias = collections.OrderedDict(('/alias%d%s'%(i, srcdir), srcdir) for i in range(opts.naliases))
+
+        start = time.time()
+        files = load_dict(inipath, alias)
+        t_dict = time.time() - start
+
+        start = time.time()
+        load_db(inipath, dbpath, alias)
+        t_build = time.time() - start
+
+        start = time.time()
+        incdb = load_db(inipath, dbpath, alias)
+        t_open = time.time() - start
+
+        # a typical extraction looks up a small number of files
+        lookups = [ os.path.join(srcdir, 'file%d.F90'%i) for i in range(0, opts.nfiles, max(1, opts.nfiles//100)) ]
+        start = time.time()
+        for path in lookups:
+            incdb.get(path)
+        t_lookup = time.time() - start
+
+        mismatches = 0
+        for path, entry in files.items():
+            if path not in incdb or not same_entry(entry, incdb[path]):
+                mismatches += 1
+        if os.path.join(srcdir, 'nofile.F90') in incdb:
+            mismatches += 1
+
+        print('files: %d, aliases: %d, entries with aliases: %d'%(opts.nfiles, opts.naliases, len(files)))
+        print('dict load         : %.3f sec'%t_dict)
+        print('database build    : %.3f sec (when include.ini changes)'%t_build)
+        print('database open     : %.3f sec'%t_open)
+        print('%d lookups       : %.3f sec'%(len(lookups), t_lookup))
+        print('mismatched entries: %d'%mismatches)
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
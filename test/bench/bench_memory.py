@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+'''Memory report of parsing Fortran sources
+
+Parses Fortran sources, converts all statements to Fortran2003 nodes and
+reports memory traced by tracemalloc together with the number and size
+of source line and Fortran2003 node objects kept in the parse trees.
+Requires Python 3.4 or later.
+
+Usage: bench_memory.py [-n top] [source files or directories]
+       (defaults to examples/ and test/kext/ of KGen)
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import gc
+import logging
+import optparse
+
+try:
+    import tracemalloc
+except ImportError:
+    print('ERROR: tracemalloc module is not available.')
+    sys.exit(-1)
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+from parser import api
+from parser import Fortran2003
+from parser.parsefortran import FortranParser
+from parser.readfortran import Line, Comment
+
+SOURCE_EXTS = ('.f', '.f90', '.F', '.F90')
+
+def collect_sources(paths):
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                for fn in sorted(filenames):
+                    if fn.endswith(SOURCE_EXTS):
+                        sources.append(os.path.join(dirpath, fn))
+        elif os.path.isfile(path):
+            sources.append(path)
+    return sorted(sources)
+
+def objsize(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def count_objects(trees):
+    counts = { 'Line': [0, 0], 'Comment': [0, 0], 'Fortran2003': [0, 0] }
+
+    seen = set()
+    stack = []
+    for tree in trees:
+        for stmt, depth in api.walk(tree, -1):
+            stack.append(getattr(stmt, 'item', None))
+            stack.append(stmt.__dict__.get('f2003', None))
+
+    while stack:
+        obj = stack.pop()
+        if obj is None or id(obj) in seen: continue
+        seen.add(id(obj))
+        if isinstance(obj, Line): key = 'Line'
+        elif isinstance(obj, Comment): key = 'Comment'
+        elif isinstance(obj, Fortran2003.Base):
+            key = 'Fortran2003'
+            stack.append(getattr(obj, 'item', None))
+            items = getattr(obj, 'items', None) or ()
+            for item in items:
+                if isinstance(item, (list, tuple)):
+                    stack.extend([ i for i in item if isinstance(i, Fortran2003.Base) ])
+                elif isinstance(item, Fortran2003.Base):
+                    stack.append(item)
+            for item in getattr(obj, 'content', None) or ():
+                if isinstance(item, Fortran2003.Base):
+                    stack.append(item)
+        else:
+            continue
+        counts[key][0] += 1
+        counts[key][1] += objsize(obj)
+    return counts
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [-n top] [paths]')
+    parser.add_option('-n', dest='top', type='int', default=10, help='number of top allocation sites')
+    opts, args = parser.parse_args()
+
+    if not args:
+        args = [ os.path.join(KGEN_HOME, 'examples'), os.path.join(KGEN_HOME, 'test', 'kext') ]
+
+    logging.getLogger('kgen').disabled = True
+    sys.setrecursionlimit(10000)
+
+    gc.collect()
+    tracemalloc.start()
+
+    trees = []
+    for path in collect_sources(args):
+        with open(path, 'r') as f:
+            src = f.read()
+        FortranParser.cache.clear()
+        try:
+            tree = api.parse(src, ignore_comments=False, analyze=True)
+            for stmt, depth in api.walk(tree, -1):
+                stmt.parse_f2003()
+        except Exception:
+            continue
+        trees.append(tree)
+
+    FortranParser.cache.clear()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    counts = count_objects(trees)
+
+    print('files parsed       : %d'%len(trees))
+    print('traced memory      : %.1f MB'%(current/1024.0/1024.0))
+    print('peak traced memory : %.1f MB'%(peak/1024.0/1024.0))
+    for key in ('Line', 'Comment', 'Fortran2003'):
+        print('%-18s : %d objects, %.1f MB'%(key, counts[key][0], counts[key][1]/1024.0/1024.0))
+
+    print('top allocation sites:')
+    for stat in snapshot.statistics('lineno')[:opts.top]:
+        print('    %s'%stat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+'''Benchmark of writing and reading KGen model data
+
+Adds coverage-like model sections both to an INI model file, as KGen did
+before by reading and rewriting the whole file per section, and to the
+current model store. Then reads invocation data back from both. Exported
+INI data of the model store is checked to be the same as the INI file.
+
+Usage: bench_model_store.py [-s sections] [-n options]
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import optparse
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+from kgconfig import Config
+from kgtool import KGModelingTool, export_model
+
+def ini_addsection(modelfile, modeltype, section, options):
+    ''' previous addsection '''
+
+    cfg = configparser.ConfigParser()
+    cfg.optionxform = str
+    cfg.read(modelfile)
+    cfg.add_section('%s.%s'%(modeltype, section))
+    for opt, val in options:
+        cfg.set('%s.%s'%(modeltype, section), opt, val)
+    with open(modelfile, 'r+') as mf:
+        cfg.write(mf)
+
+def create_rows(noptions):
+    random.seed(0)
+    rows = []
+    for invoke in range(1, noptions+1):
+        for lid in sorted(random.sample(range(100), 5)):
+            rows.append((invoke % 16, 0, invoke, 0, lid, random.randint(1, 100)))
+    return rows
+
+def main():
+    optparser = optparse.OptionParser(usage='%prog [-s sections] [-n options]')
+    optparser.add_option('-s', dest='nsections', type='int', default=20, help='number of sections')
+    optparser.add_option('-n', dest='noptions', type='int', default=20000, help='number of options per section')
+    opts, args = optparser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        Config.path['outdir'] = workdir
+        rows = create_rows(opts.noptions)
+        sections = [ 'invoke%d'%n for n in range(opts.nsections) ]
+
+        inidir = os.path.join(workdir, 'ini')
+        os.makedirs(inidir)
+        inifile = os.path.join(inidir, Config.modelfile)
+        start = time.time()
+        with open(inifile, 'w') as mf:
+            mf.write('; KGen Model Data File\n[general]\ncoverage = %s\n\n'%', '.join(sections))
+        for section in sections:
+            options = []
+            for key, value in ((r[:3], r[3:]) for r in rows):
+                if options and options[-1][0] == '%d %d %d'%key:
+                    options[-1] = (options[-1][0], '%s, %s'%(options[-1][1], ':'.join(str(v) for v in value)))
+                else:
+                    options.append(('%d %d %d'%key, ':'.join(str(v) for v in value)))
+            ini_addsection(inifile, 'coverage', section, options)
+        t_iniwrite = time.time() - start
+
+        start = time.time()
+        cfg = configparser.ConfigParser()
+        cfg.optionxform = str
+        cfg.read(inifile)
+        nini = sum(len(cfg.get('coverage.%s'%sections[-1], opt).split(',')) for opt in cfg.options('coverage.%s'%sections[-1]))
+        t_iniread = time.time() - start
+
+        tool = KGModelingTool()
+        columns = [ ('rank', 'INTEGER'), ('thread', 'INTEGER'), ('invoke', 'INTEGER'), ('fileid', 'INTEGER'), \
+            ('linenum', 'INTEGER'), ('visits', 'INTEGER') ]
+        start = time.time()
+        tool.addmodel('coverage', sections)
+        for section in sections:
+            tool.addtable('coverage', section, columns, rows, keys=3, sep=':')
+        t_storewrite = time.time() - start
+
+        start = time.time()
+        nstore = sum(1 for row in tool.gettable('coverage', sections[-1]))
+        t_storeread = time.time() - start
+
+        exported = StringIO()
+        export_model(os.path.join(workdir, Config.modelfile), os.path.join(workdir, Config.modeldb), exported)
+        expcfg = configparser.ConfigParser()
+        expcfg.optionxform = str
+        getattr(expcfg, 'read_file', getattr(expcfg, 'readfp', None))(StringIO(exported.getvalue()))
+        mismatches = sum(1 for sec in cfg.sections() for opt in cfg.options(sec) \
+            if not expcfg.has_option(sec, opt) or expcfg.get(sec, opt) != cfg.get(sec, opt))
+
+        print('sections: %d, options per section: %d, values per section: %d'%(opts.nsections, opts.noptions, len(rows)))
+        print('INI file    : write %.3f sec, read a section %.3f sec'%(t_iniwrite, t_iniread))
+        print('model store : write %.3f sec, read a section %.3f sec'%(t_storewrite, t_storeread))
+        print('mismatches  : %d'%(mismatches + abs(nini - nstore)))
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
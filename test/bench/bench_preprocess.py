@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+'''Benchmark of source file preprocessing
+
+Creates source files that use macros, conditionals and a shared header
+and compares running the external preprocessor once per file, as KGen
+did before, with the builtin preprocessor. Outputs are checked to be the
+same.
+
+Usage: bench_preprocess.py [-n files] [-l lines]
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import optparse
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+from kgutils import run_shcmd
+from parser import kgpp
+
+PP = 'cpp'
+FLAGS = '-w -traditional -P'
+
+def create_files(srcdir, nfiles, nlines):
+    with open(os.path.join(srcdir, 'config.h'), 'w') as f:
+        f.write('#ifndef CONFIG_H\n#define CONFIG_H\n#define REAL_KIND 8\n#define IDX(i,j) ((j-1)*NX+i)\n#endif\n')
+
+    paths = []
+    for n in range(nfiles):
+        lines = [ '#include "config.h"', 'module mod%d'%n, '  implicit none', '  integer, parameter :: r8 = REAL_KIND' ]
+        lines += [ '  real(r8) :: v%d(NX*NY)'%k for k in range(nlines//4) ]
+        lines += [ 'contains', '  subroutine sub%d()'%n, '    integer :: i, j' ]
+        for k in range(nlines//4):
+            lines += [ '#ifdef USE_MPI', '    v%d(IDX(i,j)) = 1.0_r8'%k, '#else', '    v%d(IDX(1,1)) = 0.0_r8 ! it\'s NX'%k, '#endif' ]
+        lines += [ '  end subroutine', 'end module' ]
+        path = os.path.join(srcdir, 'mod%d.F90'%n)
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines)+'\n')
+        paths.append(path)
+    return paths
+
+def main():
+    optparser = optparse.OptionParser(usage='%prog [-n files] [-l lines]')
+    optparser.add_option('-n', dest='nfiles', type='int', default=200, help='number of source files')
+    optparser.add_option('-l', dest='nlines', type='int', default=400, help='approximate number of lines per file')
+    opts, args = optparser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        paths = create_files(workdir, opts.nfiles, opts.nlines)
+        texts = []
+        for path in paths:
+            with open(path, 'r') as f:
+                texts.append(f.read())
+        incpaths = [ workdir ]
+        defines = [ 'NX=16', 'NY=16', 'USE_MPI' ]
+
+        start = time.time()
+        external = []
+        for text in texts:
+            out, err, retcode = run_shcmd('%s %s %s %s'%(PP, FLAGS, ' '.join('-I %s'%p for p in incpaths), \
+                ' '.join('-D%s'%d for d in defines)), input=text)
+            external.append(out)
+        t_external = time.time() - start
+
+        start = time.time()
+        builtin = kgpp.get_preprocessor(PP, FLAGS)
+        t_calibrate = time.time() - start
+        if builtin is None:
+            print('builtin preprocessor is not available for %s %s'%(PP, FLAGS))
+            return
+
+        start = time.time()
+        outputs = [ builtin.run(text, incpaths, defines, workdir) for text in texts ]
+        t_builtin = time.time() - start
+
+        mismatches = sum(1 for out, ext in zip(outputs, external) if out!=ext)
+
+        print('files: %d, lines per file: %d'%(opts.nfiles, len(texts[0].split('\n'))))
+        print('external preprocessor: %.3f sec'%t_external)
+        print('builtin preprocessor : %.3f sec (and %.3f sec to collect predefined macros once)'%(t_builtin, t_calibrate))
+        print('mismatched outputs   : %d'%mismatches)
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
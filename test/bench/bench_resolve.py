@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+'''Benchmark of name resolution for a large callsite
+
+Generates an application whose kernel references many module variables
+and derived type components, and runs the KGen parser phase (parsing and
+name resolution from the callsite) on it. The application is not built.
+
+Usage: bench_resolve.py [-m modules] [-v variables] [--profile N]
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import optparse
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+sys.setrecursionlimit(2000)
+
+NCOMPS = 10
+
+def write(path, lines):
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines)+'\n')
+
+def create_app(srcdir, nmods, nvars):
+    for m in range(nmods):
+        lines = [ 'module mod%d'%m, '  implicit none', '  type t%d'%m ]
+        lines += [ '    real :: c%d(ROW)'%c for c in range(NCOMPS) ]
+        lines += [ '  end type' ]
+        lines += [ '  real :: v%d_%d(ROW,COLUMN)'%(m, v) for v in range(nvars) ]
+        lines += [ '  type(t%d) :: s%d'%(m, m), 'contains', '  subroutine init%d()'%m ]
+        lines += [ '    v%d_%d = %d.0'%(m, v, v) for v in range(nvars) ]
+        lines += [ '    s%d%%c%d = 1.0'%(m, c) for c in range(NCOMPS) ]
+        lines += [ '  end subroutine', 'end module' ]
+        write(os.path.join(srcdir, 'mod%d.F90'%m), lines)
+
+    lines = [ 'module kernel' ] + [ '  use mod%d'%m for m in range(nmods) ]
+    lines += [ '  implicit none', 'contains', '  subroutine add(out)', '    real, intent(inout) :: out(ROW,COLUMN)', \
+        '    integer :: i, j', '    do j=1,COLUMN', '    do i=1,ROW' ]
+    for m in range(nmods):
+        for v in range(0, nvars-1, 2):
+            lines.append('      out(i,j) = out(i,j) + v%d_%d(i,j) * v%d_%d(i,j) + s%d%%c%d(i)'%(m, v, m, v+1, m, v%NCOMPS))
+    lines += [ '    end do', '    end do', '  end subroutine', 'end module' ]
+    write(os.path.join(srcdir, 'kernel.F90'), lines)
+
+    lines = [ 'module calling_module', '  use kernel' ] + [ '  use mod%d'%m for m in range(nmods) ]
+    lines += [ '  implicit none', 'contains', '  subroutine calling_subroutine()', '    real :: out(ROW,COLUMN)', '    out = 0.0' ]
+    lines += [ '    call init%d()'%m for m in range(nmods) ]
+    lines += [ '    call add(out)', '    print *, sum(out)', '  end subroutine', 'end module' ]
+    write(os.path.join(srcdir, 'calling_module.F90'), lines)
+
+    write(os.path.join(srcdir, 'test_top.F90'), [ 'program test_top', '  use calling_module', \
+        '  call calling_subroutine()', 'end program' ])
+
+def main():
+    optparser = optparse.OptionParser(usage='%prog [-m modules] [-v variables] [--profile N]')
+    optparser.add_option('-m', dest='nmods', type='int', default=30, help='number of modules')
+    optparser.add_option('-v', dest='nvars', type='int', default=40, help='number of variables per module')
+    optparser.add_option('--profile', dest='profile', type='int', default=0, help='print N functions of the largest cumulative time')
+    opts, args = optparser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        srcdir = os.path.join(workdir, 'src')
+        outdir = os.path.join(workdir, 'out')
+        os.makedirs(srcdir)
+        os.makedirs(outdir)
+        create_app(srcdir, opts.nmods, opts.nvars)
+
+        with open(os.path.join(outdir, 'include.ini'), 'w') as f:
+            for fn in sorted(os.listdir(srcdir)):
+                f.write('[%s]\ninclude = %s\nROW = 4\nCOLUMN = 4\n\n'%(os.path.join(srcdir, fn), srcdir))
+
+        from kgconfig import Config
+        Config.parse([ '%s/calling_module.F90:calling_module:calling_subroutine:add'%srcdir, \
+            '-D', 'ROW=4,COLUMN=4', '-I', srcdir, '--cmd-clean', 'true', '--cmd-build', 'true', \
+            '--cmd-run', 'true', '--outdir', outdir, '--parse-cache', 'disable', '--prefetch', 'disable' ])
+        Config.process_include_option()
+        Config.collect_mpi_params()
+
+        from parser.main import Parser
+        parser = Parser()
+
+        if opts.profile > 0:
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+            start = time.time()
+            profiler.runcall(parser.run)
+            elapsed = time.time() - start
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(opts.profile)
+        else:
+            start = time.time()
+            parser.run()
+            elapsed = time.time() - start
+
+        print('modules: %d, variables per module: %d'%(opts.nmods, opts.nvars))
+        print('parser phase: %.2f sec'%elapsed)
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
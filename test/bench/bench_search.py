@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+'''Benchmark of searching names in Fortran2003 nodes
+
+Parses a source file of a system test kernel, MG2 of CESM by default,
+and runs f2003_search_unknowns on all of its statements both with the
+previous dispatch, which executed a "search_<class name>(...)" source
+string per node, and with the current lookup table. Collected names are
+checked to be the same.
+
+Usage: bench_search.py [-f source file] [-r repeats]
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import optparse
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+sys.setrecursionlimit(2000)
+
+from kgconfig import Config
+from parser import api, kgpp, kgsearch
+
+SRCFILE = '%s/test/kext/sys/ch/cesm/intel/mg2/micro_mg_utils.F90'%KGEN_HOME
+
+def exec_search_func(clsname):
+    ''' previous dispatch '''
+
+    def search(stmt, node, gentype=None):
+        exec('search_%s(stmt, node, gentype=gentype)'%clsname, vars(kgsearch), \
+            { 'stmt': stmt, 'node': node, 'gentype': gentype })
+    return search
+
+def parse(path):
+    with open(path, 'r') as f:
+        text = f.read()
+
+    pp = kgpp.get_preprocessor('cpp', '-w -traditional -P')
+    if pp is not None:
+        text = pp.run(text, [ os.path.dirname(path) ], [], os.path.dirname(path))
+
+    tree = api.parse(text, ignore_comments=False, analyze=True, isfree=True, isstrict=False)
+    # statements of which names can be searched, such as statements that are not begin statements of blocks
+    stmts = []
+    for stmt, depth in api.walk(tree, -1):
+        stmt.parse_f2003()
+        try:
+            kgsearch.f2003_search_unknowns(stmt, stmt.f2003)
+            stmts.append(stmt)
+        except NameError:
+            pass
+    return stmts
+
+def search_all(stmts):
+    start = time.time()
+    for stmt in stmts:
+        if hasattr(stmt, 'unknowns'):
+            del stmt.unknowns
+        kgsearch.f2003_search_unknowns(stmt, stmt.f2003)
+    elapsed = time.time() - start
+    return elapsed, [ [ name.firstpartname() for name in stmt.unknowns ] for stmt in stmts ]
+
+def main():
+    optparser = optparse.OptionParser(usage='%prog [-f source file] [-r repeats]')
+    optparser.add_option('-f', dest='srcfile', type='string', default=SRCFILE, help='path to a Fortran source file')
+    optparser.add_option('-r', dest='repeats', type='int', default=5, help='number of repeats')
+    opts, args = optparser.parse_args()
+
+    Config.search['promote_exception'] = True
+    kgsearch.logger.disabled = True
+
+    stmts = parse(opts.srcfile)
+
+    get_search_func = kgsearch.get_search_func
+    t_exec, t_table = [], []
+    for _ in range(opts.repeats):
+        kgsearch.get_search_func = exec_search_func
+        try:
+            elapsed, exec_names = search_all(stmts)
+            t_exec.append(elapsed)
+        finally:
+            kgsearch.get_search_func = get_search_func
+
+        elapsed, table_names = search_all(stmts)
+        t_table.append(elapsed)
+
+    print('source file  : %s'%opts.srcfile)
+    print('statements   : %d'%len(stmts))
+    print('exec dispatch: %.3f sec (best of %d)'%(min(t_exec), opts.repeats))
+    print('lookup table : %.3f sec (best of %d)'%(min(t_table), opts.repeats))
+    print('mismatches   : %d'%sum(1 for e, t in zip(exec_names, table_names) if e!=t))
+
+if __name__ == '__main__':
+    main()
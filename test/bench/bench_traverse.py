@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+'''Benchmark of Fortran2003 node traversal on deep expressions
+
+Parses assignment statements whose right-hand sides are long sums, which
+the parser turns into deeply nested nodes, and compares the previous
+recursive traverse, set_parent and expr_by_name with the current ones.
+Parent links, visited nodes and found expressions are checked to be the
+same.
+
+Usage: bench_traverse.py [-t terms] [-r repeats]
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import optparse
+
+SCRIPT_HOME, SCRIPT_NAME = os.path.split(os.path.realpath(__file__))
+KGEN_HOME = '%s/../..'%SCRIPT_HOME
+sys.path.insert(0, '%s/kgen'%KGEN_HOME)
+
+from kgutils import KGName, traverse
+from parser import Fortran2003
+from parser.base_classes import Statement
+
+def traverse_recursive(node, func, bag, subnode='items', prerun=True, depth=0):
+    ''' previous traverse '''
+
+    ret = None
+
+    if prerun and func is not None:
+        ret = func(node, bag, depth)
+        if ret is not None: return ret
+
+    if node and hasattr(node, subnode) and getattr(node, subnode) is not None:
+        for child in getattr(node, subnode):
+            ret = traverse_recursive(child, func, bag, subnode=subnode, prerun=prerun, depth=depth+1)
+
+    if not prerun and func is not None:
+        ret = func(node, bag, depth)
+        if ret is not None: return ret
+
+    return ret
+
+def set_parent_recursive(node, bag, depth):
+    ''' previous Statement.set_parent '''
+
+    if hasattr(node, 'item') and node.item and isinstance(node.item, Fortran2003.Base):
+        node.item.parent = node
+
+    if node and hasattr(node, 'items') and node.items:
+        for item in node.items:
+            if isinstance(item, list) or isinstance(item, tuple):
+                pass
+            elif item and not isinstance(item, str):
+                item.parent = node
+                set_parent_recursive(item, bag, depth+1)
+
+def expr_by_name_recursive(name, node):
+    ''' previous Statement.expr_by_name for a name without parents '''
+
+    expr = None
+    if isinstance(node, Fortran2003.Name):
+        if name.firstpartname().lower()==node.string.lower():
+            expr = node.parent
+    elif isinstance(node, list) or isinstance(node, tuple):
+        for item in node:
+            if isinstance(item, Fortran2003.Name):
+                if name.firstpartname().lower()==item.string.lower():
+                    expr = item.parent
+            else:
+                expr = expr_by_name_recursive(name, item)
+                if expr is not None: break
+    else:
+        if node and hasattr(node, 'items') and node.items:
+            for item in node.items:
+                expr = expr_by_name_recursive(name, item)
+                if expr is not None: break
+    return expr
+
+class Stmt(object):
+    ''' minimal statement for unbound Statement methods '''
+
+    set_parent = getattr(Statement.set_parent, '__func__', Statement.set_parent)
+    expr_by_name = getattr(Statement.expr_by_name, '__func__', Statement.expr_by_name)
+
+    def ancestors(self):
+        return []
+
+def get_nodes(node, bag, depth):
+    bag.append((id(node), depth))
+    if isinstance(node, Fortran2003.Name) and node.string=='b0':
+        return node
+
+def parents(node):
+    bag = []
+    def collect(n, b, depth):
+        b.append((id(n), id(getattr(n, 'parent', None))))
+    traverse_recursive(node, collect, bag)
+    return bag
+
+def timeit(repeats, func, *args):
+    start = time.time()
+    for _ in range(repeats):
+        ret = func(*args)
+    return time.time() - start, ret
+
+def main():
+    optparser = optparse.OptionParser(usage='%prog [-t terms] [-r repeats]')
+    optparser.add_option('-t', dest='nterms', type='int', default=250, help='number of terms in an expression')
+    optparser.add_option('-r', dest='repeats', type='int', default=20, help='number of repeats')
+    opts, args = optparser.parse_args()
+
+    # the parser itself is recursive
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20*opts.nterms))
+    line = 'x = ' + ' + '.join('a%d(i)*b%d'%(k, k) for k in range(opts.nterms))
+    node = Fortran2003.Assignment_Stmt(line)
+    sys.setrecursionlimit(2000)
+
+    stmt = Stmt()
+    name = KGName('b0')
+    mismatches = 0
+
+    t_old_parent, _ = timeit(opts.repeats, traverse_recursive, node, set_parent_recursive, None)
+    old_parents = parents(node)
+    t_new_parent, _ = timeit(opts.repeats, stmt.set_parent, node, None, 0)
+    if parents(node)!=old_parents: mismatches += 1
+
+    old_bag = []
+    t_old_pre, old_ret = timeit(opts.repeats, traverse_recursive, node, get_nodes, old_bag)
+    new_bag = []
+    t_new_pre, new_ret = timeit(opts.repeats, traverse, node, get_nodes, new_bag)
+    if old_bag!=new_bag or old_ret is not new_ret: mismatches += 1
+
+    old_bag = []
+    t_old_post, old_ret = timeit(opts.repeats, traverse_recursive, node, get_nodes, old_bag, 'items', False)
+    new_bag = []
+    t_new_post, new_ret = timeit(opts.repeats, traverse, node, get_nodes, new_bag, 'items', False)
+    if old_bag!=new_bag or old_ret is not new_ret: mismatches += 1
+
+    t_old_expr, old_expr = timeit(opts.repeats, expr_by_name_recursive, name, node)
+    t_new_expr, new_expr = timeit(opts.repeats, stmt.expr_by_name, name, node)
+    if old_expr is None or old_expr is not new_expr: mismatches += 1
+
+    depths = []
+    traverse(node, lambda n, bag, depth: bag.append(depth), depths)
+    print('terms: %d, nodes: %d, depth: %d, repeats: %d'%(opts.nterms, len(depths), max(depths), opts.repeats))
+    print('set_parent   : %.3f sec (previous traverse with recursive set_parent: %.3f sec)'%(t_new_parent, t_old_parent))
+    print('pre-order    : %.3f sec (previous: %.3f sec)'%(t_new_pre, t_old_pre))
+    print('post-order   : %.3f sec (previous: %.3f sec)'%(t_new_post, t_old_post))
+    print('expr_by_name : %.3f sec (previous: %.3f sec)'%(t_new_expr, t_old_expr))
+    print('mismatches   : %d'%mismatches)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+# compflag_test.py
+
+import os
+import shutil
+import tempfile
+from kgtest import KGenTest
+
+class CompflagTest(KGenTest):
+
+    def mkworkdir(self, myname, result):
+
+        if self.WORK_DIR is None:
+            workdir = tempfile.mkdtemp()
+        else:
+            workdir = '%s/%s'%(self.WORK_DIR, self.TEST_ID.replace('/', '_'))
+            if os.path.exists(workdir):
+                shutil.rmtree(workdir)
+            os.makedirs(workdir)
+
+        result[myname]['workdir'] = workdir
+
+        self.set_status(result, myname, self.PASSED)
+        return result
+
+    def rmdir(self, myname, result):
+
+        workdir = result['mkdir_task']['workdir']
+
+        if not self.LEAVE_TEMP and os.path.exists(workdir):
+            shutil.rmtree(workdir)
+
+        self.set_status(result, myname, self.PASSED)
+        return result
@@ -0,0 +1,110 @@
+# runtest.py
+# 
+import os
+import sys
+import json
+from compflag_test import CompflagTest
+from compflag import kgshim
+from kgutils import run_shcmd
+
+FAKE_COMPILER = '#!/bin/sh\nexit 0\n'
+
+class ShimTest(CompflagTest):
+
+    def config(self, myname, result):
+
+        workdir = result['mkdir_task']['workdir']
+
+        fakebin = '%s/fakebin'%workdir
+        srcdir = '%s/src'%workdir
+        incdir = '%s/inc'%workdir
+        for path in (fakebin, srcdir, incdir):
+            os.makedirs(path)
+
+        # a compiler that does nothing
+        with open('%s/gfortran'%fakebin, 'w') as f:
+            f.write(FAKE_COMPILER)
+        os.chmod('%s/gfortran'%fakebin, 0o755)
+
+        for name in ('a.F90', 'b.F90', 'c.F90'):
+            with open('%s/%s'%(srcdir, name), 'w') as f:
+                f.write('end\n')
+
+        result[myname]['fakebin'] = fakebin
+        result[myname]['srcdir'] = srcdir
+        result[myname]['incdir'] = incdir
+
+        self.set_status(result, myname, self.PASSED)
+        return result
+
+    def generate(self, myname, result):
+
+        workdir = result['mkdir_task']['workdir']
+        fakebin = result['config_task']['fakebin']
+        srcdir = result['config_task']['srcdir']
+
+        # shims and records are given relative to workdir while the build changes directory
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            kgshim.create_shims('./shims', './records')
+
+            # a.F90 is compiled again with different flags after b.F90 and c.F90
+            build = 'cd src; gfortran -c -DA=1 a.F90; gfortran -c -O2 b.F90 & gfortran -c -DC c.F90 & wait; gfortran -c -DA=2 -I../inc a.F90'
+            out, err, retcode = run_shcmd('PATH="%s:$PATH"; export PATH; %s'%(fakebin, kgshim.shim_command('./shims', build)))
+            if retcode != 0:
+                self.set_status(result, myname, self.FAILED, errmsg='build with shims is failed: %s'%err)
+                return result
+
+            result[myname]['shimflags'] = kgshim.parse_records('./records')
+        finally:
+            os.chdir(cwd)
+
+        # the last entry of a.F90 uses "command" instead of "arguments"
+        compdb = '%s/compile_commands.json'%workdir
+        with open(compdb, 'w') as f:
+            json.dump([ { 'directory': srcdir, 'arguments': [ '%s/gfortran'%fakebin, '-c', '-DA=1', 'a.F90' ] }, \
+                { 'directory': srcdir, 'arguments': [ '%s/gfortran'%fakebin, '-c', '-O2', 'b.F90' ] }, \
+                { 'directory': srcdir, 'command': '%s/gfortran -c -DA=2 -I../inc "a.F90"'%fakebin } ], f)
+
+        result[myname]['compdbflags'] = kgshim.parse_compdb(compdb)
+
+        self.set_status(result, myname, self.PASSED)
+        return result
+
+    def verify(self, myname, result):
+
+        fakebin = result['config_task']['fakebin']
+        srcdir = result['config_task']['srcdir']
+        incdir = result['config_task']['incdir']
+        compiler = '%s/gfortran'%fakebin
+
+        expected = {
+            '%s/a.F90'%srcdir: (compiler, [ incdir ], [ ('A', '2') ], [], []),
+            '%s/b.F90'%srcdir: (compiler, [], [], [], [ '-O2' ])
+        }
+
+        errmsg = []
+        for name, flags in (('shim', result['generate_task']['shimflags']), ('compdb', result['generate_task']['compdbflags'])):
+            for src, expflags in expected.items():
+                if src not in flags:
+                    errmsg.append('%s: %s is not recorded'%(name, src))
+                elif tuple(flags[src]) != expflags:
+                    errmsg.append('%s: %s has %s instead of %s'%(name, src, str(flags[src]), str(expflags)))
+
+        shimflags = result['generate_task']['shimflags']
+        if list(shimflags.keys())[0] != '%s/a.F90'%srcdir:
+            errmsg.append('shim: source files are not in the order of first compilation')
+        if '%s/c.F90'%srcdir not in shimflags or shimflags['%s/c.F90'%srcdir][2] != [ ('C', None) ]:
+            errmsg.append('shim: c.F90 is not correctly recorded: %s'%str(shimflags.get('%s/c.F90'%srcdir)))
+
+        if errmsg:
+            self.set_status(result, myname, self.FAILED, errmsg='\n'.join(errmsg))
+        else:
+            self.set_status(result, myname, self.PASSED)
+        return result
+
+if __name__ == "__main__":
+    print('Please do not run this script from command line. Instead, run this script through KGen Test Suite .')
+    print('Usage: cd ${KGEN_HOME}/test; ./kgentest.py')
+    sys.exit(-1)